@@ -0,0 +1,181 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from host_scheduler import dead_letters, scheduler as host_scheduler
+from http_engine import record_page_load
+from metrics import counter
+
+# --- Pool of headless browsers shared by the Selenium paths of both scrapers ---
+# Keeps up to BROWSER_POOL_SIZE Chrome instances and feeds them work items (category pages,
+# search result pages, detail pages) from one queue. A browser stays warm between items and
+# between run() calls, and is replaced
+#   - after BROWSER_MAX_PAGES pages, to bound Chrome's memory growth
+#   - when a task raises (crashed or wedged browser); the item is retried on the fresh one
+# Browsers start on first use, so a run with one fallback page starts one Chrome. Items
+# the pool gives up on are added to the dead letters (host_scheduler.py).
+
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "4"))
+BROWSER_MAX_PAGES = int(os.environ.get("BROWSER_MAX_PAGES", "50"))  # 0 = never recycle
+BROWSER_RETRIES = 1  # extra attempts for an item whose browser failed
+
+BROWSER_RESTARTS = counter("trailer_scraper_browser_restarts_total",
+                           "Pooled browsers replaced, by reason (recycled, crashed)", ("reason",))
+
+
+class _Slot:
+    def __init__(self):
+        self.driver = None
+        self.pages = 0
+
+
+class BrowserPool:
+    def __init__(self, make_driver, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES,
+                 retries=BROWSER_RETRIES, name="browser"):
+        self.make_driver = make_driver
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.retries = retries
+        self.name = name
+        self.slots = [_Slot() for _ in range(self.size)]
+        self.pages = 0
+        self.restarts = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _quit(self, slot):
+        if slot.driver is not None:
+            try:
+                slot.driver.quit()
+            except Exception:
+                pass
+        slot.driver = None
+        slot.pages = 0
+
+    def _driver(self, slot):
+        if slot.driver is not None and self.max_pages and slot.pages >= self.max_pages:
+            self._quit(slot)
+            BROWSER_RESTARTS.inc(reason="recycled")
+        if slot.driver is None:
+            slot.driver = self.make_driver()
+        return slot.driver
+
+    # --- One item on one browser; a failing browser is replaced and the item retried ---
+    def _attempt(self, slot, task, item, describe):
+        for attempt in range(self.retries + 1):
+            try:
+                driver = self._driver(slot)
+                slot.pages += 1
+                with self._lock:
+                    self.pages += 1
+                return task(driver, item)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logging.warning(f"⚠️ [{self.name}] Browser failed on {describe(item)} (attempt {attempt + 1}): {error}")
+                self._quit(slot)
+                BROWSER_RESTARTS.inc(reason="crashed")
+                with self._lock:
+                    self.restarts += 1
+        with self._lock:
+            self.failures += 1
+        dead_letters.add(describe(item), "selenium", f"browser failed: {error}")
+        return [], []
+
+    # --- Work queue: task(driver, item) -> (results, follow-up items) ---
+    # Follow-ups (e.g. the next search page) are queued for any free browser. Results come back in
+    # the order a single browser would have produced them: each item's, then its follow-ups'.
+    # describe(item) names an item (its URL) in logs and dead letters.
+    def run(self, items, task, describe=str):
+        work = queue.Queue()
+        results = {}
+        pending = [0]
+
+        def submit(key, item):
+            with self._lock:
+                pending[0] += 1
+            work.put((key, item))
+
+        def worker(slot):
+            while True:
+                entry = work.get()
+                if entry is None:
+                    return
+                key, item = entry
+                found, more = self._attempt(slot, task, item, describe)
+                results[key] = found
+                for i, extra in enumerate(more):
+                    submit(key + (i,), extra)
+                with self._lock:
+                    pending[0] -= 1
+                    done = pending[0] == 0
+                if done:
+                    for _ in self.slots:
+                        work.put(None)
+
+        for i, item in enumerate(items):
+            submit((i,), item)
+        if not pending[0]:
+            return []
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=self.name) as pool:
+            for future in [pool.submit(worker, slot) for slot in self.slots]:
+                future.result()
+        return [result for key in sorted(results) for result in results[key]]
+
+    # --- One value per item, in input order (None where the item failed) ---
+    def map(self, task, items, describe=str):
+        found = dict(self.run(list(enumerate(items)),
+                              lambda driver, entry: ([(entry[0], task(driver, entry[1]))], []),
+                              lambda entry: describe(entry[1])))
+        return [found.get(i) for i in range(len(items))]
+
+    def close(self):
+        for slot in self.slots:
+            self._quit(slot)
+
+    def summary(self):
+        return (f"♻️ Browser pool ({self.size} browsers): {self.pages} pages, "
+                f"{self.restarts} restarts, {self.failures} failed items")
+
+
+# --- Load url in a pooled browser and wait for selector, through the per-host scheduler ---
+# True once the page shows the selector. Timeouts are retried with backoff; after the last
+# attempt the page is dead-lettered and False returned. Other WebDriver errors propagate, so
+# the pool replaces the browser.
+def load_page(driver, url, selector, wait=20, kind="page", scheduler=host_scheduler):
+    for attempt in range(1, scheduler.max_attempts + 1):
+        scheduler.acquire(url)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            driver.get(url)
+            WebDriverWait(driver, wait).until(EC.presence_of_element_located((By.CSS_SELECTOR, selector)))
+            outcome = "ok"
+        except TimeoutException as e:
+            logging.warning(f"⚠️ Timed out loading {url} (attempt {attempt}): {e.msg}")
+            record_page_load(url, "selenium", "timeout")
+        except Exception:
+            record_page_load(url, "selenium", "error")
+            raise
+        finally:
+            scheduler.release(url, time.perf_counter() - start, outcome)
+        if outcome == "ok":
+            record_page_load(url, "selenium", "ok", time.perf_counter() - start)
+            return True
+        if attempt < scheduler.max_attempts:
+            time.sleep(scheduler.backoff(url, "selenium", attempt))
+    dead_letters.add(url, "selenium", f"no '{selector}' after {scheduler.max_attempts} attempts", kind)
+    return False
@@ -0,0 +1,52 @@
+import argparse
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Local fixture server ---
+# Serves saved pages from Scrapers/fixtures/ so the HTTP engine and parsers can be run
+# offline. Query strings are ignored; links inside the fixtures point at other fixture paths.
+#
+#   python Scrapers/fixture_server.py --port 8765
+#   -> http://127.0.0.1:8765/ebay/search_page1.html, http://127.0.0.1:8765/tpu/7k-single-axle-kits.html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    delay = 0.0  # simulated server latency per request
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        super().do_GET()
+
+
+# --- Start on a background thread; returns (server, base_url). Call server.shutdown() to stop ---
+def start_fixture_server(directory=FIXTURE_DIR, host="127.0.0.1", port=0, delay=0.0):
+    handler = type("Handler", (FixtureHandler,), {"delay": delay})
+    server = ThreadingHTTPServer((host, port), functools.partial(handler, directory=directory))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve saved scraper fixture pages")
+    parser.add_argument("--dir", default=FIXTURE_DIR)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of latency per request")
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(args.dir, args.host, args.port, args.delay)
+    print(f"🧪 Serving {args.dir} at {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+from metrics import counter, gauge
+
+# --- Per-host scheduling for every scraper page load (HTTP engine and pooled browsers) ---
+#   rate         token bucket per host: SCRAPE_HOST_RATE requests/sec to start, bursts of
+#                SCRAPE_HOST_BURST. Grows slowly while the host answers well, up to
+#                SCRAPE_HOST_MAX_RATE, and halves on 429 / 503 (plus any Retry-After pause).
+#   concurrency  requests in flight per host, AIMD: +1 per window of fast successes, halved
+#                (at most once per second) on errors, timeouts and answers slower than
+#                SCRAPE_SLOW_SECONDS. Stays within 1..SCRAPE_HOST_CONCURRENCY. Other 4xx answers
+#                (403, 404, 410) leave both limits alone.
+#   retries      up to SCRAPE_MAX_ATTEMPTS attempts with exponential backoff and full jitter
+#   dead letters pages that still failed are listed in data/dead_letters/<site>_<ts>.jsonl
+# Works from asyncio (HTTP engine) and from threads (browser pool) alike.
+
+HOST_RATE = float(os.environ.get("SCRAPE_HOST_RATE", "5"))
+HOST_MAX_RATE = float(os.environ.get("SCRAPE_HOST_MAX_RATE", "20"))
+HOST_MIN_RATE = 0.2
+HOST_BURST = int(os.environ.get("SCRAPE_HOST_BURST", "4"))
+HOST_CONCURRENCY = int(os.environ.get("SCRAPE_HOST_CONCURRENCY", "8"))
+SLOW_SECONDS = float(os.environ.get("SCRAPE_SLOW_SECONDS", "8"))
+MAX_ATTEMPTS = int(os.environ.get("SCRAPE_MAX_ATTEMPTS", "4"))
+BACKOFF_BASE = 0.5  # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 30.0
+RATE_INCREASE = 1.05  # per fast success
+DECREASE_COOLDOWN = 1.0  # seconds between two cuts for the same host
+POLL_SECONDS = 0.05  # wait step while a host is at its concurrency limit
+THROTTLE_STATUSES = (429, 503)
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+DEAD_LETTER_DIR = os.path.join("data", "dead_letters")
+
+HOST_LIMIT = gauge("trailer_scraper_host_limit", "Current adaptive per-host limits (rate per second, concurrency)",
+                   ("site", "limit"))
+RETRIES = counter("trailer_scraper_retries_total", "Scraper page loads retried after a failure", ("site", "engine"))
+DEAD_LETTERS = counter("trailer_scraper_dead_letters_total", "Scraper pages that failed permanently",
+                       ("site", "engine"))
+
+
+def host_of(url):
+    return urlparse(url).hostname or "unknown"
+
+
+# Retry-After in seconds (the HTTP-date form is ignored)
+def retry_after_seconds(value):
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class _Host:
+    def __init__(self, rate, burst, concurrency):
+        self.rate = rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.limit = float(max(1, min(4, concurrency)))  # start cautiously, grow on success
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.decreased_at = 0.0
+
+
+class HostScheduler:
+    def __init__(self, rate=HOST_RATE, max_rate=HOST_MAX_RATE, burst=HOST_BURST, concurrency=HOST_CONCURRENCY,
+                 max_attempts=MAX_ATTEMPTS, slow_seconds=SLOW_SECONDS):
+        self.rate = rate
+        self.max_rate = max(rate, max_rate)
+        self.burst = max(1, burst)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.slow_seconds = slow_seconds
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = _Host(self.rate, self.burst, self.concurrency)
+        return self.hosts[host]
+
+    # 0 when a slot and a token were taken, otherwise seconds to wait before asking again
+    def _try_acquire(self, url):
+        with self._lock:
+            h = self._host(host_of(url))
+            now = time.monotonic()
+            if now < h.paused_until:
+                return h.paused_until - now
+            if h.in_flight >= int(h.limit):
+                return POLL_SECONDS
+            h.tokens = min(self.burst, h.tokens + (now - h.updated) * h.rate)
+            h.updated = now
+            if h.tokens < 1:
+                return (1 - h.tokens) / h.rate
+            h.tokens -= 1
+            h.in_flight += 1
+            return 0
+
+    def acquire(self, url):
+        while True:
+            wait = self._try_acquire(url)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        while True:
+            wait = self._try_acquire(url)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    # --- After every acquire: outcome is "ok", "http_error" (4xx, neutral), "throttled" or
+    # "error" (5xx, timeouts, connection errors) ---
+    def release(self, url, seconds, outcome, retry_after=None):
+        host = host_of(url)
+        with self._lock:
+            h = self._host(host)
+            now = time.monotonic()
+            h.in_flight = max(0, h.in_flight - 1)
+            if outcome == "http_error":
+                pass
+            elif outcome == "ok" and seconds < self.slow_seconds:
+                h.limit = min(self.concurrency, h.limit + 1 / h.limit)
+                h.rate = min(self.max_rate, h.rate * RATE_INCREASE)
+            elif now - h.decreased_at >= DECREASE_COOLDOWN:
+                h.decreased_at = now
+                h.limit = max(1.0, h.limit / 2)
+                if outcome == "throttled":
+                    h.rate = max(HOST_MIN_RATE, h.rate / 2)
+            if outcome == "throttled" and retry_after:
+                h.paused_until = max(h.paused_until, now + retry_after)
+            rate, limit = h.rate, h.limit
+        HOST_LIMIT.set(round(rate, 2), site=host, limit="rate")
+        HOST_LIMIT.set(int(limit), site=host, limit="concurrency")
+
+    # Full jitter: anywhere between 0 and the exponential cap, so retries of a burst spread out
+    def backoff(self, url, engine, attempt):
+        RETRIES.inc(site=host_of(url), engine=engine)
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    def summary(self):
+        return ", ".join(f"{host}: {h.rate:.1f}/s x{int(h.limit)}" for host, h in sorted(self.hosts.items()))
+
+
+# --- Pages that failed after every attempt, saved for a re-run and for the run log ---
+class DeadLetters:
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, url, engine, reason, kind="page"):
+        DEAD_LETTERS.inc(site=host_of(url), engine=engine)
+        logging.error(f"💀 Giving up on {kind} {url} ({engine}): {reason}")
+        with self._lock:
+            self.entries.append({"url": url, "kind": kind, "engine": engine, "reason": str(reason),
+                                 "time": datetime.now().isoformat(timespec="seconds")})
+
+    def save(self, site, directory=DEAD_LETTER_DIR):
+        if not self.entries:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{site}_{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return path
+
+
+# Shared by the HTTP engine and the browser pool of one scraper process
+scheduler = HostScheduler()
+dead_letters = DeadLetters()
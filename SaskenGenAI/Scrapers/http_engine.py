@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+from host_scheduler import RETRY_STATUSES, THROTTLE_STATUSES, retry_after_seconds, scheduler as host_scheduler
+from metrics import SLOW_BUCKETS, counter, histogram  # rag_engine/, put on sys.path by the scraper scripts
+from parsers import parse_ebay_image, parse_ebay_search, parse_tpu_category
+
+# --- Browser-free scraping engine ---
+# Fetches server-rendered pages over one pooled aiohttp session and parses them with the
+# same selectors as the Selenium scrapers. Pages that fail or come back without the
+# expected elements (i.e. they need JavaScript) are returned so the caller can hand them
+# to the Selenium fallback. With a ScrapeState, listing pages are requested conditionally
+# and a 304 Not Modified answer is replayed from the previous run's parse. Every request
+# goes through the per-host scheduler (host_scheduler.py): rate, adaptive concurrency and
+# retries with jittered backoff.
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+
+PAGE_LOADS = counter("trailer_scraper_page_loads_total",
+                     "Scraper page loads by outcome (ok, not_modified, http_error, timeout, error)",
+                     ("site", "engine", "outcome"))
+PAGE_LOAD_SECONDS = histogram("trailer_scraper_page_load_seconds", "Time to load one scraper page",
+                              ("site", "engine"), buckets=SLOW_BUCKETS)
+
+
+# 📈 One page load attempt, from the HTTP engine or a Selenium driver
+def record_page_load(url, engine, outcome, seconds=None):
+    site = urlparse(url).hostname or "unknown"
+    PAGE_LOADS.inc(site=site, engine=engine, outcome=outcome)
+    if seconds is not None:
+        PAGE_LOAD_SECONDS.observe(seconds, site=site, engine=engine)
+
+
+class HttpFetcher:
+    def __init__(self, concurrency=16, per_host=8, timeout=20, headers=None, scheduler=host_scheduler):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.headers = {"User-Agent": USER_AGENT, "Accept-Language": "en-US,en;q=0.9", **(headers or {})}
+        self.pages = 0
+        self.bytes = 0
+        self.failures = 0
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=min(10, self.timeout)),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    # --- One page: {"url", "status", "html", "error", "elapsed", "etag", "last_modified"} ---
+    async def fetch(self, url, headers=None):
+        start = time.perf_counter()
+        error = None
+        attempts = self.scheduler.max_attempts
+        for attempt in range(1, attempts + 1):
+            await self.scheduler.acquire_async(url)
+            attempt_start = time.perf_counter()
+            outcome, retry_after = "error", None
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    html = await response.text(errors="replace")
+                    self.pages += 1
+                    self.bytes += len(html)
+                    record_page_load(url, "http", "not_modified" if response.status == 304
+                                     else "ok" if response.status < 400 else "http_error",
+                                     time.perf_counter() - attempt_start)
+                    if response.status in THROTTLE_STATUSES:
+                        outcome = "throttled"
+                        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                    elif 400 <= response.status < 500 and response.status not in RETRY_STATUSES:
+                        outcome = "http_error"  # refused / missing page: says nothing about host load
+                    elif response.status not in RETRY_STATUSES:
+                        outcome = "ok"
+                    if response.status in RETRY_STATUSES and attempt < attempts:
+                        error = f"HTTP {response.status}"
+                    else:
+                        return {"url": url, "status": response.status, "html": html, "error": None,
+                                "elapsed": time.perf_counter() - start,
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified")}
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"
+                record_page_load(url, "http", "timeout" if isinstance(e, asyncio.TimeoutError) else "error")
+            finally:
+                self.scheduler.release(url, time.perf_counter() - attempt_start, outcome, retry_after)
+            if attempt < attempts:
+                await asyncio.sleep(self.scheduler.backoff(url, "http", attempt))
+        self.failures += 1
+        logging.warning(f"⚠️ HTTP fetch failed for {url}: {error}")
+        return {"url": url, "status": None, "html": "", "error": error,
+                "elapsed": time.perf_counter() - start, "etag": None, "last_modified": None}
+
+    async def fetch_all(self, urls):
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+
+def _ok(page):
+    return page["status"] == 200 and page["html"]
+
+
+# --- Listing page, conditionally when a previous run left its validators: (page, parsed or None) ---
+# parsed is what the previous run got out of the page when the server answers 304 Not Modified.
+async def _fetch_listing_page(url, fetcher, state):
+    page = await fetcher.fetch(url, state.conditional_headers(url) if state else None)
+    if page["status"] == 304 and state:
+        return page, state.cached_page(url)
+    return page, None
+
+
+# --- TrailerPartsUnlimited: all category URLs concurrently ---
+async def scrape_tpu(urls, fetcher, state=None):
+    products, fallback_urls = [], []
+    for page, cached in await asyncio.gather(*(_fetch_listing_page(url, fetcher, state) for url in urls)):
+        if cached:
+            found = cached[0]
+        else:
+            found = parse_tpu_category(page["html"], page["url"]) if _ok(page) else []
+            if found and state:
+                state.record_page(page["url"], page, found)
+        if found:
+            logging.info(f"✅ [http] Found {len(found)} products on {page['url']}.")
+            products.extend(found)
+        else:
+            logging.warning(f"⚠️ [http] No product cards on {page['url']} (status {page['status']}); "
+                            f"falling back to Selenium.")
+            fallback_urls.append(page["url"])
+    return products, fallback_urls
+
+
+# --- eBay: follow pagination per search URL (search URLs run concurrently) ---
+# Returns the listings plus (search URL, page URL) pairs where Selenium has to take over.
+async def _scrape_ebay_search(base_url, fetcher, max_pages, state=None):
+    listings = []
+    current_url = base_url
+    for _ in range(max_pages):
+        logging.info(f"🌐 [http] Scraping: {current_url}")
+        page, cached = await _fetch_listing_page(current_url, fetcher, state)
+        if cached:
+            found, next_url = cached
+        else:
+            found, next_url = parse_ebay_search(page["html"], current_url) if _ok(page) else ([], None)
+            if found and state:
+                state.record_page(current_url, page, found, next_url)
+        if not found:
+            logging.warning(f"⚠️ [http] No listings on {current_url} (status {page['status']}).")
+            return listings, (base_url, current_url)
+        for listing in found:
+            listing["source"] = base_url
+        listings.extend(found)
+        if not next_url:
+            break
+        current_url = next_url
+    return listings, None
+
+
+async def scrape_ebay(urls, fetcher, max_pages=50, state=None):
+    listings, fallback_urls = [], []
+    results = await asyncio.gather(*(_scrape_ebay_search(url, fetcher, max_pages, state) for url in urls))
+    for found, fallback in results:
+        listings.extend(found)
+        if fallback:
+            fallback_urls.append(fallback)
+    return listings, fallback_urls
+
+
+# --- eBay detail pages: {link: image_url} for every listing whose image was found ---
+async def resolve_ebay_images(links, fetcher):
+    images = {}
+    for page in await fetcher.fetch_all(links):
+        image_url = parse_ebay_image(page["html"]) if _ok(page) else None
+        if image_url:
+            images[page["url"]] = image_url
+    return images
+
+
+def rate_line(label, count, elapsed):
+    rate = count / elapsed if elapsed > 0 else 0
+    return f"{label}: {count} items in {elapsed:.1f}s ({rate:.1f} items/sec)"
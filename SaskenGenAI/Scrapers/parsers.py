@@ -0,0 +1,117 @@
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# --- HTML parsers for server-rendered pages ---
+# Same CSS selectors and price rules as the Selenium scrapers, applied to raw HTML.
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/150"
+PRICE_PATTERN = re.compile(r"\$?\d{1,4}\.\d{2}")
+TPU_TITLE_SELECTORS = ["h4.card-title a", ".card-title a", ".card-title", ".name a"]
+TPU_PRICE_SELECTOR = ".card-body .price--withoutTax, .card-body .price--main, .card-body .price"
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+
+def make_soup(html):
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+# --- Price: last "$1234.56"-style amount in the text, without the "$" ---
+def extract_price(text):
+    prices_found = PRICE_PATTERN.findall(text or "")
+    if prices_found:
+        return prices_found[-1].replace("$", "")
+    return None
+
+
+# --- eBay search results page -> (listings, next page URL or None) ---
+def parse_ebay_search(html, page_url):
+    soup = make_soup(html)
+    listings = []
+    for item in soup.select("li.s-item"):
+        title_el = item.select_one(".s-item__title")
+        price_el = item.select_one(".s-item__price")
+        link_el = item.select_one(".s-item__link")
+        if title_el is None or price_el is None or link_el is None:
+            continue
+        title = title_el.get_text(" ", strip=True)
+        if not title or "results matching" in title.lower():
+            continue
+        price = price_el.get_text(" ", strip=True).replace("$", "").replace(",", "").strip()
+        listings.append({
+            "title": title,
+            "price": price,
+            "link": urljoin(page_url, link_el.get("href", "")),
+        })
+
+    next_url = None
+    next_btn = soup.select_one("a.pagination__next")
+    if next_btn is not None and next_btn.get("href"):
+        if "pagination__next--disabled" not in (next_btn.get("class") or []):
+            next_url = urljoin(page_url, next_btn["href"])
+    return listings, next_url
+
+
+# --- eBay listing page -> main carousel image URL or None ---
+def parse_ebay_image(html):
+    img = make_soup(html).select_one("div.ux-image-carousel-item img")
+    if img is None:
+        return None
+    src = img.get("src") or img.get("data-src")
+    if src and not src.endswith("1x1.gif"):
+        return src
+    return None
+
+
+# --- TrailerPartsUnlimited category page -> products ---
+def parse_tpu_card(card, page_url):
+    name = ""
+    product_url = ""
+    for sel in TPU_TITLE_SELECTORS:
+        elem = card.select_one(sel)
+        if elem is not None:
+            name = elem.get_text(" ", strip=True)
+            product_url = urljoin(page_url, elem.get("href") or page_url)
+            break
+    if not name:
+        return None
+
+    price = "N/A"
+    price_block = card.select_one(TPU_PRICE_SELECTOR)
+    if price_block is not None:
+        found = extract_price(price_block.get_text(" ", strip=True))
+        if found is None:
+            body = card.select_one(".card-body")
+            found = extract_price(body.get_text(" ", strip=True)) if body is not None else None
+        if found is not None:
+            price = found
+
+    image_url = PLACEHOLDER_IMAGE
+    img = card.select_one("img")
+    if img is not None:
+        src = img.get("data-src") or img.get("src") or ""
+        if src and "placeholder" not in src:
+            image_url = src
+
+    return {
+        "name": name,
+        "price": price,
+        "url": product_url,
+        "source_site": "trailerpartsunlimited.com",
+        "image_url": image_url,
+    }
+
+
+def parse_tpu_category(html, page_url):
+    products = []
+    for card in make_soup(html).select(".productGrid .card"):
+        product = parse_tpu_card(card, page_url)
+        if product is not None:
+            products.append(product)
+    return products
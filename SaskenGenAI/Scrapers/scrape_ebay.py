@@ -1,17 +1,29 @@
+import asyncio
 import time
 import csv
 import json
 import logging
 import os
+import sys
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
+# Shared helpers (metrics) live in rag_engine/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag_engine"))
+from http_engine import HttpFetcher, rate_line, resolve_ebay_images, scrape_ebay
+from metrics import export_on_exit, record_stage_items
+from profiling import profile_stage
+from scrape_state import ScrapeState, listing_key
+from browser_pool import BROWSER_POOL_SIZE, BrowserPool, load_page
+from host_scheduler import dead_letters, scheduler
+
+export_on_exit("scrape_ebay")
+profile_stage("scrape_ebay")  # --profile or TRAILER_PROFILE=1
+
 # --- Setup Folders ---
 os.makedirs("logs", exist_ok=True)
 os.makedirs("data", exist_ok=True)
@@ -24,120 +36,207 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+# --- Engine ---
+# "http": fetch server-rendered pages over pooled async HTTP (Selenium only for pages that need JS)
+# "selenium": drive Chrome for every page
+SCRAPER_ENGINE = os.environ.get("SCRAPER_ENGINE", "http")
+
+# --- Browser Settings (pool size: BROWSER_POOL_SIZE, see browser_pool.py) ---
+PAGE_TIMEOUT = 15  # seconds allowed for one page to load in a pooled browser
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/150"
+
 # --- Setup Chrome Options ---
-options = Options()
-# options.add_argument("--headless")  # Uncomment to run headless
-options.add_argument("--disable-gpu")
-options.add_argument("--window-size=1920,1080")
-options.add_argument("--disable-extensions")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("user-agent=Mozilla/5.0")
-
-# --- Launch WebDriver ---
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+def make_options(headless=False):
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("user-agent=Mozilla/5.0")
+    return options
 
 # --- Search URLs ---
 urls = [
     "https://www.ebay.com/sch/i.html?_nkw=trailer+axles&_sacat=0"
-    
+
 ]
-    
 
-all_data = []
+_driver_path = None
+
+
+def get_driver_path():
+    global _driver_path
+    if _driver_path is None:
+        _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+
+# --- One headless browser for the pool shared by the listing pass and the image stage ---
+def new_driver():
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=make_options(headless=True))
+    driver.set_page_load_timeout(PAGE_TIMEOUT)
+    return driver
 
-# --- Scrape Loop ---
-for base_url in urls:
-    current_url = base_url
-    while True:
-        logging.info(f"🌐 Scraping: {current_url}")
-        driver.get(current_url)
 
+browsers = BrowserPool(new_driver, name="ebay-browser")
+
+
+# --- Selenium: one search results page -> (listings, [next page]) ---
+# The next page's URL comes from this page, so it is queued as a follow-up work item. A page
+# that fails after every retry is replayed from the last run, so the rest of the search goes on.
+def scrape_search_page(driver, page):
+    base_url, current_url = page
+    logging.info(f"🌐 Scraping: {current_url}")
+    if not load_page(driver, current_url, "li.s-item", wait=10, kind="search_page"):
+        cached = state.stale_page(current_url)
+        if not cached:
+            return [], []
+        found, next_url = cached
+        for listing in found:
+            listing["source"] = base_url
+        return found, [(base_url, next_url)] if next_url else []
+
+    found = []
+    items = driver.find_elements(By.CSS_SELECTOR, "li.s-item")
+
+    for item in items:
         try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "li.s-item"))
-            )
-        except Exception as e:
-            logging.warning(f"⚠️ Page load failed: {e}")
-            break
-
-        items = driver.find_elements(By.CSS_SELECTOR, "li.s-item")
-
-        for item in items:
-            try:
-                title = item.find_element(By.CSS_SELECTOR, ".s-item__title").text.strip()
-                if not title or "results matching" in title.lower():
-                    continue
-
-                price_elem = item.find_element(By.CSS_SELECTOR, ".s-item__price")
-                price = price_elem.text.replace("$", "").replace(",", "").strip()
-
-                link = item.find_element(By.CSS_SELECTOR, ".s-item__link").get_attribute("href")
-
-                # --- Extract Image from Product Page ---
-                image_url = "https://via.placeholder.com/150"
-                try:
-                    original_window = driver.current_window_handle
-                    driver.execute_script("window.open('');")
-                    WebDriverWait(driver, 10).until(EC.number_of_windows_to_be(2))
-
-                    driver.switch_to.window(driver.window_handles[1])
-                    driver.get(link)
-
-                    WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.ux-image-carousel-item img"))
-                    )
-
-                    img_el = driver.find_element(By.CSS_SELECTOR, "div.ux-image-carousel-item img")
-                    src = img_el.get_attribute("src")
-                    if src and not src.endswith("1x1.gif"):
-                        image_url = src
-
-                    driver.close()
-                    driver.switch_to.window(original_window)
-                except Exception as e:
-                    logging.warning(f"⚠️ Could not get image for '{title}': {e}")
-                    try:
-                        if len(driver.window_handles) > 1:
-                            driver.close()
-                            driver.switch_to.window(original_window)
-                    except:
-                        pass
-
-                product = {
-                    "title": title,
-                    "price": price,
-                    "link": link,
-                    "seller": "eBay",
-                    "source": base_url,
-                    "timestamp": datetime.now().isoformat(),
-                    "image_url": image_url
-                }
-                all_data.append(product)
-
-            except Exception as e:
-                logging.debug(f"🔁 Skipped item due to error: {e}")
+            title = item.find_element(By.CSS_SELECTOR, ".s-item__title").text.strip()
+            if not title or "results matching" in title.lower():
                 continue
 
-        # --- Handle Pagination ---
-        try:
-            next_btn = driver.find_element(By.CSS_SELECTOR, "a.pagination__next")
-            if "pagination__next--disabled" in next_btn.get_attribute("class"):
-                break
-            current_url = next_btn.get_attribute("href")
-            time.sleep(1)
-        except:
-            break
+            price_elem = item.find_element(By.CSS_SELECTOR, ".s-item__price")
+            price = price_elem.text.replace("$", "").replace(",", "").strip()
+
+            link = item.find_element(By.CSS_SELECTOR, ".s-item__link").get_attribute("href")
 
-driver.quit()
+            found.append({"title": title, "price": price, "link": link, "source": base_url})
+
+        except Exception as e:
+            logging.debug(f"🔁 Skipped item due to error: {e}")
+            continue
+
+    # --- Handle Pagination (pacing between pages is up to the host scheduler) ---
+    next_url = None
+    try:
+        next_btn = driver.find_element(By.CSS_SELECTOR, "a.pagination__next")
+        if "pagination__next--disabled" not in next_btn.get_attribute("class"):
+            next_url = next_btn.get_attribute("href")
+    except Exception:
+        pass
+    state.record_page(current_url, {}, found, next_url)
+    return found, [(base_url, next_url)] if next_url else []
+
+
+# --- Phase 1: Listing Pass (title, price, link only) ---
+listing_start = time.perf_counter()
+listings = []
+images = {}
+selenium_pages = [(url, url) for url in urls]
+state = ScrapeState("ebay")  # SCRAPE_INCREMENTAL=0 to scrape everything from scratch
+
+if SCRAPER_ENGINE == "http":
+    async def scrape_listings_http():
+        async with HttpFetcher() as fetcher:
+            return await scrape_ebay(urls, fetcher, state=state)
+
+    http_listings, selenium_pages = asyncio.run(scrape_listings_http())
+    listings.extend(http_listings)
+
+if selenium_pages:
+    get_driver_path()  # install chromedriver once, before the browsers start
+    listings.extend(browsers.run(selenium_pages, scrape_search_page, describe=lambda page: page[1]))
+
+listings = [{
+    "title": listing["title"],
+    "price": listing["price"],
+    "link": listing["link"],
+    "seller": "eBay",
+    "source": listing["source"],
+    "timestamp": datetime.now().isoformat(),
+} for listing in listings]
+
+message = rate_line("📋 Listing pass", len(listings), time.perf_counter() - listing_start)
+logging.info(message)
+print(message)
+
+# --- Unchanged listings (same link, title and price as last run) keep their image ---
+statuses = state.classify(listings, "link", "title")
+for listing in listings:
+    image_url = state.known_image(listing["link"], statuses[listing_key(listing["link"])], PLACEHOLDER_IMAGE)
+    if image_url:
+        images[listing["link"]] = image_url
+
+
+# --- Phase 2: Image Resolution on the Browser Pool ---
+# Listings whose image the HTTP engine could not read (or all of them with the selenium
+# engine) go to the pooled headless browsers. A page that keeps timing out only costs that
+# one item its image; any other error replaces the browser and retries the item.
+def resolve_image(driver, listing):
+    if not load_page(driver, listing["link"], "div.ux-image-carousel-item img", wait=5, kind="image"):
+        return PLACEHOLDER_IMAGE
+    src = driver.find_element(By.CSS_SELECTOR, "div.ux-image-carousel-item img").get_attribute("src")
+    if src and not src.endswith("1x1.gif"):
+        return src
+    return PLACEHOLDER_IMAGE
+
+
+if SCRAPER_ENGINE == "http" and listings:
+    async def resolve_images_http(links):
+        async with HttpFetcher() as fetcher:
+            return await resolve_ebay_images(links, fetcher)
+
+    image_start = time.perf_counter()
+    pending = [listing["link"] for listing in listings if listing["link"] not in images]
+    images.update(asyncio.run(resolve_images_http(pending)))
+    message = rate_line("🖼️ HTTP image stage", len(pending), time.perf_counter() - image_start)
+    logging.info(message)
+    print(message)
+
+unresolved = [listing for listing in listings if listing["link"] not in images]
+if unresolved:
+    image_start = time.perf_counter()
+    get_driver_path()  # install chromedriver once, before the browsers start
+    for listing, image_url in zip(unresolved, browsers.map(resolve_image, unresolved, describe=lambda listing: listing["link"])):
+        images[listing["link"]] = image_url or PLACEHOLDER_IMAGE
+
+    message = rate_line(f"🖼️ Selenium image stage ({BROWSER_POOL_SIZE} browsers)", len(unresolved),
+                        time.perf_counter() - image_start)
+    logging.info(message)
+    print(message)
+
+browsers.close()
+if browsers.pages:
+    logging.info(browsers.summary())
+    print(browsers.summary())
+
+all_data = [{**listing, "image_url": images.get(listing["link"], PLACEHOLDER_IMAGE)} for listing in listings]
+
+if all_data:  # an empty run (blocked, site down) keeps the previous state
+    state.save(all_data, "link", "title")
+logging.info(state.summary())
+print(state.summary())
+
+# --- Pages that failed after every retry: logged loudly and saved for a re-run ---
+logging.info(f"🚦 Host limits at the end of the run: {scheduler.summary()}")
+dead_letter_file = dead_letters.save("ebay")
+if dead_letter_file:
+    message = f"⚠️ {len(dead_letters.entries)} pages failed permanently, listed in {dead_letter_file}"
+    logging.warning(message)
+    print(message)
 
 # --- Save Output Files ---
 timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-json_file = f"data/ebay_products_{timestamp}.json"
+json_file = f"data/ebay_products_{timestamp}.jsonl"
 csv_file = f"data/ebay_products_{timestamp}.csv"
 
+# One JSON record per line, so the merge step can stream it
 with open(json_file, "w", encoding="utf-8") as f_json:
-    json.dump(all_data, f_json, indent=2, ensure_ascii=False)
+    for record in all_data:
+        f_json.write(json.dumps(record, ensure_ascii=False) + "\n")
 
 csv_fields = list(all_data[0].keys()) if all_data else [
     "title", "price", "link", "seller", "source", "timestamp", "image_url"
@@ -148,6 +247,7 @@ with open(csv_file, "w", newline="", encoding="utf-8") as f_csv:
     writer.writerows(all_data)
 
 logging.info(f"✅ Scraped {len(all_data)} items.")
+record_stage_items("scrape_ebay", items_out=len(all_data))
 print(f"✅ Done! Scraped {len(all_data)} products from eBay.")
 print(f"📝 Saved to {json_file} and {csv_file}")
 
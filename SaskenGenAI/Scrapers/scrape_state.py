@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+from metrics import gauge
+
+# --- Incremental scrape state (data/scrape_state/<site>.json) ---
+# Remembers, between runs:
+#   pages     per listing-page URL: ETag / Last-Modified and what the page parsed to, so a
+#             304 Not Modified answer is replayed from here instead of downloaded and parsed
+#   listings  per listing: a fingerprint (URL + title + price) and the image URL resolved for
+#             it, so unchanged listings skip their detail page / image lookup and carry the
+#             image forward
+# Network requests then follow the churn of the catalog rather than its size. Delete the file
+# (or set SCRAPE_INCREMENTAL=0) to scrape everything from scratch.
+
+STATE_DIR = os.path.join("data", "scrape_state")
+INCREMENTAL = os.environ.get("SCRAPE_INCREMENTAL", "1") == "1"
+STATUSES = ("new", "changed", "unchanged", "removed")
+
+SCRAPE_LISTINGS = gauge("trailer_scraper_listings", "Listings in the last scrape by change since the previous one",
+                        ("site", "status"))
+
+
+# eBay item links carry per-visit tracking parameters; the item path alone identifies the listing
+def listing_key(url):
+    parts = urlsplit((url or "").strip())
+    query = "" if "/itm/" in parts.path else parts.query
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def fingerprint(url, title, price):
+    text = "\x1f".join([listing_key(url), (title or "").strip(), str(price or "").strip()])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ScrapeState:
+    def __init__(self, site, directory=STATE_DIR, enabled=INCREMENTAL):
+        self.site = site
+        self.path = os.path.join(directory, f"{site}.json")
+        self.enabled = enabled
+        self.pages = {}
+        self.listings = {}
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.not_modified = 0
+        self.stale = 0
+        self.images_reused = 0
+        if enabled:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"⚠️ Ignoring unreadable scrape state {self.path}: {e}")
+            return
+        self.pages = state.get("pages", {})
+        self.listings = state.get("listings", {})
+
+    # --- Listing pages: conditional request headers and the replay of a 304 ---
+    def conditional_headers(self, url):
+        page = self.pages.get(url) if self.enabled else None
+        if not page:
+            return {}
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def cached_page(self, url):
+        page = self.pages.get(url)
+        if page is None:
+            return None
+        self.not_modified += 1
+        return [dict(item) for item in page["items"]], page.get("next_url")
+
+    # A page that failed for good this run: what it held last time, so the catalog does not shrink
+    def stale_page(self, url):
+        page = self.pages.get(url) if self.enabled else None
+        if page is None:
+            return None
+        self.stale += 1
+        logging.warning(f"⚠️ Reusing the last good parse of {url}")
+        return [dict(item) for item in page["items"]], page.get("next_url")
+
+    # Every parsed page is kept (for a 304 or a failed load next time), validators if the server sent any
+    def record_page(self, url, response, items, next_url=None):
+        if not self.enabled:
+            return
+        self.pages[url] = {"etag": response.get("etag"), "last_modified": response.get("last_modified"),
+                           "items": [dict(item) for item in items], "next_url": next_url}
+
+    # --- Listings: classify against the previous run ---
+    # Returns {key: status} for this run's listings; counts include listings that disappeared.
+    def classify(self, listings, url_field, title_field):
+        statuses = {}
+        for listing in listings:
+            key = listing_key(listing[url_field])
+            previous = self.listings.get(key) if self.enabled else None
+            current = fingerprint(listing[url_field], listing.get(title_field), listing.get("price"))
+            if previous is None:
+                statuses[key] = "new"
+            elif previous["fingerprint"] != current:
+                statuses[key] = "changed"
+            else:
+                statuses[key] = "unchanged"
+        self.counts = dict.fromkeys(STATUSES, 0)
+        for status in statuses.values():
+            self.counts[status] += 1
+        self.counts["removed"] = sum(1 for key in self.listings if key not in statuses) if self.enabled else 0
+        for status, count in self.counts.items():
+            SCRAPE_LISTINGS.set(count, site=self.site, status=status)
+        return statuses
+
+    # Previously resolved image of an unchanged listing (None when it has to be looked up)
+    def known_image(self, url, status, placeholder):
+        if status != "unchanged":
+            return None
+        image_url = self.listings.get(listing_key(url), {}).get("image_url")
+        if not image_url or image_url == placeholder:
+            return None
+        self.images_reused += 1
+        return image_url
+
+    # --- Replace the stored listings with this run's, then write atomically ---
+    def save(self, listings, url_field, title_field):
+        if not self.enabled:
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        previous = self.listings
+        self.listings = {}
+        for listing in listings:
+            key = listing_key(listing[url_field])
+            self.listings[key] = {
+                "fingerprint": fingerprint(listing[url_field], listing.get(title_field), listing.get("price")),
+                "image_url": listing.get("image_url"),
+                "first_seen": previous.get(key, {}).get("first_seen", now),
+                "last_seen": now,
+            }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"site": self.site, "saved": now, "pages": self.pages, "listings": self.listings}, f,
+                      ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        c = self.counts
+        return (f"🔁 Listings: {c['new']} new, {c['changed']} changed, {c['unchanged']} unchanged, "
+                f"{c['removed']} removed ({self.not_modified} pages not modified, {self.stale} failed pages "
+                f"reused from the last run, {self.images_reused} images carried forward)")
@@ -1,3 +1,4 @@
+import asyncio
 import time
 import json
 import csv
@@ -7,11 +8,23 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import os
 import re
+import sys
+
+# Shared helpers (metrics) live in rag_engine/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rag_engine"))
+from http_engine import HttpFetcher, rate_line, scrape_tpu
+from metrics import export_on_exit, record_stage_items
+from profiling import profile_stage
+from parsers import PLACEHOLDER_IMAGE, TPU_PRICE_SELECTOR, TPU_TITLE_SELECTORS, extract_price
+from scrape_state import ScrapeState
+from browser_pool import BrowserPool, load_page
+from host_scheduler import dead_letters, scheduler
+
+export_on_exit("scrape_tpu")
+profile_stage("scrape_tpu")  # --profile or TRAILER_PROFILE=1
 
 # --- Setup ---
 os.makedirs("data", exist_ok=True)
@@ -20,14 +33,15 @@ log_file = f"logs/trailerpartsunlimited_scrape_{datetime.now().strftime('%Y%m%d'
 logging.basicConfig(filename=log_file, level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logging.info("🚚 Starting scrape_trailerpartsunlimited script")
 
-# --- Selenium config ---
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--window-size=1920,1080")
-options.add_argument("user-agent=Mozilla/5.0")
-options.add_argument("--log-level=3")
+# --- Engine ---
+# "http": fetch server-rendered pages over pooled async HTTP (Selenium only for pages that need JS)
+# "selenium": drive Chrome for every page
+SCRAPER_ENGINE = os.environ.get("SCRAPER_ENGINE", "http")
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# --- Selenium card extraction ---
+# "bulk": one execute_script call returns every card on the page as JSON
+# "elements": one find_element/get_attribute round trip per field (legacy)
+EXTRACT_MODE = os.environ.get("TPU_EXTRACT_MODE", "bulk")
 
 # --- Target URLs ---
 urls = [
@@ -39,21 +53,82 @@ urls = [
     "https://trailerpartsunlimited.com/categories/axles/single-axle-kits/6k-single-axle-kits.html"
 ]
 
-all_products = []
 
-for url in urls:
+# --- Bulk extraction: same selectors as the per-element path, evaluated in the page ---
+BULK_EXTRACT_JS = """
+const titleSelectors = arguments[0];
+const priceSelector = arguments[1];
+return Array.from(document.querySelectorAll(".productGrid .card")).map(card => {
+    let name = "", url = null;
+    for (const sel of titleSelectors) {
+        const el = card.querySelector(sel);
+        if (el) {
+            name = (el.innerText || "").trim();
+            url = el.href || null;
+            break;
+        }
+    }
+    const priceEl = card.querySelector(priceSelector);
+    const body = card.querySelector(".card-body");
+    const img = card.querySelector("img");
+    return {
+        name: name,
+        url: url,
+        price_text: priceEl ? (priceEl.innerText || "").trim() : null,
+        body_text: body ? (body.innerText || "").trim() : "",
+        image: img ? (img.getAttribute("data-src") || img.src || "") : null
+    };
+});
+"""
+
+
+def extract_cards_bulk(driver, url):
+    products = []
+    for card in driver.execute_script(BULK_EXTRACT_JS, TPU_TITLE_SELECTORS, TPU_PRICE_SELECTOR):
+        if not card["name"]:
+            logging.warning("⚠️ Skipped product — no name found.")
+            continue
+
+        # --- Price: same regex rules as the per-element path, run in Python ---
+        price = "N/A"
+        if card["price_text"] is not None:
+            price = extract_price(card["price_text"]) or extract_price(card["body_text"]) or "N/A"
+
+        image_url = card["image"] or ""
+        if "placeholder" in image_url or not image_url:
+            image_url = PLACEHOLDER_IMAGE
+
+        products.append({
+            "name": card["name"],
+            "price": price,
+            "url": card["url"] or url,
+            "source_site": "trailerpartsunlimited.com",
+            "image_url": image_url
+        })
+    return products
+
+
+# --- Selenium scrape of one category page on a pooled browser (None if the page failed) ---
+def scrape_category(driver, url):
+    products_found = []
     logging.info(f"🌐 Scraping URL: {url}")
-    driver.get(url)
-
-    try:
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, ".productGrid .card"))
-        )
-        products = driver.find_elements(By.CSS_SELECTOR, ".productGrid .card")
-        logging.info(f"✅ Found {len(products)} products on {url}.")
-    except Exception as e:
-        logging.error(f"❌ Could not load product list: {e}")
-        continue
+    if not load_page(driver, url, ".productGrid .card", wait=20, kind="category_page"):
+        logging.error(f"❌ Could not load product list: {url}")
+        return None
+
+    if EXTRACT_MODE == "bulk":
+        extract_start = time.perf_counter()
+        try:
+            found = extract_cards_bulk(driver, url)
+        except Exception as e:
+            logging.error(f"❌ Bulk extraction failed on {url}: {e}")
+            return None
+        logging.info(f"✅ Found {len(found)} products on {url} "
+                     f"(extracted in {(time.perf_counter() - extract_start) * 1000:.0f} ms).")
+        return found
+
+    products = driver.find_elements(By.CSS_SELECTOR, ".productGrid .card")
+    logging.info(f"✅ Found {len(products)} products on {url}.")
 
     for p in products:
         try:
@@ -107,13 +182,81 @@ for url in urls:
                 "source_site": "trailerpartsunlimited.com",
                 "image_url": image_url
             }
-            all_products.append(product_info)
+            products_found.append(product_info)
 
         except Exception as e:
             logging.warning(f"⚠️ Skipped a product due to error: {e}")
             continue
 
-driver.quit()
+    return products_found
+
+
+# --- Selenium config ---
+def make_driver(driver_path):
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("user-agent=Mozilla/5.0")
+    options.add_argument("--log-level=3")
+    return webdriver.Chrome(service=Service(driver_path), options=options)
+
+
+# --- Selenium scrape of a list of category URLs, BROWSER_POOL_SIZE pages at a time ---
+def scrape_with_selenium(urls):
+    driver_path = ChromeDriverManager().install()  # once, before the browsers start
+    with BrowserPool(lambda: make_driver(driver_path), name="tpu-browser") as pool:
+        results = pool.map(scrape_category, urls)
+        logging.info(pool.summary())
+    products = []
+    for url, found in zip(urls, results):
+        if found is None:  # failed for good: keep what the page held last run
+            found = (state.stale_page(url) or [[]])[0]
+        else:
+            state.record_page(url, {}, found)
+        products.extend(found)
+    return products
+
+
+all_products = []
+selenium_urls = urls
+scrape_start = time.perf_counter()
+state = ScrapeState("trailerpartsunlimited")  # SCRAPE_INCREMENTAL=0 to scrape everything from scratch
+
+# --- HTTP engine first; pages without server-rendered cards fall back to Selenium ---
+if SCRAPER_ENGINE == "http":
+    async def scrape_http():
+        async with HttpFetcher() as fetcher:
+            return await scrape_tpu(urls, fetcher, state=state)
+
+    http_products, selenium_urls = asyncio.run(scrape_http())
+    all_products.extend(http_products)
+    message = rate_line("⚡ HTTP engine", len(http_products), time.perf_counter() - scrape_start)
+    logging.info(message)
+    print(message)
+
+if selenium_urls:
+    selenium_start = time.perf_counter()
+    selenium_products = scrape_with_selenium(selenium_urls)
+    all_products.extend(selenium_products)
+    message = rate_line(f"🌐 Selenium ({len(selenium_urls)} pages)", len(selenium_products),
+                        time.perf_counter() - selenium_start)
+    logging.info(message)
+    print(message)
+
+# --- Changes since the last run (category pages carry the images, so there is nothing to skip) ---
+state.classify(all_products, "url", "name")
+if all_products:  # an empty run (blocked, site down) keeps the previous state
+    state.save(all_products, "url", "name")
+logging.info(state.summary())
+print(state.summary())
+
+# --- Pages that failed after every retry: logged loudly and saved for a re-run ---
+logging.info(f"🚦 Host limits at the end of the run: {scheduler.summary()}")
+dead_letter_file = dead_letters.save("trailerpartsunlimited")
+if dead_letter_file:
+    message = f"⚠️ {len(dead_letters.entries)} pages failed permanently, listed in {dead_letter_file}"
+    logging.warning(message)
+    print(message)
 
 # --- Save CSV ---
 timestamp = datetime.now().strftime("%Y%m%d")
@@ -123,14 +266,16 @@ with open(csv_file, "w", newline="", encoding="utf-8") as f:
     writer.writeheader()
     writer.writerows(all_products)
 
-# --- Save JSON ---
+# --- Save JSON Lines (one record per line, streamed by the merge step) ---
 timestamp_json = datetime.now().strftime("%Y%m%d_%H%M")
-relative_path = f"data/trailerpartsunlimited_products_{timestamp_json}.json"
+relative_path = f"data/trailerpartsunlimited_products_{timestamp_json}.jsonl"
 abs_path = os.path.abspath(relative_path)
 
 with open(abs_path, "w", encoding="utf-8") as f_json:
-    json.dump(all_products, f_json, indent=4, ensure_ascii=False)
+    for product in all_products:
+        f_json.write(json.dumps(product, ensure_ascii=False) + "\n")
 
+record_stage_items("scrape_tpu", items_out=len(all_products))
 message = f"✅ Saved {len(all_products)} products to {relative_path}"
 logging.info(message)
 print(message)
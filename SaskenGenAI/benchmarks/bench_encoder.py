@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# ⚙️ Encoder backends head to head: load time, batch throughput, single-query latency and parity
+#
+# Each (backend, threads) pair runs in a fresh child process (pipeline.run_stage_process), because
+# thread settings are process-wide and load time should include imports. Texts are synthetic
+# product names (batch encoding, as in the embed step) and shopper queries (one at a time, as in
+# search). Vectors of the same texts are compared with the PyTorch ones for parity.
+#
+#   python benchmarks/bench_encoder.py --texts 5000 --threads 1,2,4
+#   python benchmarks/bench_encoder.py --backends onnx,onnx-int8 --threads 4
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import BASE_DIR, RESULTS_DIR, git_commit, percentiles, require  # noqa: E402
+from pipeline import Stage, run_stage_process  # noqa: E402
+from synthetic_catalog import generate, make_queries  # noqa: E402
+from encoder_backend import BACKENDS, PARITY_MIN_COSINE, export_dir, load_encoder  # noqa: E402
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+PARITY_TEXTS = 500  # texts whose vectors are compared across backends
+WORKER_SCRIPT = os.path.relpath(os.path.abspath(__file__), os.path.dirname(BENCH_DIR))
+BACKEND_MODULES = {"torch": ["sentence_transformers"],
+                   "onnx": ["onnxruntime", "tokenizers"], "onnx-int8": ["onnxruntime", "tokenizers"]}
+
+
+# 🔎 Child process: load the encoder, encode the names in batches, then each query on its own
+def worker():
+    with open(os.environ["ENCODER_BENCH_TEXTS"], encoding="utf-8") as f:
+        texts = json.load(f)
+    start = time.perf_counter()
+    encoder = load_encoder(MODEL_NAME)  # ENCODER_BACKEND / ENCODER_THREADS from the environment
+    encoder.encode(["warm up"])
+    loaded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = np.asarray(encoder.encode(texts["names"], batch_size=64), dtype=np.float32)
+    batch_s = time.perf_counter() - start
+
+    samples = []
+    for query in texts["queries"]:
+        t = time.perf_counter()
+        encoder.encode([query])
+        samples.append((time.perf_counter() - t) * 1000)
+
+    np.save(os.environ["ENCODER_BENCH_VECTORS"], vectors[:PARITY_TEXTS])
+    with open(os.environ["ENCODER_BENCH_OUT"], "w", encoding="utf-8") as f:
+        json.dump({"load_s": round(loaded, 3), "batch_s": round(batch_s, 3),
+                   "texts_per_s": round(len(texts["names"]) / batch_s, 1), "query": percentiles(samples)}, f)
+
+
+def measure(backend, threads, workdir, texts_path):
+    name = f"{backend}_t{threads}"
+    out = os.path.join(workdir, f"{name}.json")
+    vectors = os.path.join(workdir, f"{name}.npy")
+    env = {"ENCODER_BACKEND": backend, "ENCODER_THREADS": str(threads), "ENCODER_BENCH_TEXTS": texts_path,
+           "ENCODER_BENCH_OUT": out, "ENCODER_BENCH_VECTORS": vectors}
+    result = run_stage_process(Stage(name, name, WORKER_SCRIPT), extra_env=env)
+    if result["status"] != "ok":
+        raise RuntimeError(f"{name} failed:\n" + "\n".join(result["output_tail"]))
+    with open(out, encoding="utf-8") as f:
+        measured = json.load(f)
+    return {**measured, "cpu_s": result["cpu_s"], "peak_rss_mb": result["peak_rss_mb"]}, np.load(vectors)
+
+
+def compare_vectors(reference, candidate, k=10):
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+    ref_top = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+    cand_top = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:k + 1]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)])
+    return {"min_cosine": round(float(cosine.min()), 6), "mean_cosine": round(float(cosine.mean()), 6),
+            f"neighbour_overlap@{k}": round(float(overlap), 4)}
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="trailer_encoder_bench_")
+    names = [r.get("title") or r.get("name") for _, r in generate(args.texts, seed=args.seed)]
+    texts_path = os.path.join(workdir, "texts.json")
+    with open(texts_path, "w", encoding="utf-8") as f:
+        json.dump({"names": names, "queries": make_queries(args.queries)}, f)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "cpus": os.cpu_count(),
+            "model": MODEL_NAME,
+            "texts": len(names),
+            "queries": args.queries,
+        },
+        "benchmarks": {},
+    }
+    results = report["benchmarks"]
+    reference = None
+
+    for backend in args.backends.split(","):
+        for threads in (int(t) for t in args.threads.split(",")):
+            name = f"{backend}_t{threads}"
+            print(f"▶️ {name}...")
+            try:
+                require(*BACKEND_MODULES[backend])
+                if backend != "torch" and not os.path.exists(os.path.join(BASE_DIR, export_dir(MODEL_NAME), "encoder.json")):
+                    require("torch", "sentence_transformers")  # the first ONNX run exports the model
+                results[name], vectors = measure(backend, threads, workdir, texts_path)
+            except ImportError as e:
+                results[name] = {"skipped": f"missing dependency: {e.name}"}
+                print(f"   {json.dumps(results[name])}")
+                continue
+            if backend == "torch" and reference is None:
+                reference = vectors
+            if reference is not None and backend != "torch":
+                parity = compare_vectors(reference, vectors)
+                parity["ok"] = parity["min_cosine"] >= PARITY_MIN_COSINE[backend]
+                results[name]["parity_vs_torch"] = parity
+            print(f"   {json.dumps(results[name])}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['meta']['commit']}_encoder.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results saved to {path}")
+    summarize(results)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def summarize(results):
+    print(f"\n{'backend':16s} {'load s':>7s} {'texts/s':>9s} {'query p50':>10s} {'query p95':>10s} "
+          f"{'RSS MB':>7s} {'min cos':>8s}")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:16s} skipped ({r['skipped']})")
+            continue
+        parity = r.get("parity_vs_torch")
+        cosine = f"{parity['min_cosine']:8.4f}" if parity else f"{'ref':>8s}"
+        print(f"{name:16s} {r['load_s']:7.2f} {r['texts_per_s']:9.0f} {r['query']['p50_ms']:10.2f} "
+              f"{r['query']['p95_ms']:10.2f} {r['peak_rss_mb'] or 0:7.0f} {cosine}")
+
+
+if __name__ == "__main__":
+    if os.environ.get("ENCODER_BENCH_OUT"):
+        worker()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Compare encoder inference backends on synthetic product names")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help=f"comma-separated subset of {','.join(BACKENDS)}")
+    parser.add_argument("--threads", default="1,4", help="thread counts, one run each")
+    parser.add_argument("--texts", type=int, default=5000, help="product names encoded in batches")
+    parser.add_argument("--queries", type=int, default=200, help="queries encoded one at a time")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<ts>_<commit>_encoder.json)")
+    run(parser.parse_args())
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 🗄️ Vector backends head to head: recall@5/@k, query latency, RAM, startup time and build time
+#
+# Every backend is built from the same vectors in a scratch directory, then queried from a fresh
+# child process (pipeline.run_stage_process), so startup time and peak RSS are those of a process
+# that only opens the index and answers queries. Recall is measured against an exact float32 scan.
+#
+#   numpy_flat        memory-mapped float16 matrix, float32 copy in RAM (VECTOR_FLOAT32_CACHE_MB)
+#   numpy_flat_mmap   the same index scanned straight from the float16 memory map
+#   numpy_ivf_<n>     k-means partitions, n probed per query (--nprobe)
+#   numpy_int8        int8 codes + per-vector scale, shortlist rescored from float16 (VECTOR_RESCORE)
+#   numpy_pq          product-quantization codes (PQ_SUBVECTORS), shortlist rescored
+#   *_no_rescore      the same, ranked by the compressed codes alone
+#   numpy_pca<d>      PCA profile: vectors and queries projected to d dims (--reduce-dims)
+#   chroma            ChromaDB persistent client (HNSW); skipped when chromadb is not installed
+#
+#   python benchmarks/bench_vector_index.py --rows 50000
+#   python benchmarks/bench_vector_index.py --rows 200000 --nprobe 8,16,32,64 --vectors real
+#   python benchmarks/bench_vector_index.py --rows 500000 --skip numpy_ivf,chroma   # recall vs memory
+#   python benchmarks/bench_vector_index.py --vectors real --reduce-dims 64,128,192 --skip numpy_ivf,numpy_int8,numpy_pq,chroma
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import RESULTS_DIR, dir_size, git_commit, percentiles, require  # noqa: E402
+from pipeline import Stage, run_stage_process  # noqa: E402
+from projection import FIT_SAMPLE, PCAProjection  # noqa: E402
+from vector_store import (COLLECTION_NAME, NumpyCollection, ProjectedCollection, _normalize, max_batch_size,  # noqa: E402
+                          open_collection)
+
+VARIANTS = ["numpy_flat", "numpy_flat_mmap", "numpy_ivf", "numpy_int8", "numpy_pq", "numpy_pca", "chroma"]
+WRITE_BATCH = 5000
+WORKER_SCRIPT = os.path.relpath(os.path.abspath(__file__), os.path.dirname(BENCH_DIR))
+
+
+# Peak RSS of this process so far. Linux: VmHWM, because ru_maxrss survives fork+exec and would
+# report the parent's peak (the benchmark holds every vector and the exact results)
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 2 ** 10, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+# 🧪 Clustered unit vectors (products come in families), queries are perturbed catalog vectors.
+# Like sentence embeddings, the variance decays across directions (randomly rotated), so most of
+# it lives in a few dozen of them.
+def synthetic_vectors(rows, dim, queries, seed):
+    rng = np.random.default_rng(seed)
+    spectrum = 1 / np.sqrt(1 + np.arange(dim) / 8)
+    rotation = np.linalg.qr(rng.normal(size=(dim, dim)))[0].astype(np.float32)
+    centers = rng.normal(size=(max(rows // 200, 1), dim))
+    vectors = centers[rng.integers(0, len(centers), rows)] + rng.normal(scale=0.9, size=(rows, dim))
+    vectors = _normalize((vectors * spectrum).astype(np.float32) @ rotation)
+    picks = vectors[rng.integers(0, rows, queries)]
+    noise = (rng.normal(scale=0.3, size=picks.shape) * spectrum).astype(np.float32) @ rotation
+    return vectors, _normalize(picks + noise)
+
+
+# Real embeddings of synthetic product names and shopper queries
+def real_vectors(rows, queries, seed):
+    require("sentence_transformers")
+    from sentence_transformers import SentenceTransformer
+    from synthetic_catalog import generate, make_queries
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    names = [r.get("title") or r.get("name") for _, r in generate(rows, seed=seed)]
+    encode = lambda texts: _normalize(model.encode(texts, batch_size=256, show_progress_bar=False))  # noqa: E731
+    return encode(names), encode(make_queries(queries))
+
+
+def exact_top_k(vectors, queries, k):
+    top = []
+    for start in range(0, len(queries), 64):
+        scores = queries[start:start + 64] @ vectors.T
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+        top.extend(np.take_along_axis(best, order, axis=1).tolist())
+    return top
+
+
+# 🏗️ Build one index under <workdir>/chromadb, the layout open_collection() expects
+def build(variant, workdir, vectors, reduce_dim=0):
+    ids = [f"v{i}" for i in range(len(vectors))]
+    metadatas = [{"row": i} for i in range(len(vectors))]
+    start = time.perf_counter()
+    if variant == "chroma":
+        require("chromadb")
+        import chromadb
+        collection = chromadb.PersistentClient(path=os.path.join(workdir, "chromadb")).get_or_create_collection(
+            name=COLLECTION_NAME)
+        batch = max_batch_size(collection, WRITE_BATCH)
+    else:
+        quantization = variant.split("_")[1] if variant in ("numpy_int8", "numpy_pq") else "none"
+        collection = NumpyCollection(os.path.join(workdir, "chromadb", "numpy_index"), quantization=quantization,
+                                     ivf_min_rows=1 if variant == "numpy_ivf" else len(vectors) + 1)
+        if reduce_dim:
+            projection_file = os.path.join(workdir, "chromadb", "projection.npz")
+            PCAProjection.fit(vectors[:FIT_SAMPLE], reduce_dim).save(projection_file)
+            collection = ProjectedCollection(collection, projection_file)
+        batch = WRITE_BATCH
+    for s in range(0, len(vectors), batch):
+        collection.upsert(ids=ids[s:s + batch], embeddings=vectors[s:s + batch].tolist(),
+                          documents=ids[s:s + batch], metadatas=metadatas[s:s + batch])
+    if hasattr(collection, "flush"):
+        collection.flush()
+    return {"build_s": round(time.perf_counter() - start, 3), "disk_mb": round(dir_size(workdir) / 2 ** 20, 1)}
+
+
+# 🔎 Child process: open the index, answer every query one at a time, write ids and timings
+def worker():
+    queries = np.load(os.environ["VECTOR_BENCH_QUERIES"])
+    k = int(os.environ["VECTOR_BENCH_K"])
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    collection = open_collection()
+    opened = time.perf_counter()
+    collection.query(query_embeddings=queries[:1].tolist(), n_results=k)  # loads / converts lazily
+    ready = time.perf_counter()
+    rss_ready = peak_rss_mb()
+
+    samples, ids = [], []
+    for query in queries:
+        t = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k)
+        samples.append((time.perf_counter() - t) * 1000)
+        ids.append(result["ids"][0])
+    rss_after = peak_rss_mb()
+    scan_bytes = collection.snapshot().memory_bytes() if hasattr(collection, "snapshot") else None
+    with open(os.environ["VECTOR_BENCH_OUT"], "w", encoding="utf-8") as f:
+        json.dump({"open_s": round(opened - start, 4), "startup_s": round(ready - start, 4),
+                   "rss_before_open_mb": rss_before, "rss_ready_mb": rss_ready, "peak_rss_mb": rss_after,
+                   "index_rss_mb": round(rss_after - rss_before, 1) if rss_before is not None else None,
+                   "scan_mb": round(scan_bytes / 2 ** 20, 2) if scan_bytes is not None else None,
+                   "latency": percentiles(samples), "ids": ids}, f)
+
+
+def measure(name, workdir, queries_path, truth, k, extra_env):
+    out = os.path.join(workdir, f"{name}.json")
+    env = {"VECTOR_BENCH_QUERIES": queries_path, "VECTOR_BENCH_K": str(k), "VECTOR_BENCH_OUT": out, **extra_env}
+    result = run_stage_process(Stage(name, name, WORKER_SCRIPT), cwd=workdir, extra_env=env)
+    if result["status"] != "ok":
+        raise RuntimeError(f"{name} failed:\n" + "\n".join(result["output_tail"]))
+    with open(out, encoding="utf-8") as f:
+        measured = json.load(f)
+    ids = measured.pop("ids")
+    recall = {f"recall@{n}": round(float(np.mean([len({f"v{i}" for i in exact[:n]} & set(found[:n])) / n
+                                                  for exact, found in zip(truth, ids)])), 4)
+              for n in sorted({min(5, k), k})}
+    return {**recall, **measured, "cpu_s": result["cpu_s"]}
+
+
+# Query processes per built index: (result name, extra environment)
+def query_runs(variant, nprobes):
+    if variant == "numpy_flat":
+        return [("numpy_flat", {}), ("numpy_flat_mmap", {"VECTOR_FLOAT32_CACHE_MB": "0"})]
+    if variant == "numpy_ivf":
+        return [(f"numpy_ivf_{n}", {"IVF_NPROBE": str(n)}) for n in nprobes]
+    if variant in ("numpy_int8", "numpy_pq"):
+        return [(variant, {}), (f"{variant}_no_rescore", {"VECTOR_RESCORE": "0"})]
+    return [(variant, {})]
+
+
+# (variant, PCA dims) of every index to build
+def index_variants(reduce_dims):
+    variants = [(v, 0) for v in ("numpy_flat", "numpy_ivf", "numpy_int8", "numpy_pq")]
+    variants += [(f"numpy_pca{d}", int(d)) for d in filter(None, reduce_dims.split(","))]
+    return variants + [("chroma", 0)]
+
+
+def run(args):
+    skip = set(filter(None, args.skip.split(",")))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="trailer_vector_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    print(f"🧪 {args.rows} {args.vectors} vectors, {args.queries} queries...")
+    if args.vectors == "real":
+        vectors, queries = real_vectors(args.rows, args.queries, args.seed)
+    else:
+        vectors, queries = synthetic_vectors(args.rows, args.dim, args.queries, args.seed)
+    queries_path = os.path.join(workdir, "queries.npy")
+    np.save(queries_path, queries.astype(np.float32))
+    truth = exact_top_k(vectors, queries, args.k)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "cpus": os.cpu_count(),
+            "rows": args.rows,
+            "dim": int(vectors.shape[1]),
+            "vectors": args.vectors,
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "benchmarks": {},
+    }
+    results = report["benchmarks"]
+
+    def attempt(name, fn):
+        print(f"▶️ {name}...")
+        try:
+            results[name] = fn()
+        except ImportError as e:
+            results[name] = {"skipped": f"missing dependency: {e.name}"}
+        print(f"   {json.dumps(results[name])}")
+
+    float32_mb = vectors.shape[0] * vectors.shape[1] * 4 / 2 ** 20
+    for variant, reduce_dim in index_variants(args.reduce_dims):
+        family = "numpy_pca" if reduce_dim else variant
+        runs = [(name, env) for name, env in query_runs(variant, args.nprobe.split(","))
+                if family not in skip and name not in skip]
+        directory = os.path.join(workdir, variant)
+        backend = "chroma" if variant == "chroma" else "numpy"
+        built = {}
+
+        def build_once():
+            if not built:
+                built.update(build(variant, directory, vectors, reduce_dim))
+            return built
+
+        def build_and_measure(name, env):
+            result = {**build_once(), **measure(name, directory, queries_path, truth, args.k,
+                                                {"VECTOR_BACKEND": backend, **env})}
+            if result.get("scan_mb") is not None:
+                result["memory_saved_vs_float32"] = round(1 - result["scan_mb"] / float32_mb, 3) + 0.0
+            return result
+
+        for name, env in runs:
+            attempt(name, lambda: build_and_measure(name, env))
+
+    # Recall lost (or kept) by each PCA profile against the full-width index
+    full = results.get("numpy_flat", {}).get(f"recall@{args.k}")
+    for name, result in results.items():
+        if name.startswith("numpy_pca") and full is not None and f"recall@{args.k}" in result:
+            result["recall_change_vs_full"] = round(result[f"recall@{args.k}"] - full, 4)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['meta']['commit']}_vector_index.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results saved to {path}")
+    summarize(results, args.k)
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def summarize(results, k):
+    cut = min(5, k)
+    print(f"\n{'backend':24s} {f'R@{cut}':>6s} {f'R@{k}':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'startup s':>10s} "
+          f"{'scan MB':>8s} {'saved':>6s} {'RSS MB':>7s} {'build s':>8s}")
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:24s} skipped ({r['skipped']})")
+            continue
+        scan = f"{r['scan_mb']:8.1f}" if r.get("scan_mb") is not None else f"{'n/a':>8s}"
+        saved = f"{r['memory_saved_vs_float32']:6.0%}" if "memory_saved_vs_float32" in r else f"{'n/a':>6s}"
+        print(f"{name:24s} {r[f'recall@{cut}']:6.3f} {r[f'recall@{k}']:6.3f} {r['latency']['p50_ms']:8.2f} "
+              f"{r['latency']['p95_ms']:8.2f} {r['startup_s']:10.3f} {scan} {saved} {r['index_rss_mb'] or 0:7.0f} "
+              f"{r['build_s']:8.1f}")
+
+
+if __name__ == "__main__":
+    if os.environ.get("VECTOR_BENCH_OUT"):
+        worker()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Compare the vector store backends on one set of vectors")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384, help="dimension of synthetic vectors")
+    parser.add_argument("--vectors", choices=["synthetic", "real"], default="synthetic",
+                        help="real = all-MiniLM-L6-v2 embeddings of synthetic product names")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="8,16,32", help="IVF partitions probed, one run per value")
+    parser.add_argument("--reduce-dims", default="64,128,192", help="PCA profiles, one index per value")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--skip", default="", help=f"comma-separated subset of {','.join(VARIANTS)}")
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a temp dir, removed after)")
+    parser.add_argument("--keep", action="store_true", help="keep the temp scratch directory")
+    parser.add_argument("--output", default=None,
+                        help="results file (default: benchmarks/results/<ts>_<commit>_vector_index.json)")
+    run(parser.parse_args())
@@ -0,0 +1,265 @@
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 📏 Benchmark suite: synthetic catalog -> parse, merge, chunk, index, embed, query
+#
+# Stage scripts run unchanged as child processes (pipeline.run_stage_process, so CPU time and
+# peak RSS come for free) inside a scratch directory; queries go through the same Retriever that
+# ui.py builds. Results land in benchmarks/results/<timestamp>_<commit>.json; pass --compare with
+# an earlier file to print the change of every metric.
+#
+#   python benchmarks/run_benchmarks.py --rows 10000
+#   python benchmarks/run_benchmarks.py --rows 100000 --skip embed,query --compare benchmarks/results/<old>.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+FIXTURE_DIR = os.path.join(BASE_DIR, "Scrapers", "fixtures")
+BENCHMARKS = ["parse", "merge", "chunk", "index", "embed", "query"]
+
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "Scrapers"))
+sys.path.insert(0, os.path.join(BASE_DIR, "rag_engine"))
+
+from pipeline import Stage, run_stage_process  # noqa: E402
+from synthetic_catalog import generate, make_queries, render_ebay_search, render_tpu_category, write_catalog  # noqa: E402
+from vector_store import VECTOR_BACKEND  # noqa: E402
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {}
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {"count": len(samples_ms), "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3), "mean_ms": round(float(np.mean(samples_ms)), 3)}
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def count_records(pattern):
+    from record_io import iter_records, latest_file
+    path = latest_file(pattern)
+    return sum(1 for _ in iter_records(path)) if path else 0
+
+
+# Stage scripts run in child processes, so check their heavy imports here to skip cleanly
+def require(*modules):
+    for module in modules:
+        if importlib.util.find_spec(module) is None:
+            raise ImportError(f"No module named {module!r}", name=module)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# 🧩 Run a pipeline script in the scratch directory; throughput is per input row
+def run_script(name, script, workdir, rows, extra_env=None):
+    result = run_stage_process(Stage(name, name, script), cwd=workdir, extra_env=extra_env)
+    if result["status"] != "ok":
+        raise RuntimeError(f"{script} failed:\n" + "\n".join(result["output_tail"]))
+    return {
+        "wall_s": result["wall_s"],
+        "cpu_s": result["cpu_s"],
+        "peak_rss_mb": result["peak_rss_mb"],
+        "rows": rows,
+        "rows_per_s": round(rows / result["wall_s"], 1) if result["wall_s"] else None,
+    }
+
+
+# 🌐 Parsers: saved fixtures plus synthetic full-size result pages
+def bench_parse(rows, repeats=20):
+    from parsers import parse_ebay_search, parse_tpu_category
+
+    out = {}
+    for site, parse in (("ebay", parse_ebay_search), ("tpu", parse_tpu_category)):
+        pages = [open(p, encoding="utf-8").read() for p in sorted(glob.glob(os.path.join(FIXTURE_DIR, site, "*.html")))
+                 if "item_" not in os.path.basename(p)]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for html in pages:
+                parse(html, "https://fixture.local/")
+        elapsed = time.perf_counter() - start
+        out[f"{site}_fixtures_pages_per_s"] = round(repeats * len(pages) / elapsed, 1)
+
+    # One 200-item page per site (a large real results page), built from the synthetic catalog
+    sample = [r for _, r in generate(min(rows, 2000), seed=3)]
+    ebay_page = render_ebay_search([r for r in sample if "title" in r][:200])
+    tpu_page = render_tpu_category([r for r in sample if "name" in r][:200])
+    for site, parse, html in (("ebay", parse_ebay_search, ebay_page), ("tpu", parse_tpu_category, tpu_page)):
+        start = time.perf_counter()
+        found = 0
+        for _ in range(5):
+            parsed = parse(html, "https://fixture.local/")
+            found = len(parsed[0] if isinstance(parsed, tuple) else parsed)
+        elapsed = (time.perf_counter() - start) / 5
+        out[f"{site}_200_item_page_ms"] = round(elapsed * 1000, 2)
+        out[f"{site}_items_per_s"] = round(found / elapsed, 1)
+    return out
+
+
+# 🔎 Queries through the ui.py code path (Retriever + CachedEncoder + query cache)
+def bench_query(workdir, queries):
+    from embedding_cache import CachedEncoder
+    from query_cache import QueryCache
+    from retrieval import Retriever
+    from vector_store import open_collection
+
+    os.chdir(workdir)  # chromadb/, cache/embeddings and the BM25 index are relative paths
+    retriever = Retriever(open_collection(), CachedEncoder("all-MiniLM-L6-v2"), QueryCache())
+    retriever.search("warm up the encoder", n_results=5)
+
+    def timed(run):
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            run(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        return percentiles(samples)
+
+    return {
+        "cold": timed(lambda q: retriever.search(q, n_results=5)),  # embedding + Chroma (+ BM25 fusion)
+        "warm": timed(lambda q: retriever.search(q, n_results=5)),  # same queries again: result cache
+    }
+
+
+def bench_lexical(workdir, queries):
+    from lexical_index import LexicalIndex
+
+    index = LexicalIndex.load(os.path.join(workdir, "chromadb", "lexical_index.npz"))
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=20)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def run(args):
+    skip = set(filter(None, args.skip.split(",")))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="trailer_bench_")
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    env = {"TRAILER_DATA_DIR": os.path.join(workdir, "data")}
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rows": args.rows,
+            "seed": args.seed,
+            "vector_backend": VECTOR_BACKEND,
+            "workdir": workdir,
+        },
+        "benchmarks": {},
+    }
+    results = report["benchmarks"]
+
+    def attempt(name, fn):
+        if name in skip:
+            results[name] = {"skipped": "disabled"}
+            return
+        print(f"▶️ {name}...")
+        try:
+            results[name] = fn()
+        except ImportError as e:
+            results[name] = {"skipped": f"missing dependency: {e.name}"}
+        print(f"   {json.dumps(results[name])}")
+
+    start = time.perf_counter()
+    catalog = write_catalog(os.path.join(workdir, "data"), args.rows, seed=args.seed)
+    report["catalog"] = {"rows": args.rows, **catalog["counts"],
+                         "generate_s": round(time.perf_counter() - start, 2),
+                         "raw_bytes": dir_size(os.path.join(workdir, "data"))}
+    queries = make_queries(args.queries)
+
+    attempt("parse", lambda: bench_parse(args.rows))
+    attempt("merge", lambda: {**run_script("merge", "rag_engine/1merge_and_normalize.py", workdir, args.rows, env),
+                              "products_out": count_records(os.path.join(workdir, "merged_trailer_parts_*.json*"))})
+    attempt("chunk", lambda: {**run_script("chunk", "rag_engine/2chunking.py", workdir,
+                                           count_records(os.path.join(workdir, "merged_trailer_parts_*.json*"))),
+                              "bytes_out": dir_size(glob.glob(os.path.join(workdir, "data", "product_chunks.json*"))[0])})
+    chunks = count_records(os.path.join(workdir, "data", "product_chunks.json*"))
+    attempt("index", lambda: {**run_script("index", "rag_engine/lexical_index.py", workdir, chunks),
+                              "bytes": dir_size(os.path.join(workdir, "chromadb", "lexical_index.npz")),
+                              "query": bench_lexical(workdir, queries)})
+    backend_modules = ["chromadb"] if VECTOR_BACKEND == "chroma" else []
+    attempt("embed", lambda: require("sentence_transformers", *backend_modules) or {**run_script("embed", "rag_engine/3embed_to_chromadb.py", workdir, chunks),
+                              "chroma_bytes": dir_size(os.path.join(workdir, "chromadb")),
+                              "embedding_cache_bytes": dir_size(os.path.join(workdir, "cache"))})
+    if "embed" not in skip and "skipped" in results.get("embed", {}):
+        results["query"] = {"skipped": "needs the embed benchmark"}
+    else:
+        attempt("query", lambda: bench_query(workdir, queries))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results saved to {path}")
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+# 📊 Flatten {"a": {"b": 1}} -> {"a.b": 1} for comparisons
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(previous_path, report):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    before, after = flatten(previous["benchmarks"]), flatten(report["benchmarks"])
+    print(f"\n📊 Compared with {previous['meta']['commit']} ({previous['meta']['rows']} rows):")
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        print(f"   {name:45s} {old:>12} -> {new:>12}  {change}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trailer parts pipeline on a synthetic catalog")
+    parser.add_argument("--rows", type=int, default=10000, help="synthetic listings (1k to millions)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=200, help="queries timed per latency benchmark")
+    parser.add_argument("--skip", default="", help=f"comma-separated subset of {','.join(BENCHMARKS)}")
+    parser.add_argument("--workdir", default=None, help="scratch directory (default: a temp dir, removed after)")
+    parser.add_argument("--keep", action="store_true", help="keep the temp scratch directory")
+    parser.add_argument("--output", default=None, help="results file (default: benchmarks/results/<ts>_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.compare:
+        compare(args.compare, report)
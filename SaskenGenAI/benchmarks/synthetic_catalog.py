@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import random
+from html import escape
+
+# 🧪 Synthetic trailer-part catalogs for benchmarks
+#
+# Writes files in the scrapers' raw output formats (data/ebay_products_<ts>.jsonl and
+# data/trailerpartsunlimited_products_<ts>.jsonl), so the real merge -> chunk -> embed scripts run
+# on them unchanged. Names mix capacities, brake types, axle counts, lug counts and part numbers the
+# way real listings do; a share of listings are relistings of the same part (near-duplicate names
+# at other prices) so the dedup step has work to do. Rows are streamed to disk, so millions are fine.
+#
+#   python benchmarks/synthetic_catalog.py --rows 100000 --out /tmp/bench/data
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/150"
+
+CAPACITIES = ["2000 lb", "3500 lb", "3,500 lbs", "3.5K", "5200 lb", "5.2K", "6000 lb", "7000 lb", "7,000 lb.",
+              "7K", "8000 lb", "10K", "12000 lb"]
+PARTS = ["Trailer Axle Kit", "Axle", "Hub Assembly", "Brake Assembly", "Leaf Spring Set", "Hanger Kit",
+         "Equalizer Kit", "Bearing Kit", "Drum", "Idler Hub", "Wheel Seal", "Spindle", "U-Bolt Kit",
+         "Suspension Kit", "Torsion Axle", "Brake Controller", "Coupler", "Tongue Jack", "Fender"]
+BRAKES = ["Electric Brakes", "Electric Brake", "Hydraulic Surge Brakes", "Idler", "No Brakes", ""]
+AXLES = ["Single Axle", "Tandem Axle", "Triple Axle", "2-Axle", ""]
+EXTRAS = ["6-Lug", "5-Lug", "8-Lug", "5 on 4.5", "6 on 5.5", "8 on 6.5", "84\" Hub Face", "95\" Hub Face",
+          "Galvanized", "Black Powder Coat", "Dexter", "Lippert", "Complete Kit", "with Bearings",
+          "Heavy Duty", "OEM Replacement", "Easy Lube"]
+SELLER_NOISE = ["NEW", "Free Shipping", "Fast Ship", "USA", "Brand New", "In Stock", "Top Rated", ""]
+
+
+def make_name(rng):
+    parts = [rng.choice(CAPACITIES), rng.choice(AXLES), rng.choice(PARTS), rng.choice(BRAKES)]
+    parts += rng.sample(EXTRAS, rng.randint(1, 3))
+    if rng.random() < 0.4:
+        parts.append(f"#{rng.randint(10, 99)}-{rng.randint(100, 999)}")
+    return " ".join(p for p in parts if p)
+
+
+# Relisting: same part with a few words of seller noise or punctuation changes
+def relist_name(rng, name):
+    name = name.replace(" - ", " ") if rng.random() < 0.5 else name
+    noise = rng.choice(SELLER_NOISE)
+    return f"{noise} {name}".strip() if rng.random() < 0.5 else f"{name} {noise}".strip()
+
+
+def make_price(rng, base):
+    roll = rng.random()
+    if roll < 0.05:
+        return "N/A"
+    if roll < 0.15:
+        return f"{base:,.2f} to {base * rng.uniform(1.05, 1.4):,.2f}"
+    return f"{base:,.2f}"
+
+
+def make_image(rng, i):
+    if rng.random() < 0.1:
+        return PLACEHOLDER_IMAGE
+    return f"https://i.ebayimg.com/images/g/synthetic{i}/s-l500.jpg"
+
+
+# 🏭 Yields (source, raw record) pairs in the scrapers' field names
+def generate(rows, seed=7, dup_rate=0.2, tpu_share=0.3):
+    rng = random.Random(seed)
+    recent = []
+    for i in range(rows):
+        if recent and rng.random() < dup_rate:
+            name, base = rng.choice(recent)
+            name = relist_name(rng, name)
+        else:
+            name = make_name(rng)
+            base = round(rng.lognormvariate(5, 1), 2)
+            recent.append((name, base))
+            if len(recent) > 1000:
+                recent.pop(rng.randrange(len(recent)))
+        price = make_price(rng, base * rng.uniform(0.9, 1.1))
+        if rng.random() < tpu_share:
+            yield "tpu", {
+                "name": name,
+                "price": price,
+                "url": f"https://trailerpartsunlimited.com/synthetic-{i}.html",
+                "source_site": "trailerpartsunlimited.com",
+                "image_url": make_image(rng, i),
+            }
+        else:
+            yield "ebay", {
+                "title": name,
+                "price": price,
+                "link": f"https://www.ebay.com/itm/{100000000 + i}",
+                "seller": "eBay",
+                "source": "https://www.ebay.com/sch/i.html?_nkw=trailer+axles",
+                "timestamp": "2025-01-01T00:00:00",
+                "image_url": make_image(rng, i),
+            }
+
+
+# 💾 Write both raw files; returns their paths and row counts
+def write_catalog(out_dir, rows, seed=7, dup_rate=0.2, stamp="20250101_0000"):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        "ebay": os.path.join(out_dir, f"ebay_products_{stamp}.jsonl"),
+        "tpu": os.path.join(out_dir, f"trailerpartsunlimited_products_{stamp}.jsonl"),
+    }
+    counts = {"ebay": 0, "tpu": 0}
+    files = {key: open(path, "w", encoding="utf-8") for key, path in paths.items()}
+    try:
+        for source, record in generate(rows, seed=seed, dup_rate=dup_rate):
+            files[source].write(json.dumps(record, ensure_ascii=False) + "\n")
+            counts[source] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return {"paths": paths, "counts": counts}
+
+
+# 🌐 HTML pages in the same markup as Scrapers/fixtures, for parser throughput at any size
+def render_ebay_search(records):
+    items = []
+    for r in records:
+        items.append(
+            '  <li class="s-item s-item__pl-on-bottom"><div class="s-item__wrapper clearfix">'
+            '<div class="s-item__info clearfix">'
+            f'<a class="s-item__link" href="{escape(r["link"])}"><div class="s-item__title">'
+            f'<span role="heading" aria-level="3">{escape(r["title"])}</span></div></a>'
+            f'<div class="s-item__details clearfix"><span class="s-item__price">${escape(r["price"])}</span></div>'
+            '</div></div></li>')
+    return ('<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>trailer axles | eBay</title></head>'
+            '<body><div class="srp-river-results"><ul class="srp-results srp-list clearfix">\n'
+            + "\n".join(items) + "\n</ul></div></body></html>")
+
+
+def render_tpu_category(records):
+    cards = []
+    for r in records:
+        cards.append(
+            '  <li class="product"><article class="card"><figure class="card-figure">'
+            f'<img class="card-image" data-src="{escape(r["image_url"])}" alt=""></figure>'
+            f'<div class="card-body"><h4 class="card-title"><a href="{escape(r["url"])}">{escape(r["name"])}</a></h4>'
+            f'<div class="card-text"><span class="price price--main">${escape(r["price"])}</span></div>'
+            '</div></article></li>')
+    return ('<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>Axle Kits | Trailer Parts Unlimited</title>'
+            '</head><body><ul class="productGrid">\n' + "\n".join(cards) + "\n</ul></body></html>")
+
+
+# 🔎 Queries like the ones customers type: part numbers, capacities, lug counts, plain words
+def make_queries(count, seed=11):
+    rng = random.Random(seed)
+    templates = [
+        lambda: f"{rng.choice(CAPACITIES)} {rng.choice(PARTS).lower()}",
+        lambda: f"{rng.choice(AXLES) or 'single axle'} {rng.choice(BRAKES) or 'electric brakes'}".lower(),
+        lambda: f"{rng.choice(EXTRAS)} {rng.choice(PARTS)}",
+        lambda: f"#{rng.randint(10, 99)}-{rng.randint(100, 999)}",
+        lambda: rng.choice(PARTS).lower(),
+    ]
+    return [rng.choice(templates)() for _ in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic trailer-part catalog in the scrapers' formats")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--out", default="data")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dup-rate", type=float, default=0.2, help="share of rows that relist an earlier part")
+    args = parser.parse_args()
+
+    result = write_catalog(args.out, args.rows, seed=args.seed, dup_rate=args.dup_rate)
+    print(f"🧪 Wrote {result['counts']['ebay']} eBay + {result['counts']['tpu']} TPU rows to {args.out}")
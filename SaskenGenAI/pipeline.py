@@ -0,0 +1,358 @@
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+# ---------------------------
+# Daily update pipeline: stage graph + parallel runner
+# Shared by run_daily_update.py (CLI) and the "Daily Update Pipeline" page in ui.py.
+# ---------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # stages run with this as their working directory
+STATE_FILE = os.path.join(BASE_DIR, "logs", "pipeline_state.json")
+
+# Shared helpers live next to the pipeline scripts in rag_engine/
+sys.path.insert(0, os.path.join(BASE_DIR, "rag_engine"))
+from metrics import counter, gauge, load_snapshots, write_textfile  # noqa: E402
+
+# 📈 Stage scripts leave metric snapshots in STAGE_METRICS_DIR; they are folded into this process's
+# registry after each run, and run_daily_update.py writes everything to METRICS_TEXTFILE
+# (point it into node_exporter's --collector.textfile.directory to scrape it)
+STAGE_METRICS_DIR = os.path.join(BASE_DIR, "logs", "metrics", "stages")
+METRICS_TEXTFILE = os.environ.get("METRICS_TEXTFILE",
+                                  os.path.join(BASE_DIR, "logs", "metrics", "trailer_pipeline.prom"))
+
+# 🔬 Profiled runs (profile=True) save one sampling profile per stage in logs/profiles/<run>/
+PROFILE_ROOT = os.path.join(BASE_DIR, "logs", "profiles")
+
+STAGE_RUNS = counter("trailer_pipeline_stage_runs_total", "Pipeline stage runs by status (ok, failed, skipped, "
+                     "blocked)", ("stage", "status"))
+STAGE_SECONDS = gauge("trailer_pipeline_stage_duration_seconds", "Wall time of the last run of a stage", ("stage",))
+STAGE_CPU_SECONDS = gauge("trailer_pipeline_stage_cpu_seconds", "CPU time of the last run of a stage", ("stage",))
+STAGE_RSS_BYTES = gauge("trailer_pipeline_stage_peak_rss_bytes", "Peak RSS of the last run of a stage", ("stage",))
+STAGE_LAST_SUCCESS = gauge("trailer_pipeline_stage_last_success_timestamp_seconds",
+                           "Unix time the stage last finished successfully", ("stage",))
+RUN_SECONDS = gauge("trailer_pipeline_run_duration_seconds", "Wall time of the last pipeline run")
+RUN_OK = gauge("trailer_pipeline_run_ok", "1 if every stage of the last pipeline run succeeded or was skipped")
+RUN_TIMESTAMP = gauge("trailer_pipeline_last_run_timestamp_seconds", "Unix time the last pipeline run finished")
+
+
+# 📁 Where the scrapers' files are read by the merge stage (same setting and default as 1merge_and_normalize.py)
+DATA_DIR = os.environ.get("TRAILER_DATA_DIR", r"C:\Users\PAVITHRA R\Desktop\GenAI\Internship\Scrapers\data")
+
+
+class Stage:
+    def __init__(self, name, label, script, deps=(), inputs=(), modules=(), settings=(), allow_failure=False):
+        self.name = name
+        self.label = label
+        self.script = script
+        self.deps = list(deps)
+        # Glob patterns of files the stage reads (relative to BASE_DIR, or absolute); the newest
+        # match of each is fingerprinted. A stage without inputs (the scrapers) always runs.
+        self.inputs = list(inputs)
+        # rag_engine helpers the script imports and environment variables it reads; both are part of
+        # the fingerprint, so editing a helper or changing a setting re-runs the stage
+        self.modules = list(modules)
+        self.settings = list(settings)
+        # Downstream stages still run after a failure (they use the latest data on disk)
+        self.allow_failure = allow_failure
+
+    @property
+    def command(self):
+        return [sys.executable, os.path.join(BASE_DIR, self.script)]
+
+
+STAGES = [
+    Stage("scrape_ebay", "Running eBay scraper", "Scrapers/scrape_ebay.py", allow_failure=True),
+    Stage("scrape_tpu", "Running TrailerPartsUnlimited scraper", "Scrapers/scrape_trailerpartsunlimited.py",
+          allow_failure=True),
+    Stage("merge", "Merging & normalizing data", "rag_engine/1merge_and_normalize.py",
+          deps=["scrape_ebay", "scrape_tpu"],
+          inputs=[os.path.join(DATA_DIR, "ebay_products_20*.json*"),
+                  os.path.join(DATA_DIR, "trailerpartsunlimited_products_20*.json*")],
+          modules=["catalog.py", "dedup.py", "record_io.py", "specs.py"],
+          settings=["TRAILER_DATA_DIR", "MERGE_DEDUP", "DEDUP_THRESHOLD", "TRAILER_RECORD_EXT"]),
+    Stage("chunk", "Chunking merged data", "rag_engine/2chunking.py",
+          deps=["merge"], inputs=["merged_trailer_parts_*.json*"],
+          modules=["catalog.py", "record_io.py", "specs.py"],
+          settings=["TRAILER_RECORD_EXT"]),
+    Stage("embed", "Embedding into ChromaDB", "rag_engine/3embed_to_chromadb.py",
+          deps=["chunk"], inputs=["data/product_chunks.json*"],
+          modules=["catalog.py", "embed_engine.py", "embedding_cache.py", "encoder_backend.py", "projection.py",
+                   "record_io.py", "specs.py", "vector_store.py"],
+          settings=["VECTOR_BACKEND", "VECTOR_QUANTIZATION", "PQ_SUBVECTORS", "VECTOR_REDUCE_DIM",
+                    "ENCODER_BACKEND"]),
+    Stage("lexical", "Building BM25 index", "rag_engine/lexical_index.py",
+          deps=["chunk"], inputs=["data/product_chunks.json*"],
+          modules=["catalog.py", "record_io.py", "specs.py"]),
+]
+
+
+# 🔑 Fingerprint = hash of the stage script, its rag_engine helpers, its settings and the newest
+# file matching each input pattern
+def _file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stage_fingerprint(stage):
+    if not stage.inputs:
+        return None
+    script = os.path.join(BASE_DIR, stage.script)
+    parts = [f"script:{_file_digest(script)}" if os.path.exists(script) else "script:missing"]
+    for module in stage.modules:
+        path = os.path.join(BASE_DIR, "rag_engine", module)
+        parts.append(f"module:{module}:{_file_digest(path)}" if os.path.exists(path) else f"module:{module}:missing")
+    for name in stage.settings:
+        parts.append(f"env:{name}={os.environ.get(name)!r}")
+    for pattern in stage.inputs:
+        matches = glob.glob(os.path.join(BASE_DIR, pattern))
+        if matches:
+            latest = max(matches, key=os.path.getmtime)
+            parts.append(f"{pattern}:{_file_digest(latest)}")
+        else:
+            parts.append(f"{pattern}:missing")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ⏱️ Run one stage as a child process; measure wall time, CPU time and peak RSS.
+# cwd / extra_env let the benchmarks run the real stage scripts against a scratch directory.
+def run_stage_process(stage, on_line=None, cwd=BASE_DIR, extra_env=None):
+    start = time.perf_counter()
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONIOENCODING": "utf-8", **(extra_env or {})}
+    proc = subprocess.Popen(stage.command, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace")
+    tail = deque(maxlen=50)
+    peak = {"rss": None, "cpu": None}
+
+    def pump():
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            tail.append(line)
+            if on_line:
+                on_line(stage, line)
+
+    reader = threading.Thread(target=pump, daemon=True)
+    reader.start()
+
+    if hasattr(os, "wait4"):
+        # POSIX: the kernel reports the child's own CPU time when it is reaped. Its ru_maxrss starts
+        # from this process's high-water mark at fork (the Streamlit UI holds the encoder), so the peak
+        # RSS is the child's VmHWM sampled while it runs instead (none where /proc is missing).
+        stop = threading.Event()
+        sampler = threading.Thread(target=_sample_peak_rss, args=(proc.pid, peak, stop), daemon=True)
+        sampler.start()
+        _, status, usage = os.wait4(proc.pid, 0)
+        stop.set()
+        sampler.join()
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        peak["cpu"] = usage.ru_utime + usage.ru_stime
+    else:
+        _poll_usage(proc, peak)
+    reader.join()
+
+    return {
+        "stage": stage.name,
+        "status": "ok" if proc.returncode == 0 else "failed",
+        "returncode": proc.returncode,
+        "wall_s": round(time.perf_counter() - start, 3),
+        "cpu_s": round(peak["cpu"], 3) if peak["cpu"] is not None else None,
+        "peak_rss_mb": round(peak["rss"] / 2 ** 20, 1) if peak["rss"] is not None else None,
+        "output_tail": list(tail),
+    }
+
+
+# Linux: the child's own high-water mark (VmHWM, reset by exec) from /proc while it runs
+def _sample_peak_rss(pid, peak, stop, interval=0.1):
+    path = f"/proc/{pid}/status"
+    while True:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak["rss"] = max(peak["rss"] or 0, int(line.split()[1]) * 1024)
+                        break
+        except (OSError, ValueError):
+            pass
+        if stop.wait(interval):
+            return
+
+
+# Windows: sample with psutil while the child runs (best effort, skipped if psutil is missing)
+def _poll_usage(proc, peak):
+    try:
+        import psutil
+        handle = psutil.Process(proc.pid)
+    except Exception:
+        proc.wait()
+        return
+    while proc.poll() is None:
+        try:
+            mem = handle.memory_info()
+            rss = getattr(mem, "peak_wset", None) or mem.rss
+            peak["rss"] = max(peak["rss"] or 0, rss)
+            cpu = handle.cpu_times()
+            peak["cpu"] = cpu.user + cpu.system
+        except Exception:
+            pass
+        time.sleep(0.2)
+
+
+# 📈 Stage result -> metrics
+def record_stage_metrics(result):
+    STAGE_RUNS.inc(stage=result["stage"], status=result["status"])
+    if result["status"] not in ("ok", "failed"):
+        return
+    STAGE_SECONDS.set(result["wall_s"], stage=result["stage"])
+    if result.get("cpu_s") is not None:
+        STAGE_CPU_SECONDS.set(result["cpu_s"], stage=result["stage"])
+    if result.get("peak_rss_mb") is not None:
+        STAGE_RSS_BYTES.set(int(result["peak_rss_mb"] * 2 ** 20), stage=result["stage"])
+    if result["status"] == "ok":
+        STAGE_LAST_SUCCESS.set(time.time(), stage=result["stage"])
+
+
+def write_run_metrics(path=METRICS_TEXTFILE):
+    return write_textfile(path)
+
+
+# 🚀 Run the stage graph: independent stages concurrently, unchanged stages skipped.
+# on_event(kind, stage, info) is called from the calling thread with kind in
+# "start" / "skip" / "blocked" / "finish", so Streamlit can update the page from it.
+# on_line(stage, line) receives each output line from a worker thread.
+def run_pipeline(stages=STAGES, force=False, skip=(), max_workers=4, on_event=None, on_line=None,
+                 state_path=STATE_FILE, metrics_dir=STAGE_METRICS_DIR, profile=False):
+    callback = on_event or (lambda *args: None)
+
+    # Every stage result is recorded as metrics before the caller sees it
+    def on_event(kind, stage, info):
+        if kind != "start":
+            record_stage_metrics(info)
+        callback(kind, stage, info)
+    skip = set(skip)
+    by_name = {s.name: s for s in stages}
+    for stage in stages:
+        unknown = [d for d in stage.deps if d not in by_name]
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(unknown)}")
+
+    # Snapshots of the previous run must not be counted again
+    for old in glob.glob(os.path.join(metrics_dir, "*.json")):
+        os.remove(old)
+    stage_env = {"TRAILER_METRICS_DIR": metrics_dir}
+    profile_dir = os.path.join(PROFILE_ROOT, datetime.now().strftime("%Y%m%d_%H%M%S")) if profile else None
+    if profile_dir:
+        stage_env.update(TRAILER_PROFILE="1", TRAILER_PROFILE_DIR=profile_dir)
+
+    state = load_state(state_path)
+    pending = dict(by_name)
+    results = {}
+    running = {}
+    started_at = datetime.now().isoformat(timespec="seconds")
+    run_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                dep_results = [results.get(d) for d in stage.deps]
+                if any(r is None for r in dep_results):
+                    continue  # a dependency is still pending or running
+                del pending[name]
+
+                blocked = [d for d, r in zip(stage.deps, dep_results)
+                           if r["status"] in ("failed", "blocked") and not by_name[d].allow_failure]
+                if blocked:
+                    results[name] = {"stage": name, "status": "blocked", "blocked_by": blocked}
+                    on_event("blocked", stage, results[name])
+                    continue
+
+                if name in skip:
+                    results[name] = {"stage": name, "status": "skipped", "reason": "disabled"}
+                    on_event("skip", stage, results[name])
+                    continue
+
+                # Inputs are fingerprinted once upstream stages have finished writing them
+                fingerprint = stage_fingerprint(stage)
+                previous = state.get(name, {})
+                if not force and fingerprint is not None and previous.get("fingerprint") == fingerprint:
+                    results[name] = {"stage": name, "status": "skipped", "reason": "inputs unchanged",
+                                     "last_success": previous.get("finished_at")}
+                    on_event("skip", stage, results[name])
+                    continue
+
+                on_event("start", stage, {"stage": name})
+                running[pool.submit(run_stage_process, stage, on_line, BASE_DIR, stage_env)] = (stage, fingerprint)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                result = future.result()
+                results[stage.name] = result
+                if result["status"] == "ok":
+                    state[stage.name] = {"fingerprint": fingerprint,
+                                         "finished_at": datetime.now().isoformat(timespec="seconds")}
+                    save_state(state, state_path)
+                on_event("finish", stage, result)
+
+    ordered = [results[s.name] for s in stages]
+    report = {
+        "started_at": started_at,
+        "wall_s": round(time.perf_counter() - run_start, 3),
+        "ok": all(r["status"] in ("ok", "skipped") for r in ordered),
+        "stages": ordered,
+    }
+    if profile_dir:
+        report["profile_dir"] = profile_dir
+    load_snapshots(metrics_dir)
+    RUN_SECONDS.set(report["wall_s"])
+    RUN_OK.set(int(report["ok"]))
+    RUN_TIMESTAMP.set(time.time())
+    return report
+
+
+# 📋 One-line summary per stage for logs and the CLI
+def format_result(result):
+    status = result["status"]
+    if status == "ok" or status == "failed":
+        cpu = f"{result['cpu_s']:.1f}s CPU" if result.get("cpu_s") is not None else "CPU n/a"
+        rss = f"{result['peak_rss_mb']:.0f} MB peak RSS" if result.get("peak_rss_mb") is not None else "RSS n/a"
+        icon = "✅" if status == "ok" else f"❌ (exit {result['returncode']})"
+        return f"{icon} {result['stage']}: {result['wall_s']:.1f}s wall, {cpu}, {rss}"
+    if status == "skipped":
+        return f"⏭️ {result['stage']}: skipped ({result['reason']})"
+    return f"⛔ {result['stage']}: not run, blocked by {', '.join(result['blocked_by'])}"
+
+
+def save_run_report(report, directory=os.path.join(BASE_DIR, "logs")):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"pipeline_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
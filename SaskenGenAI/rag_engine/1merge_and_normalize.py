@@ -1,78 +1,95 @@
-import json
 import os
 import glob
 from datetime import datetime
+from itertools import chain
 
-# 📁 Fixed absolute path to data folder
-DATA_DIR = r"C:\Users\PAVITHRA R\Desktop\GenAI\Internship\Scrapers\data"
+from dedup import DEFAULT_THRESHOLD, dedupe_records
+from metrics import export_on_exit, record_stage_items
+from profiling import profile_stage
+from record_io import RECORD_EXT, counted, iter_records, latest_file, write_records
+from specs import parse_specs
 
-# 🔍 Utility: get latest file matching wildcard
-def get_latest_file(pattern):
-    files = glob.glob(pattern)
-    if not files:
-        return None
-    return max(files, key=os.path.getmtime)
+# 📁 Fixed absolute path to data folder (TRAILER_DATA_DIR overrides it, e.g. for benchmarks)
+DATA_DIR = os.environ.get("TRAILER_DATA_DIR", r"C:\Users\PAVITHRA R\Desktop\GenAI\Internship\Scrapers\data")
 
-# ✅ Normalize eBay data
+# 🧬 Near-duplicate merging (MERGE_DEDUP=0 to keep every record)
+DEDUP = os.environ.get("MERGE_DEDUP", "1") != "0"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", DEFAULT_THRESHOLD))
+
+export_on_exit("merge")
+profile_stage("merge")  # --profile or TRAILER_PROFILE=1
+
+# ✅ Normalize eBay data (one record at a time)
 def normalize_ebay(data):
-    return [{
-        "name": item.get("title", "").strip(),
-        "price": item.get("price", "").strip(),
-        "url": item.get("link", "").strip(),
-        "source_site": "eBay",
-        "image_url": item.get("image_url", "https://via.placeholder.com/150")
-    } for item in data if isinstance(item, dict)]
+    for item in data:
+        if isinstance(item, dict):
+            name = item.get("title", "").strip()
+            price = item.get("price", "").strip()
+            yield {
+                "name": name,
+                "price": price,
+                "url": item.get("link", "").strip(),
+                "source_site": "eBay",
+                "image_url": item.get("image_url", "https://via.placeholder.com/150"),
+                **parse_specs(name, price)  # price_min/price_max, capacity_lbs, brake_type, axle_count
+            }
 
-# ✅ Normalize trailerpartsunlimited data
+# ✅ Normalize trailerpartsunlimited data (one record at a time)
 def normalize_trailerparts(data):
-    return [{
-        "name": item.get("name", "").strip(),
-        "price": item.get("price", "").strip(),
-        "url": item.get("url", "").strip(),
-        "source_site": "trailerpartsunlimited.com",
-        "image_url": item.get("image_url", "https://via.placeholder.com/150")
-    } for item in data if isinstance(item, dict)]
+    for item in data:
+        if isinstance(item, dict):
+            name = item.get("name", "").strip()
+            price = item.get("price", "").strip()
+            yield {
+                "name": name,
+                "price": price,
+                "url": item.get("url", "").strip(),
+                "source_site": "trailerpartsunlimited.com",
+                "image_url": item.get("image_url", "https://via.placeholder.com/150"),
+                **parse_specs(name, price)
+            }
 
-# 📂 Show all JSON files in external data folder
+# 📂 Show all record files (.json arrays and .jsonl[.gz|.zst]) in external data folder
 print("\n📂 Available files:")
-for f in glob.glob(os.path.join(DATA_DIR, "*.json")):
+for f in glob.glob(os.path.join(DATA_DIR, "*.json*")):
     print(f)
 
 # 🔄 Locate latest files
-ebay_file = get_latest_file(os.path.join(DATA_DIR, "ebay_products_20*.json"))
-tpu_file = get_latest_file(os.path.join(DATA_DIR, "trailerpartsunlimited_products_20*.json"))
+ebay_file = latest_file(os.path.join(DATA_DIR, "ebay_products_20*.json*"))
+tpu_file = latest_file(os.path.join(DATA_DIR, "trailerpartsunlimited_products_20*.json*"))
 
-merged_data = []
-total_ebay = 0
-total_tpu = 0
+streams = []
+ebay_count = {}
+tpu_count = {}
 
-# 📥 Load and normalize eBay
+# 📥 Stream and normalize eBay
 if ebay_file:
-    with open(ebay_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        norm = normalize_ebay(data)
-        merged_data.extend(norm)
-        total_ebay = len(norm)
-        print(f"✅ Loaded {total_ebay} eBay items from {ebay_file}")
+    print(f"📥 Reading eBay items from {ebay_file}")
+    streams.append(counted(normalize_ebay(iter_records(ebay_file)), ebay_count))
 else:
     print("⚠️ No eBay file found.")
 
-# 📥 Load and normalize trailerpartsunlimited
+# 📥 Stream and normalize trailerpartsunlimited
 if tpu_file:
-    with open(tpu_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        norm = normalize_trailerparts(data)
-        merged_data.extend(norm)
-        total_tpu = len(norm)
-        print(f"✅ Loaded {total_tpu} trailerpartsunlimited items from {tpu_file}")
+    print(f"📥 Reading trailerpartsunlimited items from {tpu_file}")
+    streams.append(counted(normalize_trailerparts(iter_records(tpu_file)), tpu_count))
 else:
     print("⚠️ No trailerpartsunlimited file found.")
 
-# 💾 Save merged output in current working directory
+# 💾 Save merged output (one JSON record per line) in current working directory
 timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-output_path = f"merged_trailer_parts_{timestamp}.json"
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(merged_data, f, indent=4, ensure_ascii=False)
+output_path = f"merged_trailer_parts_{timestamp}{RECORD_EXT}"
+records = chain(*streams)
+if DEDUP:
+    # Clustering needs every name at once, so this is the one step that holds the catalog in memory
+    records, dedup_stats = dedupe_records(records, threshold=DEDUP_THRESHOLD)
+    print(f"🧬 Dedup: {dedup_stats['input']} records -> {dedup_stats['output']} products "
+          f"({dedup_stats['clusters_merged']} clusters merged, largest {dedup_stats['largest_cluster']})")
+write_count = write_records(output_path, records)
 
 # ✅ Final summary
-print(f"\n📦 Merged {total_ebay} eBay + {total_tpu} trailerpartsunlimited products into '{output_path}'")
+total_ebay = ebay_count.get("n", 0)
+total_tpu = tpu_count.get("n", 0)
+record_stage_items("merge", items_in=total_ebay + total_tpu, items_out=write_count)
+print(f"✅ Loaded {total_ebay} eBay items and {total_tpu} trailerpartsunlimited items")
+print(f"\n📦 Merged {total_ebay} eBay + {total_tpu} trailerpartsunlimited items into {write_count} products in '{output_path}'")
@@ -1,43 +1,53 @@
-import json
 import os
-import glob
+
+from catalog import format_offers
+from metrics import export_on_exit, record_stage_items
+from profiling import profile_stage
+from record_io import RECORD_EXT, iter_records, latest_file, write_records
+from specs import SPEC_FIELDS
+
+export_on_exit("chunk")
+profile_stage("chunk")  # --profile or TRAILER_PROFILE=1
 
 # 💾 Ensure output directory exists
 os.makedirs("data", exist_ok=True)
 
-# 🔍 Automatically get the latest merged_trailer_parts_*.json file
-merged_files = glob.glob("merged_trailer_parts_*.json")
-if not merged_files:
+# 🔍 Automatically get the latest merged_trailer_parts_*.json / .jsonl file
+latest_file_path = latest_file("merged_trailer_parts_*.json*")
+if not latest_file_path:
     print("❌ No merged_trailer_parts_*.json file found.")
     exit()
 
-latest_file = max(merged_files, key=os.path.getmtime)
-print(f"📂 Using latest merged file: {latest_file}")
+print(f"📂 Using latest merged file: {latest_file_path}")
 
-# 📂 Load merged product data
-with open(latest_file, "r", encoding="utf-8") as f:
-    products = json.load(f)
 
-# 🧩 Create structured chunks
-chunks = []
-for item in products:
-    chunk_text = f"""Product: {item.get('name', '')}
+# 🧩 Create structured chunks, one product at a time
+def build_chunks(products):
+    for item in products:
+        chunk_text = f"""Product: {item.get('name', '')}
 Price: {item.get('price', '')}
 Source: {item.get('source_site', '')}
 Link: {item.get('url', '')}"""
-
-    chunks.append({
-        "text": chunk_text.strip(),
-        "name": item.get("name", ""),
-        "price": item.get("price", "N/A"),
-        "seller": item.get("source_site", "Unknown"),
-        "link": item.get("url", "#"),
-        "image_url": item.get("image_url", "https://via.placeholder.com/150")
-    })
-
-# 💾 Save the chunked data
-output_file = "data/product_chunks.json"
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(chunks, f, indent=4)
-
-print(f"✅ Saved {len(chunks)} structured product chunks to '{output_file}'")
+        offers = item.get("offers") or []
+        if offers:
+            # Near-duplicates merged by the dedup step stay searchable as one product
+            chunk_text += f"\nOther offers: {format_offers(offers)}"
+
+        yield {
+            "text": chunk_text.strip(),
+            "name": item.get("name", ""),
+            "price": item.get("price", "N/A"),
+            "seller": item.get("source_site", "Unknown"),
+            "link": item.get("url", "#"),
+            "image_url": item.get("image_url", "https://via.placeholder.com/150"),
+            "offers": offers,
+            **{key: item[key] for key in SPEC_FIELDS if key in item}
+        }
+
+
+# 💾 Stream the chunked data to disk
+output_file = f"data/product_chunks{RECORD_EXT}"
+count = write_records(output_file, build_chunks(iter_records(latest_file_path)))
+record_stage_items("chunk", items_in=count, items_out=count)
+
+print(f"✅ Saved {count} structured product chunks to '{output_file}'")
@@ -1,58 +1,202 @@
-import json
-from sentence_transformers import SentenceTransformer
-import chromadb
-import os
-
-# 💾 Connect to ChromaDB and delete existing collection
-client = chromadb.PersistentClient(path="chromadb")
-client.delete_collection(name="trailer_parts")
-print("✅ Deleted existing 'trailer_parts' collection.")
-
-# 📦 Load merged product chunks
-chunk_file = "data/product_chunks.json"  # Update if you're using a different filename
-if not os.path.exists(chunk_file):
-    print(f"❌ File not found: {chunk_file}")
-    exit()
-
-with open(chunk_file, "r", encoding="utf-8") as f:
-    product_chunks = json.load(f)
-
-# 🧠 Load embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# 🧠 Prepare embeddings
-ids = [f"chunk_{i}" for i in range(len(product_chunks))]
-documents = [item.get("name", "") for item in product_chunks]
-
-# ✅ Improved metadata handling with correct source site
-metadatas = []
-for item in product_chunks:
-    url = item.get("url", item.get("link", ""))
-    
-    # Infer source_site if missing
-    source = item.get("source_site", "").strip()
-    if not source:
-        if "trailerpartsunlimited" in url:
-            source = "trailerpartsunlimited.com"
-        elif "ebay.com" in url:
-            source = "eBay"
-        else:
-            source = "Unknown"
-
-    metadatas.append({
-        "name": item.get("name", ""),
-        "price": item.get("price", ""),
-        "url": url,
-        "source_site": source,
-        "image_url": item.get("image_url", "https://via.placeholder.com/150")
-    })
-
-# 🔢 Encode product names
-embeddings = model.encode(documents).tolist()
-
-# 🚀 Insert into ChromaDB
-chroma_client = chromadb.PersistentClient(path="chromadb")
-collection = chroma_client.get_or_create_collection(name="trailer_parts")
-collection.add(documents=documents, embeddings=embeddings, metadatas=metadatas, ids=ids)
-
-print(f"✅ Inserted {len(product_chunks)} products with image URLs into ChromaDB.")
+import argparse
+import time
+
+from catalog import (FacetCounter, build_metadata, product_id, publish_catalog_version, publish_facets,
+                     read_catalog_version, read_facets)
+from embedding_cache import CachedEncoder
+from embed_engine import Checkpoint, EncoderPool, Timer, iter_batches, report_batch
+from metrics import export_on_exit, gauge, record_stage_items
+from profiling import profile_stage
+from projection import FIT_SAMPLE, REDUCE_DIM, PCAProjection
+from record_io import iter_records, latest_file
+from vector_store import QUANTIZATIONS, VECTOR_BACKEND, max_batch_size, open_collection
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+CHUNK_PATTERN = "data/product_chunks.json*"  # .jsonl[.gz|.zst] from 2chunking.py, or a legacy .json array
+
+CATALOG_PRODUCTS = gauge("trailer_catalog_products", "Products in the Chroma collection after the last embed run")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed product chunks into ChromaDB")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="re-encode and upsert every product, even unchanged ones")
+    parser.add_argument("--batch-size", type=int, default=2000,
+                        help="chunks read, encoded and checkpointed per batch")
+    parser.add_argument("--write-batch-size", type=int, default=1000,
+                        help="maximum records per Chroma upsert/delete call")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="CPU worker processes used for encoding")
+    parser.add_argument("--flush-seconds", type=float, default=300,
+                        help="numpy backend: publish a new index generation (and move the checkpoint) at "
+                             "most this often; 0 = only once at the end")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="ignore any checkpoint left by an interrupted run")
+    parser.add_argument("--quantize", choices=QUANTIZATIONS, default=None,
+                        help="numpy backend: store int8 or product-quantized codes for search "
+                             "(default: VECTOR_QUANTIZATION, else none)")
+    parser.add_argument("--reduce-dim", type=int, default=None,
+                        help="PCA profile: store 64/128/192-dim vectors, 0 = full width "
+                             "(default: VECTOR_REDUCE_DIM, else 0); changing it re-embeds the catalog")
+    parser.add_argument("--profile", action="store_true",
+                        help="sample the run and save a flamegraph-ready profile under logs/profiles")
+    return parser.parse_args()
+
+
+# 🔎 Fetch the content hashes already stored, page by page
+def load_existing_hashes(collection, page_size=5000):
+    existing = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for pid, meta in zip(page["ids"], page["metadatas"]):
+            existing[pid] = (meta or {}).get("content_hash")
+        offset += len(page["ids"])
+    return existing
+
+
+# 📉 Fit the PCA profile on the first FIT_SAMPLE products (their vectors stay in the embedding cache)
+def fit_projection(chunk_file, encoder, dim, sample=FIT_SAMPLE):
+    names = {}
+    for item in iter_records(chunk_file):
+        names.setdefault(product_id(item), item.get("name", ""))
+        if len(names) >= sample:
+            break
+    return PCAProjection.fit(encoder.encode(list(names.values())), dim)
+
+
+def main():
+    args = parse_args()
+    export_on_exit("embed")
+    profile_stage("embed", enabled=args.profile or None)
+
+    # 📦 Check the merged product chunks
+    chunk_file = latest_file(CHUNK_PATTERN)
+    if not chunk_file:
+        print(f"❌ File not found: {CHUNK_PATTERN}")
+        exit()
+    print(f"📂 Using chunk file: {chunk_file}")
+
+    # 💾 Open the vector store (VECTOR_BACKEND: chroma or numpy) — updated in place, never dropped
+    # (a new reduction profile is built next to it, and readers only switch once it is complete)
+    collection = open_collection(**({"quantization": args.quantize} if args.quantize else {}))
+    write_batch_size = max_batch_size(collection, args.write_batch_size)
+    print(f"🗄️ Vector backend: {VECTOR_BACKEND}")
+
+    # 📉 A new reduction profile (or --rebuild with one) refits the projection and re-embeds everything
+    reduce_dim = REDUCE_DIM if args.reduce_dim is None else args.reduce_dim
+    projection = collection.projection()
+    refit = reduce_dim != (projection.dim_out if projection else 0) or (args.rebuild and reduce_dim > 0)
+    existing = {} if refit else load_existing_hashes(collection)
+
+    # 🔖 Resume after the last fully written batch of an interrupted run
+    checkpoint = Checkpoint()
+    fingerprint = Checkpoint.fingerprint(chunk_file, rebuild=args.rebuild, reduce_dim=reduce_dim)
+    resume_from = 0 if args.no_resume or refit else checkpoint.load(fingerprint)
+    if resume_from:
+        print(f"🔖 Resuming after {resume_from} already embedded chunks")
+
+    seen = set()
+    facets = FacetCounter()
+    done = 0
+    upserted = new_count = 0
+
+    # 💾 Buffered backends (numpy) rewrite the whole index on every flush: publish at most every
+    # --flush-seconds, and only move the checkpoint past what has been published
+    buffered = hasattr(collection, "flush")
+    last_flush = time.monotonic()
+    writer = collection
+
+    with EncoderPool(MODEL_NAME, workers=args.workers) as pool:
+        # 🔢 Encode through the on-disk embedding cache; misses go to the worker pool
+        encoder = CachedEncoder(MODEL_NAME, encode_fn=pool.encode)
+
+        if refit:
+            projection = fit_projection(chunk_file, encoder, reduce_dim) if reduce_dim else None
+            writer = collection.build(projection)
+            print(f"📉 Reduction profile changed: re-embedding every product at {reduce_dim or 'full'} width "
+                  f"into {writer.inner.name}")
+        if projection:
+            print(projection.describe())
+
+        for batch_no, batch in enumerate(iter_batches(iter_records(chunk_file), args.batch_size), 1):
+            with Timer() as timer:
+                # 🆔 Later duplicates of the same listing win
+                latest = {}
+                for i, item in enumerate(batch):
+                    pid = product_id(item)
+                    if pid not in seen:
+                        facets.add(build_metadata(item))
+                    seen.add(pid)
+                    if done + i >= resume_from:
+                        latest[pid] = item
+
+                # 🧮 Keep only new or changed products
+                to_upsert = []
+                for pid, item in latest.items():
+                    meta = build_metadata(item)
+                    if args.rebuild or existing.get(pid) != meta["content_hash"]:
+                        to_upsert.append((pid, item.get("name", ""), meta))
+
+                # 🚀 Encode and write in bounded batches
+                for start in range(0, len(to_upsert), write_batch_size):
+                    part = to_upsert[start:start + write_batch_size]
+                    ids = [pid for pid, _, _ in part]
+                    documents = [doc for _, doc, _ in part]
+                    metadatas = [meta for _, _, meta in part]
+                    embeddings = encoder.encode(documents).tolist()
+                    writer.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+                    for pid, _, meta in part:
+                        new_count += pid not in existing
+                        existing[pid] = meta["content_hash"]
+                upserted += len(to_upsert)
+
+                done += len(batch)
+                if buffered and args.flush_seconds and time.monotonic() - last_flush >= args.flush_seconds:
+                    writer.flush()
+                    last_flush = time.monotonic()
+                    if done > resume_from:
+                        checkpoint.save(fingerprint, done)
+                elif not buffered and done > resume_from:
+                    checkpoint.save(fingerprint, done)
+
+            if latest:
+                report_batch(batch_no, len(latest), len(to_upsert), timer.elapsed)
+
+    # 🗑️ Drop products that disappeared from the latest scrape
+    to_delete = [pid for pid in existing if pid not in seen]
+    for start in range(0, len(to_delete), write_batch_size):
+        writer.delete(ids=to_delete[start:start + write_batch_size])
+    if buffered:
+        writer.flush()
+    if refit:
+        collection.publish(writer)
+        print(f"🔀 Readers switched to {writer.inner.name}")
+    checkpoint.clear()
+
+    # 📣 Tell query-side caches that the catalog changed
+    if upserted or to_delete:
+        version = publish_catalog_version(collection.count())
+        print(f"📣 Published catalog version {version['version']}")
+
+    # 📊 Filter facets for the current catalog version (also written when only they are missing)
+    current = read_catalog_version()
+    if (read_facets() or {}).get("version") != current or upserted or to_delete:
+        publish_facets(facets.to_dict(), current)
+        print(f"📊 Saved filter facets for {facets.total} products")
+
+    record_stage_items("embed", items_in=len(seen), items_out=upserted)
+    CATALOG_PRODUCTS.set(collection.count())
+    print(f"🧮 {len(seen)} products: {new_count} new, {upserted - new_count} changed, "
+          f"{max(0, len(seen) - upserted)} unchanged, {len(to_delete)} removed")
+    print(f"✅ Upserted {upserted} and deleted {len(to_delete)} products in the {VECTOR_BACKEND} index "
+          f"({collection.count()} total).")
+    print(encoder.cache.summary())
+    if hasattr(collection, "memory_report"):
+        print(collection.memory_report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
-import chromadb
+import os
 
-# 🔧 Setup ChromaDB client and collection
-chroma_client = chromadb.PersistentClient(path="chromadb")
-collection = chroma_client.get_or_create_collection(name="trailer_parts")
+from catalog import format_offers, parse_offers
+from embedding_cache import CachedEncoder
+from reranker import CrossEncoderReranker
+from retrieval import Retriever, format_timing
+from retrieval_client import RETRIEVAL_URL, RemoteRetriever, RetrievalServiceError
+from vector_store import open_collection
+
+# 🎯 RERANK=1 reorders an over-fetched candidate list with a cross-encoder (RERANK_BUDGET_MS per query)
+RERANK = os.environ.get("RERANK", "0") == "1"
+
+if RETRIEVAL_URL:
+    # 🛰️ Thin client: the retrieval service keeps the model and collection warm
+    retriever = RemoteRetriever(RETRIEVAL_URL)
+else:
+    # 🔧 Open the vector store (VECTOR_BACKEND: chroma or numpy)
+    collection = open_collection()
+
+    # 🧠 Query encoder backed by the shared on-disk embedding cache, plus in-memory query/result caches
+    encoder = CachedEncoder("all-MiniLM-L6-v2")
+    retriever = Retriever(collection, encoder, reranker=CrossEncoderReranker() if RERANK else None)
 
 print("🔍 Trailer Parts Search (via ChromaDB)")
 print("Type your product query below (or type 'exit' to quit):\n")
@@ -12,10 +29,16 @@ while True:
     user_query = input("🧠 Enter your product search query: ").strip()
     if user_query.lower() in ["exit", "quit"]:
         print("👋 Goodbye!")
+        print(retriever.summary())
         break
 
     # 🔎 Perform ChromaDB query
-    results = collection.query(query_texts=[user_query], n_results=5)
+    try:
+        results = retriever.search(user_query, n_results=5, rerank=RERANK)
+    except RetrievalServiceError as e:
+        print(f"❌ {e}\n")
+        continue
+    print(format_timing(results["timing"]))
 
     documents = results.get("documents", [[]])[0]
     metadatas = results.get("metadatas", [[]])[0]
@@ -36,4 +59,7 @@ while True:
             print(f"   🌐 Source: {source}")
             print(f"   🔗 URL: {url}")
             print(f"   🖼️ Image: {image_url}")
+            offers = parse_offers(metadata)
+            if offers:
+                print(f"   🛒 Other offers: {format_offers(offers)}")
             print("-" * 60)
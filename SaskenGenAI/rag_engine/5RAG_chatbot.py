@@ -1,13 +1,29 @@
-import chromadb
-import requests
+import os
 
-# 🔗 Ollama settings
-OLLAMA_MODEL = "llama3"
-OLLAMA_URL = "http://localhost:11434/api/generate"
+from catalog import format_offers, parse_offers
+from embedding_cache import CachedEncoder
+from llm_client import OLLAMA_MODEL, OLLAMA_URL, OllamaClient, OllamaError, format_stats
+from reranker import CrossEncoderReranker
+from retrieval import Retriever, format_timing
+from retrieval_client import RETRIEVAL_URL, RemoteRetriever, RetrievalServiceError
+from vector_store import open_collection
 
-# 🔍 Connect to ChromaDB
-chroma_client = chromadb.PersistentClient(path="chromadb")
-collection = chroma_client.get_or_create_collection(name="trailer_parts")
+# 🔗 Ollama client (settings overridable via OLLAMA_URL / OLLAMA_MODEL), one keep-alive session
+llm = OllamaClient(url=OLLAMA_URL, model=OLLAMA_MODEL)
+
+# 🎯 RERANK=1 reorders an over-fetched candidate list with a cross-encoder (RERANK_BUDGET_MS per query)
+RERANK = os.environ.get("RERANK", "0") == "1"
+
+if RETRIEVAL_URL:
+    # 🛰️ Thin client: the retrieval service keeps the model and collection warm
+    retriever = RemoteRetriever(RETRIEVAL_URL)
+else:
+    # 🔍 Open the vector store (VECTOR_BACKEND: chroma or numpy)
+    collection = open_collection()
+
+    # 🧠 Query encoder backed by the shared on-disk embedding cache, plus in-memory query/result caches
+    encoder = CachedEncoder("all-MiniLM-L6-v2")
+    retriever = Retriever(collection, encoder, reranker=CrossEncoderReranker() if RERANK else None)
 
 # 🧠 Helper to format product context
 def format_context(metadatas):
@@ -17,7 +33,11 @@ def format_context(metadatas):
         price = meta.get("price", "N/A")
         source = meta.get("source_site", "Unknown")
         url = meta.get("url", "#")
-        chunks.append(f"- {name}\n  Price: ${price}\n  Source: {source}\n  Link: {url}")
+        chunk = f"- {name}\n  Price: ${price}\n  Source: {source}\n  Link: {url}"
+        offers = parse_offers(meta)
+        if offers:
+            chunk += f"\n  Other offers: {format_offers(offers)}"
+        chunks.append(chunk)
     return "\n\n".join(chunks)
 
 # 💬 Query loop
@@ -28,10 +48,16 @@ while True:
     user_query = input("🧠 You: ").strip()
     if user_query.lower() in ("exit", "quit"):
         print("👋 Goodbye!")
+        print(retriever.summary())
         break
 
     # 🔎 Step 1: Query ChromaDB
-    results = collection.query(query_texts=[user_query], n_results=5)
+    try:
+        results = retriever.search(user_query, n_results=5, rerank=RERANK)
+    except RetrievalServiceError as e:
+        print(f"❌ {e}\n" + "-" * 60)
+        continue
+    print(format_timing(results["timing"]))
     metadatas = results.get("metadatas", [[]])[0]
 
     if not metadatas:
@@ -54,19 +80,14 @@ User Question: {user_query}
 
 Answer:"""
 
-    # 🤖 Step 4: Ask LLaMA
+    # 🤖 Step 4: Ask LLaMA, printing tokens as they stream in
     try:
-        response = requests.post(OLLAMA_URL, json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False
-        })
-        if response.status_code == 200:
-            answer = response.json().get("response", "").strip()
-            print(f"\n🤖 LLaMA 3: {answer}\n")
-        else:
-            print(f"❌ Error from LLaMA 3: {response.status_code}\n")
-    except Exception as e:
-        print(f"❌ Exception while calling LLaMA: {e}\n")
+        answer = llm.stream(prompt)
+        print("\n🤖 LLaMA 3: ", end="", flush=True)
+        for token in answer:
+            print(token, end="", flush=True)
+        print(f"\n\n{format_stats(answer.stats)}\n")
+    except OllamaError as e:
+        print(f"\n❌ Error from LLaMA 3: {e}\n")
 
     print("-" * 60)
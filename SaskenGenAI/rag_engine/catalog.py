@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+from specs import SPEC_FIELDS
+
+PLACEHOLDER_IMAGE = "https://via.placeholder.com/150"
+
+
+# 🌐 Infer source_site from the product URL when the chunk does not carry one
+def infer_source(item):
+    url = item.get("url", item.get("link", ""))
+    source = (item.get("source_site") or "").strip()
+    if source:
+        return source
+    if "trailerpartsunlimited" in url:
+        return "trailerpartsunlimited.com"
+    if "ebay.com" in url:
+        return "eBay"
+    return "Unknown"
+
+
+# 🆔 Stable product id: derived from the listing URL, or from name + source when there is no usable URL
+def product_id(item):
+    url = (item.get("url", item.get("link", "")) or "").strip()
+    if url and url != "#":
+        key = url
+    else:
+        key = f"{infer_source(item)}|{item.get('name', '').strip()}"
+    return "p_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+# 🔑 Content hash: changes whenever anything we embed or display for the product changes
+def content_hash(item):
+    parts = [
+        item.get("name", ""),
+        str(item.get("price", "")),
+        infer_source(item),
+        item.get("image_url", ""),
+    ]
+    if item.get("offers"):
+        parts.append(json.dumps(item["offers"], sort_keys=True))
+    specs = {key: item[key] for key in SPEC_FIELDS if key in item}
+    if specs:
+        parts.append(json.dumps(specs, sort_keys=True))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# 🏷️ Chroma metadata for one product chunk
+def build_metadata(item):
+    meta = {
+        "name": item.get("name", ""),
+        "price": item.get("price", ""),
+        "url": item.get("url", item.get("link", "")),
+        "source_site": infer_source(item),
+        "image_url": item.get("image_url", PLACEHOLDER_IMAGE),
+        "content_hash": content_hash(item),
+        # Alternate offers merged in by the dedup step (Chroma metadata must be scalar, so JSON text)
+        "offer_count": len(item.get("offers") or []),
+        "offers": json.dumps(item.get("offers") or []),
+    }
+    # Typed fields from the normalize step (price_min, capacity_lbs, ...) for `where` filters
+    meta.update({key: item[key] for key in SPEC_FIELDS if key in item})
+    return meta
+
+
+def parse_offers(meta):
+    try:
+        return json.loads(meta.get("offers") or "[]")
+    except ValueError:
+        return []
+
+
+# 🛒 "$279.00 (eBay), $289 (trailerpartsunlimited.com)" for display and prompts
+def format_offers(offers):
+    return ", ".join(f"${o.get('price', 'N/A')} ({o.get('source_site') or 'Unknown'})" for o in offers)
+
+
+# 📣 Catalog version: bumped by the embed stage whenever it publishes a new catalog, so query-side
+# caches know when their results went stale
+CATALOG_VERSION_FILE = os.path.join("chromadb", "catalog_version.json")
+
+
+def publish_catalog_version(count, path=CATALOG_VERSION_FILE):
+    version = {
+        "version": f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}",
+        "published_at": datetime.now().isoformat(),
+        "count": count,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(version, f, indent=2)
+    os.replace(tmp, path)
+    return version
+
+
+def read_catalog_version(path=CATALOG_VERSION_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+# 📊 Facet counts for the search filters, computed by the embed stage while it streams the catalog
+# and saved next to the catalog version, so the UI never has to scan the collection to draw them
+FACETS_FILE = os.path.join("chromadb", "catalog_facets.json")
+FACET_FIELDS = ("source_site", "brake_type", "axle_count", "capacity_lbs")
+PRICE_BUCKETS = (0, 50, 100, 250, 500, 1000, 2500)
+
+
+class FacetCounter:
+    def __init__(self):
+        self.values = {field: {} for field in FACET_FIELDS}
+        self.price_buckets = [0] * len(PRICE_BUCKETS)
+        self.price_min = None
+        self.price_max = None
+        self.total = 0
+
+    def add(self, meta):
+        self.total += 1
+        for field in FACET_FIELDS:
+            if field in meta:
+                key = str(meta[field])
+                self.values[field][key] = self.values[field].get(key, 0) + 1
+        price = meta.get("price_min")
+        if price is not None:
+            self.price_buckets[sum(price >= edge for edge in PRICE_BUCKETS[1:])] += 1
+            self.price_min = price if self.price_min is None else min(self.price_min, price)
+            self.price_max = price if self.price_max is None else max(self.price_max, price)
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "values": self.values,
+            "price": {"min": self.price_min, "max": self.price_max,
+                      "buckets": list(PRICE_BUCKETS), "counts": self.price_buckets},
+        }
+
+
+def publish_facets(facets, version, path=FACETS_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, **facets}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_facets(path=FACETS_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,172 @@
+import re
+
+import numpy as np
+
+from catalog import PLACEHOLDER_IMAGE
+from specs import parse_price_range
+
+# 🧬 Near-duplicate product detection (MinHash + LSH)
+#
+# Each normalized product name becomes a set of character 4-grams, summarized by a MinHash signature
+# (NUM_PERM minimum hash values). Signatures are cut into BANDS bands; two products that agree
+# on a whole band land in the same LSH bucket and become candidates. Candidates are only merged
+# when their estimated Jaccard similarity reaches the threshold and the numbers in their names
+# (capacities, sizes, part numbers) are identical, so "3500 lb axle" never absorbs "7000 lb axle".
+# Every record is hashed into BANDS buckets and compared against one representative per bucket,
+# so the work grows linearly with the catalog instead of with the number of pairs.
+
+NUM_PERM = 128
+BANDS = 16  # 8 rows per band -> pairs above ~0.7 Jaccard almost always share a bucket
+SHINGLE_SIZE = 4
+DEFAULT_THRESHOLD = 0.8
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_name(name):
+    return _NON_ALNUM.sub(" ", (name or "").lower()).strip()
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: ((a * x + b) mod 2^64) >> 32, with odd a
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    # Signatures of normalized names (ASCII a-z, 0-9 and spaces), one row per name. A 4-character
+    # shingle packs exactly into a uint32, so shingling and hashing are plain array operations
+    # over a block of names at a time.
+    def signatures(self, texts, block=256):
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), block):
+            out[start:start + block] = self._block(texts[start:start + block])
+        return out
+
+    def _block(self, texts):
+        padded = [t.ljust(SHINGLE_SIZE) for t in texts]
+        data = np.frombuffer("".join(padded).encode("ascii"), dtype=np.uint8).astype(np.uint64)
+        lengths = np.fromiter((len(t) for t in padded), dtype=np.int64, count=len(padded))
+        counts = lengths - SHINGLE_SIZE + 1
+        text_starts = np.cumsum(lengths) - lengths
+        gram_starts = np.cumsum(counts) - counts
+        positions = np.arange(counts.sum()) + np.repeat(text_starts - gram_starts, counts)
+        codes = np.zeros(len(positions), dtype=np.uint64)
+        for k in range(SHINGLE_SIZE):
+            codes = (codes << np.uint64(8)) | data[positions + k]
+        hashed = self.a[:, None] * codes[None, :]
+        hashed += self.b[:, None]
+        hashed >>= np.uint64(32)
+        return np.minimum.reduceat(hashed, gram_starts, axis=1).T.astype(np.uint32)
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            # The earlier record stays the root, so cluster order follows input order
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+# 🔗 Cluster near-duplicate names; returns a list of clusters (lists of record indexes)
+def find_clusters(names, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+
+    normalized = [normalize_name(name) for name in names]
+    numbers = [tuple(_NUMBER.findall(text)) for text in normalized]
+    signatures = hasher.signatures(normalized)
+
+    clusters = _DisjointSet(len(names))
+    for band in range(bands):
+        buckets = {}
+        keys = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows]).view(f"V{rows * 4}").ravel()
+        for i, key in enumerate(keys.tolist()):
+            if not normalized[i]:
+                continue  # nameless records are never merged
+            rep = buckets.setdefault(key, i)
+            if rep == i or clusters.find(rep) == clusters.find(i):
+                continue
+            if numbers[rep] != numbers[i]:
+                continue
+            if np.count_nonzero(signatures[rep] == signatures[i]) >= threshold * num_perm:
+                clusters.union(rep, i)
+
+    grouped = {}
+    for i in range(len(names)):
+        grouped.setdefault(clusters.find(i), []).append(i)
+    return list(grouped.values())
+
+
+# Lowest price: price_min from specs.py ("123.45 to 150.00" -> 123.45), parsed here for offers;
+# records without any price sort last
+def _price_value(record):
+    price = record.get("price_min")
+    if price is None:
+        price = parse_price_range(record.get("price", ""))[0]
+    return float("inf") if price is None else price
+
+
+# 🏆 Canonical record: has a real image, then cheapest, then first seen
+def _canonical_index(records):
+    return min(range(len(records)), key=lambda i: (
+        records[i].get("image_url", PLACEHOLDER_IMAGE) == PLACEHOLDER_IMAGE,
+        _price_value(records[i]),
+        i,
+    ))
+
+
+def offer_of(record):
+    return {
+        "price": record.get("price", ""),
+        "url": record.get("url", ""),
+        "source_site": record.get("source_site", ""),
+    }
+
+
+# 🧹 Collapse near-duplicates into canonical records carrying their alternate offers
+# ("offers", cheapest first). Returns (records, stats).
+def dedupe_records(records, threshold=DEFAULT_THRESHOLD):
+    records = list(records)
+    clusters = find_clusters([r.get("name", "") for r in records], threshold=threshold)
+
+    merged = []
+    largest = 1
+    for cluster in clusters:
+        members = [records[i] for i in cluster]
+        best = _canonical_index(members)
+        canonical = dict(members[best])
+        # Exact relistings (same URL) are dropped, not kept as offers
+        seen_urls = {canonical.get("url", "")}
+        offers = []
+        for i, member in enumerate(members):
+            url = member.get("url", "")
+            if i == best or (url and url in seen_urls):
+                continue
+            seen_urls.add(url)
+            offers.append(offer_of(member))
+        if offers:
+            canonical["offers"] = sorted(offers, key=_price_value)
+        merged.append(canonical)
+        largest = max(largest, len(cluster))
+
+    stats = {
+        "input": len(records),
+        "output": len(merged),
+        "clusters_merged": sum(1 for c in clusters if len(c) > 1),
+        "largest_cluster": largest,
+    }
+    return merged, stats
@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from encoder_backend import ENCODER_BACKEND, ENCODER_THREADS, load_encoder
+
+CHECKPOINT_FILE = os.path.join("data", "embed_checkpoint.json")
+
+
+# 📦 Group any iterable into lists of at most `size` items
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# 🔖 Records how many input items have been fully written, keyed by the input file's fingerprint
+class Checkpoint:
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+
+    @staticmethod
+    def fingerprint(source, **options):
+        stat = os.stat(source)
+        return {"source": os.path.abspath(source), "size": stat.st_size,
+                "mtime": stat.st_mtime, **options}
+
+    def load(self, fingerprint):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get("fingerprint") != fingerprint:
+            return 0
+        return int(state.get("done", 0))
+
+    def save(self, fingerprint, done):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "done": done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# 🏭 Pool of CPU worker processes running the SentenceTransformer (sentence-transformers' own
+# multi-process pool). The model and pool start on the first encode() call, so a run with
+# nothing to encode never pays for them. With workers <= 1 encoding runs in-process.
+# ONNX backends run in-process and use the workers as ONNX Runtime threads instead (unless
+# ENCODER_THREADS is set): one session shares its weights across threads, processes would copy them.
+class EncoderPool:
+    def __init__(self, model_name, workers=1, batch_size=64, backend=ENCODER_BACKEND, threads=ENCODER_THREADS):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.backend = backend
+        self.threads = threads
+        self._model = None
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def _start(self):
+        if self.backend != "torch":
+            threads = self.threads or (self.workers if self.workers > 1 else 0)
+            self._model = load_encoder(self.model_name, self.backend, threads)
+            print(f"⚙️ Encoder: {self.backend}, {threads or 'default'} threads")
+            return
+        self._model = load_encoder(self.model_name, "torch", self.threads)
+        if self.workers > 1:
+            self._pool = self._model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+
+    def encode(self, texts):
+        if self._model is None:
+            self._start()
+        if self._pool is not None:
+            return self._model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+        return self._model.encode(texts, batch_size=self.batch_size)
+
+
+# ⏱️ Per-batch throughput line
+def report_batch(batch_no, read, encoded, elapsed):
+    rate = read / elapsed if elapsed > 0 else float("inf")
+    print(f"⚡ Batch {batch_no}: {read} read, {encoded} encoded in {elapsed:.2f}s ({rate:,.0f} items/sec)")
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
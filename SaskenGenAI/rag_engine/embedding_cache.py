@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from encoder_backend import cache_name, load_encoder
+from metrics import counter, histogram
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+CACHE_DIR = os.path.join("cache", "embeddings")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of vectors + index per model
+
+KEY_BYTES = 16
+STAMP_BYTES = 8
+MIN_CAPACITY = 1024
+REFRESH_INTERVAL = 1.0  # seconds between checks of meta.json for rows written by other processes
+
+EMBEDDING_SECONDS = histogram("trailer_embedding_seconds", "Time to encode one batch of uncached texts", ("model",))
+EMBEDDED_TEXTS = counter("trailer_embedding_texts_total", "Texts embedded, served from the cache or the model",
+                         ("model", "source"))
+
+
+# 🔑 Compact cache key for one text
+def text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def _safe_name(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+# 🔒 Cross-process write lock based on an exclusively created lock file (works on Windows and Linux)
+class _FileLock:
+    def __init__(self, path, timeout=30.0, stale_after=60.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Could not acquire cache lock {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+# 💾 On-disk embedding cache for one model.
+#
+# Layout of cache/embeddings/<model>/:
+#   vectors.f32  float32 matrix (capacity x dim), memory-mapped
+#   keys.bin     16-byte blake2b key of the text stored in each row
+#   stamps.i64   last-use clock per row, used for LRU eviction once max_bytes is reached
+#   meta.json    dim / rows / capacity / clock / generation
+#
+# Every hit re-checks the key stored in its row, so a stale in-memory index (another
+# process evicted or rewrote the row) degrades to a miss instead of returning a wrong vector.
+class EmbeddingCache:
+    def __init__(self, model_name=DEFAULT_MODEL, root=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.model_name = model_name
+        self.dir = os.path.join(root, _safe_name(model_name))
+        self.max_bytes = max_bytes
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._file_lock = _FileLock(os.path.join(self.dir, ".lock"))
+        self._meta_path = os.path.join(self.dir, "meta.json")
+        self._index = {}
+        self._vectors = self._keys = self._stamps = None
+        self._dim = None
+        self._rows = 0
+        self._capacity = 0
+        self._clock = 0
+        self._generation = -1
+        self._meta_mtime = None
+        self._next_refresh = 0.0
+        self._load()
+        if self._dim is not None and self._rows > self._max_rows():
+            self._trim()  # max_bytes was lowered since the cache was written
+
+    # ---------- persistence ----------
+    def _read_meta(self):
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self._dim,
+                "rows": self._rows,
+                "capacity": self._capacity,
+                "clock": self._clock,
+                "generation": self._generation,
+            }, f)
+        os.replace(tmp, self._meta_path)
+        self._meta_mtime = self._stat_meta()
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _open_maps(self):
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r+",
+                                  shape=(self._capacity, self._dim))
+        self._keys = np.memmap(self._path("keys.bin"), dtype=np.uint8, mode="r+",
+                               shape=(self._capacity, KEY_BYTES))
+        self._stamps = np.memmap(self._path("stamps.i64"), dtype=np.int64, mode="r+",
+                                 shape=(self._capacity,))
+
+    def _close_maps(self):
+        for arr in (self._vectors, self._keys, self._stamps):
+            if arr is not None:
+                arr.flush()
+        self._vectors = self._keys = self._stamps = None
+
+    def _stat_meta(self):
+        try:
+            return os.stat(self._meta_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        self._meta_mtime = self._stat_meta()
+        meta = self._read_meta()
+        if not meta or not meta.get("dim"):
+            return
+        self._close_maps()
+        self._dim = meta["dim"]
+        self._rows = meta["rows"]
+        self._capacity = meta["capacity"]
+        self._clock = max(self._clock, meta["clock"])
+        self._generation = meta["generation"]
+        self._open_maps()
+        keys = self._keys[:self._rows]
+        self._index = {keys[i].tobytes(): i for i in range(self._rows)}
+
+    # Readers look at meta.json at most every REFRESH_INTERVAL and only parse it when its mtime
+    # changed; writers (force=True, under the file lock) always do
+    def _refresh_if_stale(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        self._next_refresh = now + REFRESH_INTERVAL
+        if self._stat_meta() == self._meta_mtime:
+            return
+        meta = self._read_meta()
+        if meta and meta.get("generation", -1) != self._generation:
+            self._load()
+        else:
+            self._meta_mtime = self._stat_meta()
+
+    # 🧹 Keep the max_rows most recently used rows, moved to the front (the files keep their size:
+    # other processes may still have them mapped)
+    def _trim(self):
+        with self._lock, self._file_lock:
+            self._refresh_if_stale(force=True)
+            max_rows = self._max_rows()
+            if self._rows <= max_rows:
+                return
+            keep = np.sort(np.argsort(-self._stamps[:self._rows], kind="stable")[:max_rows])
+            self._vectors[:max_rows] = self._vectors[keep]
+            self._keys[:max_rows] = self._keys[keep]
+            self._stamps[:max_rows] = self._stamps[keep]
+            self.evictions += self._rows - max_rows
+            self._rows = max_rows
+            keys = self._keys[:self._rows]
+            self._index = {keys[i].tobytes(): i for i in range(self._rows)}
+            for arr in (self._vectors, self._keys, self._stamps):
+                arr.flush()
+            self._generation += 1
+            self._write_meta()
+
+    def _grow(self, needed):
+        new_capacity = min(self._max_rows(), max(MIN_CAPACITY, self._capacity * 2, needed))
+        self._close_maps()
+        for name, row_bytes in (("vectors.f32", self._dim * 4), ("keys.bin", KEY_BYTES),
+                                ("stamps.i64", STAMP_BYTES)):
+            with open(self._path(name), "ab") as f:
+                f.truncate(new_capacity * row_bytes)
+        self._capacity = new_capacity
+        self._open_maps()
+
+    def _max_rows(self):
+        return max(1, self.max_bytes // (self._dim * 4 + KEY_BYTES + STAMP_BYTES))
+
+    # ---------- lookups ----------
+    def get_many(self, texts):
+        results = [None] * len(texts)
+        with self._lock:
+            self._refresh_if_stale()  # pick up rows another process (the embed step) added
+            for i, text in enumerate(texts):
+                key = text_key(text)
+                row = self._index.get(key)
+                if row is not None and row < self._capacity and self._keys[row].tobytes() == key:
+                    self._clock += 1
+                    self._stamps[row] = self._clock
+                    results[i] = np.array(self._vectors[row])
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return results
+
+    def put_many(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock, self._file_lock:
+            self._refresh_if_stale(force=True)
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Expected {self._dim}-dim vectors for {self.model_name}, got {vectors.shape[1]}")
+
+            # Only store each new key once
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key not in self._index:
+                    pending[key] = vector
+            if not pending:
+                return
+
+            max_rows = self._max_rows()
+            keys = list(pending)[-max_rows:]
+            free = max(0, max_rows - self._rows)
+            appended = min(free, len(keys))
+            if self._rows + appended > self._capacity:
+                self._grow(self._rows + appended)
+
+            # Evict least-recently-used rows (chosen before the new rows exist)
+            rows = []
+            evict = len(keys) - appended
+            if evict:
+                victims = np.argpartition(self._stamps[:self._rows], evict - 1)[:evict]
+                for row in victims:
+                    self._index.pop(self._keys[row].tobytes(), None)
+                rows.extend(int(r) for r in victims)
+                self.evictions += evict
+            rows = list(range(self._rows, self._rows + appended)) + rows
+            self._rows += appended
+
+            for key, row in zip(keys, rows):
+                self._clock += 1
+                self._vectors[row] = pending[key]
+                self._keys[row] = np.frombuffer(key, dtype=np.uint8)
+                self._stamps[row] = self._clock
+                self._index[key] = row
+
+            for arr in (self._vectors, self._keys, self._stamps):
+                arr.flush()
+            self._generation += 1
+            self._write_meta()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "rows": self._rows,
+            "bytes": self._rows * ((self._dim or 0) * 4 + KEY_BYTES + STAMP_BYTES),
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"📊 Embedding cache [{s['model']}]: {s['hits']} hits, {s['misses']} misses "
+                f"({s['hit_rate']:.0%} hit rate), {s['evictions']} evictions, {s['rows']} vectors stored")
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
+
+
+# 🧠 Encoder wrapper: serves vectors from the cache and only runs the model on misses.
+# The model (ENCODER_BACKEND: torch, onnx or onnx-int8) is loaded lazily, so a fully cached run
+# never loads it.
+class CachedEncoder:
+    def __init__(self, model_name=DEFAULT_MODEL, cache=None, encode_fn=None):
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache(cache_name(model_name))
+        self._encode_fn = encode_fn
+        self._model = None
+
+    def _encode_uncached(self, texts):
+        if self._encode_fn is not None:
+            return self._encode_fn(texts)
+        if self._model is None:
+            self._model = load_encoder(self.model_name)
+        return self._model.encode(texts)
+
+    def encode(self, texts):
+        texts = list(texts)
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        EMBEDDED_TEXTS.inc(sum(v is not None for v in vectors), model=self.model_name, source="cache")
+        if missing:
+            with EMBEDDING_SECONDS.time(model=self.model_name):
+                encoded = np.asarray(self._encode_uncached(missing), dtype=np.float32)
+            EMBEDDED_TEXTS.inc(len(missing), model=self.model_name, source="model")
+            self.cache.put_many(missing, encoded)
+            fresh = dict(zip(missing, encoded))
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, self.cache._dim or 0), dtype=np.float32)
+        return np.vstack(vectors)
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+# ⚙️ Inference backends for the sentence encoder
+#
+# ENCODER_BACKEND selects how CachedEncoder (search side) and EncoderPool (embed step) run the model:
+#   torch      SentenceTransformer in PyTorch eval mode, as before
+#   onnx       the same transformer exported to ONNX and run by ONNX Runtime, with pooling and
+#              normalization done in NumPy. The query side only needs onnxruntime and tokenizers.
+#   onnx-int8  the ONNX graph with dynamically int8-quantized weights (smaller and faster on CPU;
+#              vectors move slightly, see --check)
+# ENCODER_THREADS caps intra-op threads for any backend (0 = library default).
+#
+# The export is done once, with torch and sentence-transformers, into cache/onnx/<model>/:
+#   model.onnx / model_int8.onnx, tokenizer.json, encoder.json (max length, pooling, normalization)
+#
+#   python rag_engine/encoder_backend.py --backend onnx-int8 --check   # export + parity vs PyTorch
+
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "0"))
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = os.path.join("cache", "onnx")
+ONNX_OPSET = 14
+
+# pip packages behind the optional ONNX backends (the "ONNX backend" block of requirements.txt)
+ONNX_REQUIREMENTS = "onnxruntime tokenizers onnx"
+
+# Parity thresholds against the PyTorch vectors (cosine similarity of the same text)
+PARITY_MIN_COSINE = {"onnx": 0.9999, "onnx-int8": 0.98}
+
+PARITY_TEXTS = [
+    "7000 lb Tandem Axle Trailer Kit Electric Brakes 6-Lug", "3500 lb idler axle 84\" hub face",
+    "Dexter 5.2K electric brake assembly 12\" x 2\"", "trailer leaf spring hanger kit", "#84-440 bearing kit",
+    "coupler 2-5/16\" ball", "hydraulic surge brakes for boat trailer", "5 on 4.5 idler hub galvanized",
+    "tongue jack 2000 lb swivel", "torsion axle 3500 lbs 5 lug", "brake controller", "U-bolt kit 3\" axle",
+]
+
+
+def _safe_name(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+def export_dir(model_name, root=ONNX_DIR):
+    return os.path.join(root, _safe_name(model_name))
+
+
+def _set_torch_threads(threads):
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+# An ImportError that names the package to install instead of only the module that failed
+def _missing(e, backend):
+    return ImportError(f"ENCODER_BACKEND={backend} needs the '{e.name}' package: pip install {e.name} "
+                       f"(all ONNX backend packages: pip install {ONNX_REQUIREMENTS})", name=e.name)
+
+
+# 📦 Export the SentenceTransformer's transformer to ONNX (+ its fast tokenizer and pooling settings)
+def export_onnx(model_name, root=ONNX_DIR):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    directory = export_dir(model_name, root)
+    os.makedirs(directory, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    pooling = next((m for m in model if isinstance(m, Pooling)), None)
+
+    sample = tokenizer(PARITY_TEXTS[:2], padding=True, return_tensors="pt")
+    inputs = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in inputs + ["last_hidden_state"]}
+    tmp = os.path.join(directory, "model.onnx.tmp")
+    with torch.no_grad():
+        torch.onnx.export(transformer, tuple(sample[name] for name in inputs), tmp, input_names=inputs,
+                          output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=ONNX_OPSET)
+    os.replace(tmp, os.path.join(directory, "model.onnx"))
+
+    tokenizer.save_pretrained(directory)  # tokenizer.json for the fast tokenizer
+    with open(os.path.join(directory, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pooling": "cls" if pooling is not None and pooling.pooling_mode_cls_token else "mean",
+            "normalize": any(isinstance(m, Normalize) for m in model),
+            "pad_token": tokenizer.pad_token,
+            "inputs": inputs,
+            "dim": model.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+    return directory
+
+
+def quantize_onnx(directory):
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise _missing(e, "onnx-int8") from e
+
+    target = os.path.join(directory, "model_int8.onnx")
+    tmp = target + ".tmp"
+    quantize_dynamic(os.path.join(directory, "model.onnx"), tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, target)
+    return target
+
+
+# 🧠 ONNX Runtime encoder with SentenceTransformer's encode() contract (unit vectors, input order)
+class OnnxEncoder:
+    def __init__(self, model_name, quantized=False, threads=ENCODER_THREADS, root=ONNX_DIR):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise _missing(e, "onnx-int8" if quantized else "onnx") from e
+
+        directory = export_dir(model_name, root)
+        if not os.path.exists(os.path.join(directory, "encoder.json")):
+            print(f"📦 Exporting {model_name} to ONNX (once) in {directory}")
+            export_onnx(model_name, root)
+        model_file = os.path.join(directory, "model_int8.onnx" if quantized else "model.onnx")
+        if quantized and not os.path.exists(model_file):
+            quantize_onnx(directory)
+        with open(os.path.join(directory, "encoder.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        pad_token = self.config["pad_token"]
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        self.model_name = model_name
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dim"]
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)}
+        hidden = self.session.run(["last_hidden_state"], {k: v for k, v in feed.items() if k in self.inputs})[0]
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.config["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    # Texts are sorted by length so each batch pads to similar lengths, then put back in order
+    def encode(self, texts, batch_size=64, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        if not texts:
+            return np.zeros((0, self.config["dim"]), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.empty((len(texts), self.config["dim"]), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._encode_batch([texts[i] for i in rows])
+        return out
+
+
+def load_encoder(model_name, backend=ENCODER_BACKEND, threads=ENCODER_THREADS):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ENCODER_BACKEND '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        _set_torch_threads(threads)
+        return SentenceTransformer(model_name, device="cpu")
+    return OnnxEncoder(model_name, quantized=backend == "onnx-int8", threads=threads)
+
+
+# Embedding cache namespace: int8 vectors differ measurably from the float32 model, so they get
+# their own cache; ONNX float32 matches PyTorch to ~1e-6 and shares it
+def cache_name(model_name, backend=ENCODER_BACKEND):
+    return f"{model_name}@{backend}" if backend == "onnx-int8" else model_name
+
+
+# 🧪 Parity: the same texts through PyTorch and another backend
+def parity(model_name, backend, texts=PARITY_TEXTS, threads=ENCODER_THREADS):
+    reference = np.asarray(load_encoder(model_name, "torch", threads).encode(texts), dtype=np.float32)
+    candidate = np.asarray(load_encoder(model_name, backend, threads).encode(texts), dtype=np.float32)
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+    # Does each text still find the same nearest neighbours among the others?
+    k = min(5, len(texts) - 1)
+    ref_top = np.argsort(-(reference @ reference.T), axis=1)[:, 1:k + 1]
+    cand_top = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1:k + 1]
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]) if k > 0 else 1.0
+    threshold = PARITY_MIN_COSINE.get(backend, 0.9999)
+    return {
+        "backend": backend,
+        "texts": len(texts),
+        "min_cosine": round(float(cosine.min()), 6),
+        "mean_cosine": round(float(cosine.mean()), 6),
+        "max_abs_diff": round(float(np.abs(reference - candidate).max()), 6),
+        f"neighbour_overlap@{k}": round(float(overlap), 4),
+        "threshold": threshold,
+        "ok": bool(cosine.min() >= threshold),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the encoder to ONNX and check it against PyTorch")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--threads", type=int, default=ENCODER_THREADS)
+    parser.add_argument("--check", action="store_true", help="compare vectors with the PyTorch model")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    load_encoder(args.model, args.backend, args.threads)
+    print(f"✅ {args.backend} encoder ready in {export_dir(args.model)} ({time.perf_counter() - start:.1f}s)")
+    if args.check:
+        result = parity(args.model, args.backend, threads=args.threads)
+        print(json.dumps(result, indent=2))
+        if not result["ok"]:
+            print(f"❌ Minimum cosine {result['min_cosine']} is below {result['threshold']}")
+            raise SystemExit(1)
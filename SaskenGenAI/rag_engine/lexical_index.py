@@ -0,0 +1,193 @@
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from catalog import product_id
+from metrics import export_on_exit, record_stage_items
+from profiling import profile_stage
+from record_io import iter_records, latest_file
+
+# 🔤 BM25 inverted index over product names
+#
+# MiniLM embeddings blur exact tokens such as part numbers, "3500", "5.2K" or "6-lug". This index
+# scores them lexically; retrieval.py fuses its ranking with Chroma's (reciprocal rank fusion).
+#
+# On disk (one .npz, loaded whole):
+#   ids       product ids (same ids as the Chroma collection), fixed-width bytes
+#   terms     sorted vocabulary, fixed-width bytes
+#   offsets   postings of terms[i] are docs/weights[offsets[i]:offsets[i + 1]]
+#   docs      int32 document numbers, ascending within each term
+#   weights   float32 BM25 impact (idf * saturated tf) of the term in that document
+# Because the BM25 weight is precomputed per posting, a query is a gather plus one sum per document.
+
+INDEX_FILE = os.path.join("chromadb", "lexical_index.npz")
+CHUNK_PATTERN = "data/product_chunks.json*"
+K1 = 1.2
+B = 0.75
+RELOAD_CHECK_INTERVAL = 1.0  # seconds between index file checks on the query side
+
+# Tokens keep dots, dashes, slashes and "x" inside numbers: "5.2k", "6-lug", "5x4.5", "1/2"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+_SPLIT = re.compile(r"[\-/]")
+
+
+def tokenize(text):
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        tokens.append(token)
+        if "-" in token or "/" in token:
+            # "6-lug" also matches "6 lug" and "lug"
+            tokens.extend(part for part in _SPLIT.split(token) if part)
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, ids, terms, offsets, docs, weights, info=None):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.info = info or {}
+        self._term_index = {t.decode("utf-8"): i for i, t in enumerate(terms.tolist())}
+        self._id_strings = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # 🏗️ Build from (product id, text) pairs; later duplicates of an id win
+    @classmethod
+    def build(cls, documents, k1=K1, b=B):
+        texts = {}
+        for pid, text in documents:
+            texts[pid] = text
+        ids = list(texts)
+
+        postings = {}
+        lengths = np.zeros(len(ids), dtype=np.float32)
+        for doc, pid in enumerate(ids):
+            counts = {}
+            for token in tokenize(texts[pid]):
+                counts[token] = counts.get(token, 0) + 1
+            lengths[doc] = sum(counts.values())
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc, tf))
+
+        n_docs = len(ids)
+        avgdl = float(lengths.mean()) if n_docs else 0.0
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs, weights = [], []
+        for i, term in enumerate(terms):
+            plist = postings[term]
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            term_docs = np.fromiter((d for d, _ in plist), dtype=np.int32, count=len(plist))
+            tf = np.fromiter((t for _, t in plist), dtype=np.float32, count=len(plist))
+            norm = k1 * (1 - b + b * lengths[term_docs] / (avgdl or 1.0))
+            docs.append(term_docs)
+            weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+            offsets[i + 1] = offsets[i] + len(plist)
+
+        return cls(
+            ids=np.array([pid.encode("utf-8") for pid in ids], dtype=bytes) if ids else np.array([], dtype="S1"),
+            terms=np.array([t.encode("utf-8") for t in terms], dtype=bytes) if terms else np.array([], dtype="S1"),
+            offsets=offsets,
+            docs=np.concatenate(docs) if docs else np.zeros(0, dtype=np.int32),
+            weights=np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32),
+            info={"documents": n_docs, "terms": len(terms), "avgdl": avgdl, "k1": k1, "b": b},
+        )
+
+    def save(self, path=INDEX_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=self.ids, terms=self.terms, offsets=self.offsets, docs=self.docs,
+                     weights=self.weights, info=np.array(json.dumps(self.info)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with np.load(path) as data:
+            return cls(data["ids"], data["terms"], data["offsets"], data["docs"], data["weights"],
+                       json.loads(str(data["info"])))
+
+    # 🔎 Top-k (product id, score) pairs for a query, best first
+    def search(self, query, k=20):
+        rows = [self._term_index[t] for t in set(tokenize(query)) if t in self._term_index]
+        if not rows:
+            return []
+        if len(rows) == 1:
+            start, end = self.offsets[rows[0]], self.offsets[rows[0] + 1]
+            docs, scores = self.docs[start:end], self.weights[start:end]
+        else:
+            docs = np.concatenate([self.docs[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+            weights = np.concatenate([self.weights[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+            # Dense accumulation over all documents: O(postings + documents), no sort
+            scores = np.bincount(docs, weights=weights)
+            docs = np.arange(len(scores))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[scores[top] > 0]
+        if self._id_strings is None:
+            self._id_strings = [pid.decode("utf-8") for pid in self.ids.tolist()]
+        return [(self._id_strings[docs[i]], float(scores[i])) for i in top]
+
+
+# ♻️ Query side: one index per process, reloaded when the pipeline writes a new file
+_shared = {"index": None, "mtime": None, "next_check": 0.0}
+_shared_lock = threading.Lock()
+
+
+def get_lexical_index(path=INDEX_FILE):
+    now = time.monotonic()
+    if now < _shared["next_check"]:
+        return _shared["index"]
+    with _shared_lock:
+        if now >= _shared["next_check"]:
+            _shared["next_check"] = now + RELOAD_CHECK_INTERVAL
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if mtime != _shared["mtime"]:
+                _shared["index"] = LexicalIndex.load(path) if mtime is not None else None
+                _shared["mtime"] = mtime
+        return _shared["index"]
+
+
+# 🏗️ Pipeline stage: build the index from the latest chunk file
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 index over product chunks")
+    parser.add_argument("--chunks", default=None, help="chunk file (default: latest data/product_chunks.json*)")
+    parser.add_argument("--out", default=INDEX_FILE)
+    parser.add_argument("--profile", action="store_true",
+                        help="sample the run and save a flamegraph-ready profile under logs/profiles")
+    args = parser.parse_args()
+    export_on_exit("lexical")
+    profile_stage("lexical", enabled=args.profile or None)
+
+    chunk_file = args.chunks or latest_file(CHUNK_PATTERN)
+    if not chunk_file:
+        print(f"❌ File not found: {CHUNK_PATTERN}")
+        exit()
+
+    start = time.perf_counter()
+    index = LexicalIndex.build((product_id(item), item.get("name", "")) for item in iter_records(chunk_file))
+    index.save(args.out)
+    record_stage_items("lexical", items_in=index.info["documents"], items_out=index.info["documents"])
+    size_mb = os.path.getsize(args.out) / 2 ** 20
+    print(f"🔤 Indexed {index.info['documents']} products, {index.info['terms']} terms "
+          f"into {args.out} ({size_mb:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import SLOW_BUCKETS, counter, histogram
+
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3")
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+
+CONNECT_TIMEOUT = 3.05  # seconds to establish the TCP connection
+READ_TIMEOUT = 120.0    # max seconds between two chunks of the response
+
+OLLAMA_SECONDS = histogram("trailer_ollama_request_seconds", "Time for one complete LLaMA answer", ("mode",),
+                           buckets=SLOW_BUCKETS)
+OLLAMA_FIRST_TOKEN = histogram("trailer_ollama_first_token_seconds", "Time to the first token of a LLaMA answer",
+                               ("mode",), buckets=SLOW_BUCKETS)
+OLLAMA_ERRORS = counter("trailer_ollama_errors_total",
+                        "Failed LLaMA requests (connect, status, invalid_response, model_error, stream)",
+                        ("mode", "reason"))
+
+
+class OllamaError(Exception):
+    pass
+
+
+# 📈 Timing for one answer: time-to-first-token and generation speed
+def _finish_stats(stats, start, first_token_at, tokens, final):
+    end = time.perf_counter()
+    stats["total_s"] = end - start
+    stats["ttft_s"] = (first_token_at - start) if first_token_at else None
+    # Prefer Ollama's own counters (eval_count tokens over eval_duration ns) when it sends them
+    if final.get("eval_count") and final.get("eval_duration"):
+        stats["tokens"] = final["eval_count"]
+        stats["tokens_per_s"] = final["eval_count"] / (final["eval_duration"] / 1e9)
+    else:
+        stats["tokens"] = tokens
+        gen_time = end - first_token_at if first_token_at else 0
+        stats["tokens_per_s"] = tokens / gen_time if gen_time > 0 else None
+    OLLAMA_SECONDS.observe(stats["total_s"], mode="stream")
+    if stats["ttft_s"] is not None:
+        OLLAMA_FIRST_TOKEN.observe(stats["ttft_s"], mode="stream")
+    return stats
+
+
+def format_stats(stats):
+    if not stats:
+        return ""
+    ttft = f"{stats['ttft_s'] * 1000:.0f} ms" if stats.get("ttft_s") is not None else "n/a"
+    rate = f"{stats['tokens_per_s']:.1f} tok/s" if stats.get("tokens_per_s") else "n/a"
+    return f"⏱️ first token {ttft} · {stats.get('tokens', 0)} tokens · {rate} · {stats['total_s']:.2f}s total"
+
+
+# 🌊 Iterable over the tokens of one streamed answer; .text and .stats are filled in as it runs
+class StreamedAnswer:
+    def __init__(self, response, start):
+        self._response = response
+        self._start = start
+        self.text = ""
+        self.stats = {}
+
+    def __iter__(self):
+        start = self._start
+        first_token_at = None
+        tokens = 0
+        final = {}
+        try:
+            for line in self._response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    OLLAMA_ERRORS.inc(mode="stream", reason="invalid_response")
+                    raise OllamaError(f"Invalid chunk from LLaMA mid-stream: {e}") from e
+                if chunk.get("error"):
+                    OLLAMA_ERRORS.inc(mode="stream", reason="model_error")
+                    raise OllamaError(chunk["error"])
+                token = chunk.get("response", "")
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens += 1
+                    self.text += token
+                    yield token
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        except requests.RequestException as e:
+            OLLAMA_ERRORS.inc(mode="stream", reason="stream")
+            raise OllamaError(f"Connection to LLaMA failed mid-stream: {e}") from e
+        finally:
+            self._response.close()
+        _finish_stats(self.stats, start, first_token_at, tokens, final)
+
+
+# 🤖 Ollama /api/generate client with a pooled keep-alive session and connect/read timeouts
+class OllamaClient:
+    def __init__(self, url=OLLAMA_URL, model=OLLAMA_MODEL, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, pool_size=10):
+        self.url = url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=Retry(connect=2, read=0, status=0, backoff_factor=0.2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, prompt, stream):
+        mode = "stream" if stream else "generate"
+        try:
+            response = self.session.post(
+                self.url,
+                json={"model": self.model, "prompt": prompt, "stream": stream},
+                stream=stream,
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            OLLAMA_ERRORS.inc(mode=mode, reason="connect")
+            raise OllamaError(f"Could not reach LLaMA at {self.url}: {e}") from e
+        if response.status_code != 200:
+            response.close()
+            OLLAMA_ERRORS.inc(mode=mode, reason="status")
+            raise OllamaError(f"LLaMA responded with status code {response.status_code}")
+        return response
+
+    def stream(self, prompt):
+        start = time.perf_counter()
+        return StreamedAnswer(self._post(prompt, stream=True), start)
+
+    def generate(self, prompt):
+        start = time.perf_counter()
+        response = self._post(prompt, stream=False)
+        try:
+            body = response.json()
+        except ValueError as e:
+            OLLAMA_ERRORS.inc(mode="generate", reason="invalid_response")
+            raise OllamaError(f"Invalid response from LLaMA: {e}") from e
+        if body.get("error"):
+            OLLAMA_ERRORS.inc(mode="generate", reason="model_error")
+            raise OllamaError(body["error"])
+        text = body.get("response", "").strip()
+        # Without streaming the first token only arrives with the whole answer
+        total = time.perf_counter() - start
+        OLLAMA_SECONDS.observe(total, mode="generate")
+        OLLAMA_FIRST_TOKEN.observe(total, mode="generate")
+        stats = {"total_s": total, "ttft_s": total}
+        if body.get("eval_count") and body.get("eval_duration"):
+            stats["tokens"] = body["eval_count"]
+            stats["tokens_per_s"] = body["eval_count"] / (body["eval_duration"] / 1e9)
+        else:
+            stats["tokens"] = body.get("eval_count") or len(text.split())
+            stats["tokens_per_s"] = stats["tokens"] / total if total > 0 else None
+        return text, stats
+
+    def close(self):
+        self.session.close()
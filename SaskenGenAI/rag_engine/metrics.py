@@ -0,0 +1,281 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 📈 Metrics: counters, gauges and histograms with labels, rendered in the Prometheus text format.
+#
+# Long-lived processes (retrieval_service.py, ui.py with METRICS_PORT set) serve render() on
+# /metrics. Pipeline stages are short child processes: with TRAILER_METRICS_DIR set (pipeline.py
+# does that), each one leaves a JSON snapshot at exit, and the parent folds the snapshots into its
+# own registry and writes one textfile for node_exporter's textfile collector.
+
+METRICS_DIR = os.environ.get("TRAILER_METRICS_DIR", "")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)  # page loads, LLM answers
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels) or any(name not in labels for name in self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def snapshot(self):
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "labels": list(self.labels),
+                    "values": [[list(key), value] for key, value in self._values.items()]}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(value)}"
+
+    def merge(self, key, value):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def lines(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(value)}"
+
+    def merge(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+
+# Per label set: [count per bucket (not cumulative, last slot = above the top bucket), sum, count]
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def lines(self):
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield f"{self.name}_bucket{self._label_text(key, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(key)} {_number(total)}"
+            yield f"{self.name}_count{self._label_text(key)} {count}"
+
+    def snapshot(self):
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    def merge(self, key, value):
+        counts, total, count = value
+        if len(counts) != len(self.buckets) + 1:
+            return  # bucket layout changed between versions; drop rather than misreport
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += total
+            state[2] += count
+
+
+KINDS = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+# 📚 Metrics by name; asking for an existing name returns the same object, so modules can
+# declare their metrics at import time and Streamlit reruns do not register duplicates
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        out = []
+        for metric in list(self._metrics.values()):
+            lines = list(metric.lines())
+            if not lines:
+                continue
+            out.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+    # Counters and histograms add up, gauges take the snapshot's value
+    def merge(self, snapshot):
+        for name, family in snapshot.items():
+            cls = KINDS.get(family.get("kind"))
+            if cls is None:
+                continue
+            kwargs = {"buckets": family["buckets"]} if cls is Histogram else {}
+            try:
+                metric = self._get(cls, name, family.get("help", ""), family.get("labels", ()), **kwargs)
+            except ValueError:
+                continue
+            for key, value in family.get("values", []):
+                metric.merge(tuple(key), value)
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+STAGE_ITEMS = gauge("trailer_stage_items", "Items read (in) and written (out) by the last run of a pipeline stage",
+                    ("stage", "direction"))
+
+
+def render(registry=REGISTRY):
+    return registry.render()
+
+
+# 💾 Atomic write (the textfile collector must never read a half-written file)
+def write_textfile(path, registry=REGISTRY):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+    return path
+
+
+def record_stage_items(stage, items_in=None, items_out=None):
+    if items_in is not None:
+        STAGE_ITEMS.set(items_in, stage=stage, direction="in")
+    if items_out is not None:
+        STAGE_ITEMS.set(items_out, stage=stage, direction="out")
+
+
+# 🧩 Stage scripts: leave <TRAILER_METRICS_DIR>/<stage>.json behind at exit (no-op when unset)
+def export_on_exit(stage, directory=METRICS_DIR, registry=REGISTRY):
+    if not directory:
+        return
+
+    def dump():
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{stage}.json")
+        tmp = os.path.join(directory, f".{stage}.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(registry.snapshot(), f)
+        os.replace(tmp, path)
+
+    atexit.register(dump)
+
+
+def load_snapshots(directory, registry=REGISTRY):
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                registry.merge(json.load(f))
+        except (OSError, ValueError):
+            continue
+
+
+# 🛰️ /metrics on a daemon thread, for processes that have no HTTP server of their own (ui.py)
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
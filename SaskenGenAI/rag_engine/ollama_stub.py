@@ -0,0 +1,122 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 🧪 Local stand-in for Ollama's /api/generate, for exercising the chat client without a model.
+#
+#   python rag_engine/ollama_stub.py --port 11435 --delay 0.02
+#   OLLAMA_URL=http://127.0.0.1:11435/api/generate python rag_engine/5RAG_chatbot.py
+#
+# Streaming requests get one NDJSON object per token followed by a final {"done": true, ...}
+# object carrying eval_count/eval_duration, the same shape Ollama sends.
+#
+# fail= makes it misbehave for client error handling: "status" (HTTP 500), "model_error" (an
+# {"error": ...} object after the first token) or "garbled" (a truncated JSON line after it).
+
+DEFAULT_ANSWER = "The 3500 lb single axle kit with electric brakes is the best match for your trailer."
+FAIL_MODES = ("status", "model_error", "garbled")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    answer = DEFAULT_ANSWER
+    delay = 0.0
+    first_token_delay = 0.0
+    fail = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/api/generate":
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error(400)
+            return
+
+        if self.fail == "status":
+            self.send_error(500)
+            return
+        model = body.get("model", "llama3")
+        tokens = [t + " " for t in self.answer.split()]
+        if not body.get("stream", True):
+            time.sleep(self.first_token_delay + self.delay * len(tokens))
+            payload = json.dumps({"model": model, "response": "".join(tokens).strip(), "done": True,
+                                  "eval_count": len(tokens)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._stream(model, tokens)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading (e.g. after an error chunk)
+
+    def _stream(self, model, tokens):
+        started = time.perf_counter()
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(tokens):
+            time.sleep(self.delay)
+            if i == 1 and self.fail == "model_error":
+                self._chunk({"error": "model ran out of memory"})
+                break
+            if i == 1 and self.fail == "garbled":
+                self._chunk('{"model": "' + model + '", "respo')
+                break
+            self._chunk({"model": model, "response": token, "done": False})
+        else:
+            eval_ns = int((time.perf_counter() - started) * 1e9)
+            self._chunk({"model": model, "response": "", "done": True,
+                         "eval_count": len(tokens), "eval_duration": max(eval_ns, 1)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, obj):
+        data = (obj if isinstance(obj, str) else json.dumps(obj)).encode() + b"\n"
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+# 🚀 Start the stub on a background thread; returns (server, generate_url). Call server.shutdown() to stop.
+def start_stub_server(host="127.0.0.1", port=0, answer=DEFAULT_ANSWER, delay=0.0, first_token_delay=0.0,
+                      fail=None):
+    if fail not in (None,) + FAIL_MODES:
+        raise ValueError(f"Unknown fail mode '{fail}' (expected one of {', '.join(FAIL_MODES)})")
+    handler = type("StubHandler", (_StubHandler,), {
+        "answer": answer, "delay": delay, "first_token_delay": first_token_delay, "fail": fail,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/generate"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Ollama /api/generate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    parser.add_argument("--fail", choices=FAIL_MODES, default=None, help="misbehave to test error handling")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, args.answer, args.delay, args.first_token_delay,
+                                    args.fail)
+    print(f"🧪 Stub Ollama listening on {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,175 @@
+import atexit
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# 🔬 Wall-clock sampling profiler
+#
+# A daemon thread snapshots the Python stacks (sys._current_frames) every few milliseconds, so time
+# spent blocked in Selenium waits, sockets, model.encode or collection.upsert shows up next to pure
+# Python work. Each sample is weighted by the time since the previous one: while another thread holds
+# the GIL the sampler wakes late, and equal weights would under-count CPU-bound code.
+# Each profile is saved in two files:
+#   <name>.folded    collapsed stacks ("frame;frame;frame microseconds"), the input of flamegraph.pl,
+#                    speedscope and inferno
+#   <name>.top.json  hottest functions by self and total time
+# Stage scripts turn it on with --profile or TRAILER_PROFILE=1; ui.py with PROFILE_REQUESTS=1.
+
+PROFILE_DIR = os.environ.get("TRAILER_PROFILE_DIR", os.path.join("logs", "profiles"))
+PROFILE_ENABLED = os.environ.get("TRAILER_PROFILE", "0") == "1"
+SAMPLE_INTERVAL = float(os.environ.get("TRAILER_PROFILE_INTERVAL_MS", "5")) / 1000
+TOP_N = 25  # functions kept in <name>.top.json
+
+# Leaf frames of pool threads parked waiting for work; dropped so idle workers do not dominate
+IDLE_LEAVES = {"wait (threading.py)", "get (queue.py)", "_worker (thread.py)"}
+
+
+class SamplingProfiler:
+    # all_threads=False samples only the thread that calls start() (e.g. a Streamlit script thread)
+    def __init__(self, interval=SAMPLE_INTERVAL, all_threads=True):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = Counter()  # stack -> seconds
+        self.ticks = 0
+        self.wall_s = 0.0
+        self._labels = {}
+        self._names = {}
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(";", ":")
+            label = self._labels[code] = name
+        return label
+
+    def _thread_name(self, ident):
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._names.get(ident, f"thread-{ident}")
+        return name
+
+    def _sample(self):
+        me = threading.get_ident()
+        main = threading.main_thread().ident
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (self._target is not None and ident != self._target):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                if ident != main and stack[0] in IDLE_LEAVES:
+                    continue
+                if self.all_threads:
+                    stack.append(self._thread_name(ident))
+                self.stacks[tuple(reversed(stack))] += weight
+            self.ticks += 1
+
+    def start(self):
+        self._target = None if self.all_threads else threading.get_ident()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True, name="sampling-profiler")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.wall_s = time.perf_counter() - self._start
+        return self
+
+    def folded(self):
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in self.stacks.most_common()]
+
+    # 🔥 Self time = time the function is the leaf; total = time it is anywhere on the stack
+    def top(self, n=TOP_N):
+        self_seconds, total_seconds = Counter(), Counter()
+        skip = 1 if self.all_threads else 0  # thread-name root
+        for stack, seconds in self.stacks.items():
+            frames = stack[skip:]
+            if not frames:
+                continue
+            self_seconds[frames[-1]] += seconds
+            for label in set(frames):
+                total_seconds[label] += seconds
+        return [{
+            "function": label,
+            "self_s": round(seconds, 3),
+            "total_s": round(total_seconds[label], 3),
+            "self_pct": round(100 * seconds / self.wall_s, 1) if self.wall_s else 0.0,
+        } for label, seconds in self_seconds.most_common(n)]
+
+    def save(self, name, directory=PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        folded_path = os.path.join(directory, f"{name}.folded")
+        top_path = os.path.join(directory, f"{name}.top.json")
+        with open(folded_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.folded()) + "\n")
+        with open(top_path, "w", encoding="utf-8") as f:
+            json.dump({"name": name, "wall_s": round(self.wall_s, 3), "samples": self.ticks,
+                       "interval_ms": self.interval * 1000, "top": self.top()}, f, indent=2)
+        return {"folded": folded_path, "top": top_path}
+
+
+# 🧩 Stage scripts: profile the whole process and save <stage>.folded / <stage>.top.json at exit
+def profile_stage(stage, enabled=None, directory=PROFILE_DIR):
+    if enabled is None:
+        enabled = PROFILE_ENABLED or "--profile" in sys.argv[1:]
+    if not enabled:
+        return None
+    profiler = SamplingProfiler(all_threads=True).start()
+
+    def finish():
+        paths = profiler.stop().save(stage, directory)
+        print(f"🔬 Profile of {stage} saved to {paths['folded']}")
+        for entry in profiler.top(5):
+            print(f"   {format_entry(entry)}")
+
+    atexit.register(finish)
+    return profiler
+
+
+# One request (ui.py): the profiler is yielded, and saved as <name>_<timestamp> when the block exits
+@contextmanager
+def profiled(name, enabled=True, directory=PROFILE_DIR):
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler(all_threads=False).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.paths = profiler.save(f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}", directory)
+
+
+def format_entry(entry):
+    return f"{entry['self_s']:8.2f}s self {entry['total_s']:8.2f}s total  {entry['function']}"
+
+
+# 📋 End of a pipeline run: the hottest functions of every stage profile in a directory
+def summarize_profiles(directory, n=5):
+    summaries = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.top.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({**summary, "top": summary["top"][:n]})
+    return summaries
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+# 📉 Dimension-reduction profile for the vector index
+#
+# Product titles are short, and most of the 384 dimensions of all-MiniLM-L6-v2 carry little of
+# the variance between them. The embed step can fit a PCA projection to VECTOR_REDUCE_DIM
+# dimensions (64 / 128 / 192) on a sample of the catalog. It re-embeds the catalog into a new
+# collection, stores the projection next to it and switches readers to both at once (see
+# vector_store.py); the collection returned by vector_store.open_collection() applies it to every
+# upsert and query. The UI, the CLIs and the retrieval service need no setting of their own. Projected
+# vectors are re-normalized, so cosine / L2 rankings keep their meaning.
+#
+# (Truncating to the first N dimensions, as with Matryoshka-trained models, does not work for
+# all-MiniLM-L6-v2, whose dimensions are not ordered by importance.)
+
+PROJECTION_FILE = os.path.join("chromadb", "projection.npz")
+REDUCE_DIM = int(os.environ.get("VECTOR_REDUCE_DIM", "0"))  # 0 = full width
+FIT_SAMPLE = 20000  # products encoded to fit the projection
+
+
+class PCAProjection:
+    def __init__(self, mean, components, explained=None, fitted_rows=0):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (dim_out, dim_in)
+        self.explained = None if explained is None else np.asarray(explained, dtype=np.float32)
+        self.fitted_rows = fitted_rows
+
+    @property
+    def dim_in(self):
+        return self.components.shape[1]
+
+    @property
+    def dim_out(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, dim):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not 0 < dim < vectors.shape[1]:
+            raise ValueError(f"Cannot reduce {vectors.shape[1]}-dim vectors to {dim} dimensions")
+        if len(vectors) < dim:
+            raise ValueError(f"Need at least {dim} vectors to fit a {dim}-dim projection, got {len(vectors)}")
+        mean = vectors.mean(axis=0)
+        # Covariance eigenvectors (dim_in x dim_in) instead of an SVD of the whole sample
+        eigenvalues, eigenvectors = np.linalg.eigh(np.cov(vectors - mean, rowvar=False))
+        order = np.argsort(eigenvalues)[::-1][:dim]
+        explained = eigenvalues[order] / eigenvalues.sum()
+        return cls(mean, eigenvectors[:, order].T, explained, len(vectors))
+
+    def apply(self, vectors):
+        projected = (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        return projected / np.maximum(norms, 1e-12)
+
+    def explained_variance(self):
+        return float(self.explained.sum()) if self.explained is not None else None
+
+    def describe(self):
+        share = self.explained_variance()
+        kept = f", {share:.0%} of the variance" if share is not None else ""
+        return f"📉 PCA profile: {self.dim_in} -> {self.dim_out} dims{kept} (fitted on {self.fitted_rows} products)"
+
+    def save(self, path=PROJECTION_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = os.path.join(os.path.dirname(path), ".projection.tmp.npz")
+        np.savez(tmp, mean=self.mean, components=self.components,
+                 explained=self.explained if self.explained is not None else np.zeros(0, dtype=np.float32),
+                 fitted_rows=np.int64(self.fitted_rows))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=PROJECTION_FILE):
+        try:
+            with np.load(path) as data:
+                explained = data["explained"] if len(data["explained"]) else None
+                return cls(data["mean"], data["components"], explained, int(data["fitted_rows"]))
+        except (OSError, KeyError, ValueError):
+            return None
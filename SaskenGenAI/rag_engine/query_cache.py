@@ -0,0 +1,119 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from catalog import read_catalog_version
+
+VERSION_CHECK_INTERVAL = 1.0  # seconds between catalog version file checks
+
+
+# 🧹 Normalise a query so trivially different spellings share a cache entry
+# (all-MiniLM-L6-v2 is uncased, so case folding does not change the embedding)
+def normalize_query(text):
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+# ⏳ Thread-safe LRU map with a per-entry time-to-live
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# 🗂️ Two-level query cache: query text -> embedding, and (query, n_results, filters, mode) -> results.
+# Results are dropped automatically as soon as the embed stage publishes a new catalog version.
+class QueryCache:
+    def __init__(self, embedding_size=4096, embedding_ttl=24 * 3600,
+                 result_size=2048, result_ttl=15 * 60):
+        self.embeddings = TTLCache(embedding_size, embedding_ttl)
+        self.results = TTLCache(result_size, result_ttl)
+        self._version = read_catalog_version()
+        self._next_check = time.monotonic() + VERSION_CHECK_INTERVAL
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + VERSION_CHECK_INTERVAL
+            version = read_catalog_version()
+            if version != self._version:
+                self._version = version
+                self.results.clear()
+
+    @staticmethod
+    def result_key(query, n_results, where=None, mode="vector"):
+        return (normalize_query(query), n_results, json.dumps(where, sort_keys=True) if where else "", mode)
+
+    def get_embedding(self, query):
+        return self.embeddings.get(normalize_query(query))
+
+    def put_embedding(self, query, embedding):
+        self.embeddings.put(normalize_query(query), embedding)
+
+    def get_results(self, query, n_results, where=None, mode="vector"):
+        self._check_version()
+        return self.results.get(self.result_key(query, n_results, where, mode))
+
+    def put_results(self, query, n_results, results, where=None, mode="vector"):
+        self.results.put(self.result_key(query, n_results, where, mode), results)
+
+    def stats(self):
+        return {
+            "catalog_version": self._version,
+            "embedding_hits": self.embeddings.hits,
+            "embedding_misses": self.embeddings.misses,
+            "result_hits": self.results.hits,
+            "result_misses": self.results.misses,
+            "embedding_entries": len(self.embeddings),
+            "result_entries": len(self.results),
+        }
+
+
+# 🌍 One cache per process, shared by every Streamlit session
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_query_cache():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = QueryCache()
+        return _shared_cache
@@ -0,0 +1,126 @@
+import glob
+import gzip
+import io
+import json
+import os
+import re
+
+# 📄 Record files exchanged between the pipeline stages.
+#
+# Stages write line-delimited JSON (one record per line), optionally gzip/zstd compressed,
+# and read it back as a generator, so memory stays flat as the catalog grows. Files in the
+# old format (one indented JSON array) are still read, also without loading them whole.
+
+RECORD_EXT = os.environ.get("TRAILER_RECORD_EXT", ".jsonl")  # ".jsonl", ".jsonl.gz" or ".jsonl.zst"
+_WHITESPACE = re.compile(r"\s*")
+
+
+# 🗜️ Open a text file, transparently (de)compressing .gz / .zst
+def open_text(path, mode="r"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"{path} is zstd-compressed; install the 'zstandard' package to use it")
+        if "r" in mode:
+            raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        else:
+            raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return open(path, mode, encoding="utf-8", newline="" if "w" in mode else None)
+
+
+def is_jsonl(path):
+    return ".jsonl" in os.path.basename(path)
+
+
+# 📖 Stream the items of a top-level JSON array without loading the whole file
+def iter_json_array(path, read_size=1 << 16):
+    decoder = json.JSONDecoder()
+    with open_text(path, "r") as f:
+        buf, pos, eof, started = "", 0, False, False
+        while True:
+            # Keep at least one read_size window ahead of the cursor
+            if not eof and len(buf) - pos < read_size:
+                chunk = f.read(read_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                continue
+            ch = buf[pos]
+            if not started:
+                if ch != "[":
+                    raise ValueError(f"{path} does not contain a JSON array")
+                started = True
+                pos += 1
+                continue
+            if ch == ",":
+                pos += 1
+                continue
+            if ch == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                buf = buf[pos:] + f.read(read_size)
+                pos = 0
+                continue
+            # A value ending exactly at the buffer edge may be truncated (e.g. a number)
+            if end == len(buf) and not eof:
+                chunk = f.read(read_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield item
+            pos = end
+
+
+# 📥 Stream records from a .jsonl[.gz|.zst] file or a legacy JSON array file
+def iter_records(path):
+    if not is_jsonl(path):
+        yield from iter_json_array(path)
+        return
+    with open_text(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+# 📤 Write records one per line. They go to a hidden temp file first, so readers (and
+# latest_file globs) never see half a file. Returns the number of records written.
+def write_records(path, records):
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f".{name}.tmp" + (os.path.splitext(name)[1] if name.endswith((".gz", ".zst")) else ""))
+    count = 0
+    with open_text(tmp, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+
+# 🔍 Newest file matching any of the patterns (by modification time)
+def latest_file(*patterns):
+    files = [f for pattern in patterns for f in glob.glob(pattern)]
+    if not files:
+        return None
+    return max(files, key=os.path.getmtime)
+
+
+# 🔢 Pass records through while counting them (counter["n"])
+def counted(records, counter):
+    for record in records:
+        counter["n"] = counter.get("n", 0) + 1
+        yield record
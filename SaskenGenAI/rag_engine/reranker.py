@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+
+from query_cache import TTLCache, normalize_query
+
+# 🎯 Optional rerank stage: retrieval over-fetches candidates, a small CPU cross-encoder scores
+# (query, product) pairs in batches, and the best n are returned. Each request has a latency
+# budget; when scoring would not finish inside it, the candidates keep their retrieval order.
+
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "150"))
+RERANK_CANDIDATES = 20  # candidates fetched from retrieval when reranking
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=RERANK_MODEL, batch_size=16, budget_ms=RERANK_BUDGET_MS,
+                 cache_size=50000, cache_ttl=3600, score_fn=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        # Scores keyed by (query, product id, document text): a product whose text changes is rescored
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._score_fn = score_fn  # tests / benchmarks can inject a scorer instead of the model
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._pair_ms = None  # moving average of the cost of scoring one pair
+
+    def _scorer(self):
+        if self._score_fn is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+            self._score_fn = lambda pairs: self._model.predict(pairs, batch_size=self.batch_size,
+                                                               show_progress_bar=False)
+        return self._score_fn
+
+    # Load the model ahead of the first request, so it is not charged to anyone's budget
+    def warmup(self):
+        self._scorer()([("trailer axle", "trailer axle")])
+        return self
+
+    # ⚖️ Returns (order, info): order is a list of candidate positions, best first
+    def rerank(self, query, ids, documents, budget_ms=None):
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        score = self._scorer()
+        start = time.perf_counter()
+        key_query = normalize_query(query)
+
+        scores = {}
+        pending = []
+        for i, (pid, doc) in enumerate(zip(ids, documents)):
+            cached = self.cache.get((key_query, pid, doc))
+            if cached is None:
+                pending.append(i)
+            else:
+                scores[i] = cached
+        info = {"candidates": len(ids), "cached": len(scores), "scored": 0, "fallback": False}
+
+        for batch_start in range(0, len(pending), self.batch_size):
+            batch = pending[batch_start:batch_start + self.batch_size]
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if self._pair_ms is not None and elapsed_ms + self._pair_ms * len(batch) > budget_ms:
+                info["fallback"] = True
+                break
+            batch_start_time = time.perf_counter()
+            batch_scores = score([(query, documents[i] or "") for i in batch])
+            pair_ms = (time.perf_counter() - batch_start_time) * 1000 / len(batch)
+            self._pair_ms = pair_ms if self._pair_ms is None else 0.8 * self._pair_ms + 0.2 * pair_ms
+            for i, value in zip(batch, batch_scores):
+                scores[i] = float(value)
+                self.cache.put((key_query, ids[i], documents[i]), float(value))
+            info["scored"] += len(batch)
+
+        info["rerank_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        if info["fallback"]:
+            # Scores computed so far stay cached for the next request
+            return list(range(len(ids))), info
+        order = sorted(range(len(ids)), key=lambda i: scores[i], reverse=True)
+        return order, info
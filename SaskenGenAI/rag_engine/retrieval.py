@@ -0,0 +1,199 @@
+import json
+import time
+
+from catalog import read_facets
+from lexical_index import get_lexical_index
+from metrics import counter, histogram
+from query_cache import get_query_cache, normalize_query
+from reranker import RERANK_CANDIDATES
+
+RRF_K = 60  # reciprocal rank fusion constant; dampens the weight of the very first ranks
+FUSION_DEPTH = 20  # candidates taken from each ranking before fusing
+
+CHROMA_SECONDS = histogram("trailer_chroma_query_seconds", "Latency of one Chroma call (query: batched vector "
+                           "search, get: rows for BM25-only hits)", ("op",))
+SEARCH_SECONDS = histogram("trailer_search_seconds", "Retrieval latency of one search request, "
+                           "including cache lookups, embedding and fusion", ("mode",))
+RERANK_SECONDS = histogram("trailer_rerank_seconds", "Cross-encoder rerank time of one search request")
+RERANK_FALLBACKS = counter("trailer_rerank_fallbacks_total", "Reranks that ran over budget and kept retrieval order")
+
+
+# 🧰 Chroma `where` clause from the search filters; None when nothing is filtered.
+# Prices filter on price_min (the cheapest price of a listing), the rest are "any of" lists.
+def build_where(price_min=None, price_max=None, capacities=(), brake_types=(), axle_counts=(), sources=()):
+    conditions = []
+    if price_min is not None:
+        conditions.append({"price_min": {"$gte": float(price_min)}})
+    if price_max is not None:
+        conditions.append({"price_min": {"$lte": float(price_max)}})
+    for field, values in (("capacity_lbs", [int(v) for v in capacities]),
+                          ("brake_type", list(brake_types)),
+                          ("axle_count", [int(v) for v in axle_counts]),
+                          ("source_site", list(sources))):
+        if len(values) == 1:
+            conditions.append({field: values[0]})
+        elif values:
+            conditions.append({field: {"$in": values}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+# 🔀 Reciprocal rank fusion: score(id) = sum over rankings of 1 / (k + rank)
+def fuse_rankings(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, 1):
+            scores[pid] = scores.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+# ✂️ Reorder / cut every per-query list of a Chroma-style result ({"ids": [[...]], ...})
+def _take(results, order):
+    taken = {}
+    for key, value in results.items():
+        if isinstance(value, list) and value and isinstance(value[0], list):
+            taken[key] = [[value[0][i] for i in order]]
+        else:
+            taken[key] = value
+    return taken
+
+
+# One query's slice of a multi-query Chroma result
+def _split(results, j):
+    return {key: [value[j]] if isinstance(value, list) and value and isinstance(value[0], list) else value
+            for key, value in results.items()}
+
+
+# 🔎 Shared search path for ui.py, the CLIs and the retrieval service: cached query embedding ->
+# cached Chroma query, fused with the BM25 index (when one has been built) so exact tokens like
+# part numbers and "5.2K" rank well, then optionally reranked by a cross-encoder.
+# search_batch() answers many queries with one encoder call and one collection.query per distinct
+# (depth, filter) group; search() is a batch of one.
+# Lists inside the returned results are shared between callers and must be treated as read-only;
+# results["timing"] holds retrieval and rerank times in ms for this call.
+class Retriever:
+    def __init__(self, collection, encoder, cache=None, lexical=get_lexical_index, reranker=None):
+        self.collection = collection
+        self.encoder = encoder
+        self.cache = cache if cache is not None else get_query_cache()
+        self.lexical = lexical  # callable returning the current LexicalIndex (or None); None = vector only
+        self.reranker = reranker  # CrossEncoderReranker, used when search(..., rerank=True)
+
+    def embed(self, query):
+        return self.embed_many([query])[0]
+
+    def embed_many(self, queries):
+        embeddings = [self.cache.get_embedding(q) for q in queries]
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        if missing:
+            encoded = self.encoder.encode([normalize_query(queries[i]) for i in missing])
+            for i, vector in zip(missing, encoded):
+                embeddings[i] = vector.tolist()
+                self.cache.put_embedding(queries[i], embeddings[i])
+        return embeddings
+
+    def search(self, query, n_results=5, where=None, rerank=False, budget_ms=None):
+        return self.search_batch([{"query": query, "n_results": n_results, "where": where,
+                                   "rerank": rerank, "budget_ms": budget_ms}])[0]
+
+    # requests: dicts with "query" and optional "n_results", "where", "rerank", "budget_ms"
+    def search_batch(self, requests):
+        start = time.perf_counter()
+        index = self.lexical() if self.lexical else None
+        mode = "hybrid" if index is not None and len(index) else "vector"
+
+        plans = []
+        for req in requests:
+            n_results = req.get("n_results", 5)
+            rerank = bool(req.get("rerank")) and self.reranker is not None
+            depth = max(n_results, RERANK_CANDIDATES) if rerank else n_results
+            plans.append((req["query"], n_results, req.get("where"), rerank, depth))
+
+        retrieved = [self.cache.get_results(query, depth, where, mode) for query, _, where, _, depth in plans]
+        misses = [i for i, results in enumerate(retrieved) if results is None]
+        if misses:
+            embeddings = dict(zip(misses, self.embed_many([plans[i][0] for i in misses])))
+            groups = {}
+            for i in misses:
+                _, _, where, _, depth = plans[i]
+                groups.setdefault((depth, json.dumps(where, sort_keys=True) if where else ""), []).append(i)
+            for (depth, _), members in groups.items():
+                where = plans[members[0]][2]
+                vector_depth = max(FUSION_DEPTH, depth) if mode == "hybrid" else depth
+                kwargs = {"where": where} if where else {}
+                with CHROMA_SECONDS.time(op="query"):
+                    vector = self.collection.query(query_embeddings=[embeddings[i] for i in members],
+                                                   n_results=vector_depth, **kwargs)
+                for j, i in enumerate(members):
+                    query = plans[i][0]
+                    results = _split(vector, j)
+                    if mode == "hybrid":
+                        results = self._fuse(index, query, results, depth, where)
+                    self.cache.put_results(query, depth, results, where, mode)
+                    retrieved[i] = results
+        retrieval_ms = round((time.perf_counter() - start) * 1000, 2)
+        for _ in requests:
+            SEARCH_SECONDS.observe(retrieval_ms / 1000, mode=mode)
+
+        answers = []
+        for req, (query, n_results, _, rerank, _), results in zip(requests, plans, retrieved):
+            timing = {"retrieval_ms": retrieval_ms}
+            if rerank:
+                order, info = self.reranker.rerank(query, results["ids"][0], results["documents"][0],
+                                                   req.get("budget_ms"))
+                timing.update(rerank_ms=info["rerank_ms"], rerank=info)
+                RERANK_SECONDS.observe(info["rerank_ms"] / 1000)
+                if info["fallback"]:
+                    RERANK_FALLBACKS.inc()
+                answers.append({**_take(results, order[:n_results]), "timing": timing})
+            else:
+                answers.append({**results, "timing": timing})
+        return answers
+
+    def _fuse(self, index, query, vector, n_results, where):
+        rows = {pid: (doc, meta) for pid, doc, meta in
+                zip(vector["ids"][0], vector["documents"][0], vector["metadatas"][0])}
+
+        # Lexical hits the vector side did not return: fetch them, applying the same filters.
+        # Ids missing from the collection (index built from a newer chunk file) simply drop out.
+        lexical = [pid for pid, _ in index.search(query, k=max(FUSION_DEPTH, n_results))]
+        missing = [pid for pid in lexical if pid not in rows]
+        if missing:
+            kwargs = {"where": where} if where else {}
+            with CHROMA_SECONDS.time(op="get"):
+                found = self.collection.get(ids=missing, include=["documents", "metadatas"], **kwargs)
+            rows.update((pid, (doc, meta)) for pid, doc, meta in
+                        zip(found["ids"], found["documents"], found["metadatas"]))
+        lexical = [pid for pid in lexical if pid in rows]
+
+        fused = fuse_rankings([vector["ids"][0], lexical])[:n_results]
+        return {
+            "ids": [[pid for pid, _ in fused]],
+            "documents": [[rows[pid][0] for pid, _ in fused]],
+            "metadatas": [[rows[pid][1] for pid, _ in fused]],
+            "scores": [[score for _, score in fused]],
+        }
+
+    def facets(self):
+        return read_facets()
+
+    def stats(self):
+        return {"embedding_cache": self.encoder.cache.stats(), "query_cache": self.cache.stats()}
+
+    def summary(self):
+        s = self.cache.stats()
+        return (f"{self.encoder.cache.summary()}\n"
+                f"📊 Query cache: {s['embedding_hits']} embedding hits / {s['embedding_misses']} misses, "
+                f"{s['result_hits']} result hits / {s['result_misses']} misses")
+
+
+# ⏱️ "🔎 Retrieval 3.1 ms · 🎯 Rerank 42.0 ms (20 scored, 0 cached)" for the UI and CLIs
+def format_timing(timing):
+    line = f"🔎 Retrieval {timing['retrieval_ms']:.1f} ms"
+    info = timing.get("rerank")
+    if info:
+        line += f" · 🎯 Rerank {info['rerank_ms']:.1f} ms ({info['scored']} scored, {info['cached']} cached)"
+        if info["fallback"]:
+            line += ", over budget: retrieval order kept"
+    return line
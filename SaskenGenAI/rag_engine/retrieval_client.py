@@ -0,0 +1,48 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 🛰️ Thin client for retrieval_service.py. Same search() / facets() / stats() / summary() as a
+# local Retriever, so ui.py and the CLIs switch by setting RETRIEVAL_URL (e.g. http://127.0.0.1:8600).
+
+RETRIEVAL_URL = os.environ.get("RETRIEVAL_URL", "")
+
+
+class RetrievalServiceError(Exception):
+    pass
+
+
+class RemoteRetriever:
+    def __init__(self, url=RETRIEVAL_URL, connect_timeout=3.05, read_timeout=30.0, pool_size=10):
+        self.url = url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _call(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, self.url + path, timeout=self.timeout, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RetrievalServiceError(f"Retrieval service at {self.url} failed: {e}") from e
+
+    def search(self, query, n_results=5, where=None, rerank=False, budget_ms=None):
+        return self._call("POST", "/search", json={"query": query, "n_results": n_results, "where": where,
+                                                   "rerank": rerank, "budget_ms": budget_ms})
+
+    def facets(self):
+        return self._call("GET", "/facets")
+
+    def stats(self):
+        return self._call("GET", "/stats")
+
+    def summary(self):
+        s = self.stats()
+        q, e, b = s["query_cache"], s["embedding_cache"], s["batching"]
+        return (f"📊 Retrieval service {self.url}: {e['hits']} embedding cache hits / {e['misses']} misses, "
+                f"{q['result_hits']} result hits / {q['result_misses']} misses, "
+                f"{b['requests']} requests in {b['batches']} batches (avg {b['avg_batch']:.1f})")
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import os
+import time
+
+from aiohttp import web
+
+from catalog import read_catalog_version
+from metrics import CONTENT_TYPE, gauge, histogram, render
+
+# 🛰️ Long-lived retrieval service
+#
+# Keeps the encoder, the Chroma collection, the BM25 index and the query caches warm in one
+# process. Requests that arrive within the batching window are answered together by
+# Retriever.search_batch: one encoder call for all new queries and one collection.query per
+# (depth, filter) group. ui.py and the CLIs use it through retrieval_client.RemoteRetriever
+# when RETRIEVAL_URL is set.
+#
+#   python rag_engine/retrieval_service.py --port 8600 --window-ms 5
+#
+#   POST /search   {"query": "...", "n_results": 5, "where": {...}, "rerank": false, "budget_ms": 150}
+#                  (400 with a message for a malformed body; n_results is capped at MAX_RESULTS)
+#   GET  /facets   filter facet counts for the current catalog version
+#   GET  /stats    cache and batching counters
+#   GET  /health   liveness and catalog version
+#   GET  /metrics  Prometheus text format (search, Chroma, embedding, rerank and batching metrics)
+
+RESULT_KEYS = ("ids", "documents", "metadatas", "distances", "scores", "timing")
+MAX_RESULTS = 50  # n_results above this is clamped
+WHERE_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin")
+SCALAR = (str, int, float, bool)
+
+BATCH_SIZE = histogram("trailer_service_batch_size", "Search requests answered per micro-batch",
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+QUEUE_SECONDS = histogram("trailer_service_queue_seconds", "Time a search request waited for its batch to start")
+CACHE_STATS = gauge("trailer_cache_stats", "Query-side cache counters (hits, misses, rows, ...)", ("cache", "stat"))
+
+
+class MicroBatcher:
+    def __init__(self, search_batch, window_ms=5.0, max_batch=64):
+        self.search_batch = search_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Batches run one at a time on a worker thread; requests arriving meanwhile queue up
+            # and form the next (larger) batch, which is what keeps a single CPU box efficient
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self.search_batch, [req for req, _, _ in batch])
+            except Exception:
+                # One bad request must not fail the others that shared its window: retry each alone
+                results = [await self._search_alone(loop, req) for req, _, _ in batch]
+            self.batches += 1
+            self.requests += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            BATCH_SIZE.observe(len(batch))
+            for (_, future, queued_at), result in zip(batch, results):
+                QUEUE_SECONDS.observe(started - queued_at)
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                    continue
+                result["timing"] = {**result["timing"], "queue_ms": round((started - queued_at) * 1000, 2),
+                                    "batch_size": len(batch)}
+                future.set_result(result)
+
+    async def _search_alone(self, loop, request):
+        try:
+            return (await loop.run_in_executor(None, self.search_batch, [request]))[0]
+        except Exception as e:
+            return e
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch": self.requests / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queued": self.queue.qsize(),
+        }
+
+
+# 🧾 A Chroma-style filter the collections can evaluate; raises ValueError naming what is wrong
+def validate_where(where):
+    if not isinstance(where, dict) or not where:
+        raise ValueError("'where' must be a non-empty object")
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            if not isinstance(cond, list) or not cond:
+                raise ValueError(f"'{key}' must be a non-empty list of filters")
+            for clause in cond:
+                validate_where(clause)
+        elif key.startswith("$"):
+            raise ValueError(f"unsupported filter key '{key}'")
+        elif isinstance(cond, dict):
+            if len(cond) != 1:
+                raise ValueError(f"filter on '{key}' must have exactly one operator")
+            op, value = next(iter(cond.items()))
+            if op not in WHERE_OPERATORS:
+                raise ValueError(f"unsupported operator '{op}' on '{key}'")
+            if op in ("$gt", "$gte", "$lt", "$lte") and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"'{op}' on '{key}' needs a number")
+            if op in ("$in", "$nin") and not (isinstance(value, list) and all(isinstance(v, SCALAR) for v in value)):
+                raise ValueError(f"'{op}' on '{key}' needs a list of values")
+            if op in ("$eq", "$ne") and not isinstance(value, SCALAR):
+                raise ValueError(f"'{op}' on '{key}' needs a single value")
+        elif not isinstance(cond, SCALAR):
+            raise ValueError(f"filter on '{key}' must be a value or an {{operator: value}} object")
+
+
+# 🧾 POST /search body -> request for Retriever.search_batch; ValueError for bad client input
+def parse_search_request(body):
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    query = str(body.get("query") or "").strip()
+    if not query:
+        raise ValueError("missing 'query'")
+    n_results = body.get("n_results", 5)
+    if isinstance(n_results, bool) or not isinstance(n_results, int) or n_results < 1:
+        raise ValueError("'n_results' must be a positive integer")
+    where = body.get("where") or None
+    if where is not None:
+        validate_where(where)
+    budget_ms = body.get("budget_ms")
+    if budget_ms is not None and (isinstance(budget_ms, bool) or not isinstance(budget_ms, (int, float))
+                                  or budget_ms < 0):
+        raise ValueError("'budget_ms' must be a non-negative number")
+    return {
+        "query": query,
+        "n_results": min(n_results, MAX_RESULTS),
+        "where": where,
+        "rerank": bool(body.get("rerank", False)),
+        "budget_ms": budget_ms,
+    }
+
+
+BATCHER_KEY = web.AppKey("batcher", MicroBatcher)
+
+
+def build_app(retriever, window_ms=5.0, max_batch=64):
+    app = web.Application()
+    app[BATCHER_KEY] = MicroBatcher(retriever.search_batch, window_ms=window_ms, max_batch=max_batch)
+
+    async def search(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="body must be JSON")
+        try:
+            req = parse_search_request(body)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        result = await request.app[BATCHER_KEY].submit(req)
+        return web.json_response({key: result[key] for key in RESULT_KEYS if key in result})
+
+    async def facets(request):
+        return web.json_response(retriever.facets())
+
+    async def stats(request):
+        return web.json_response({**retriever.stats(), "batching": request.app[BATCHER_KEY].stats()})
+
+    async def health(request):
+        return web.json_response({"status": "ok", "catalog_version": read_catalog_version()})
+
+    async def metrics(request):
+        for cache, stats in retriever.stats().items():
+            for stat, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    CACHE_STATS.set(value, cache=cache, stat=stat)
+        return web.Response(body=render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def on_startup(app):
+        app[BATCHER_KEY].start()
+
+    async def on_cleanup(app):
+        await app[BATCHER_KEY].stop()
+
+    app.router.add_post("/search", search)
+    app.router.add_get("/facets", facets)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def make_local_retriever(rerank=False):
+    from embedding_cache import CachedEncoder
+    from reranker import CrossEncoderReranker
+    from retrieval import Retriever
+    from vector_store import open_collection
+
+    return Retriever(open_collection(), CachedEncoder("all-MiniLM-L6-v2"),
+                     reranker=CrossEncoderReranker() if rerank else None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve trailer part search over HTTP with micro-batching")
+    parser.add_argument("--host", default=os.environ.get("RETRIEVAL_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("RETRIEVAL_PORT", "8600")))
+    parser.add_argument("--window-ms", type=float, default=5.0,
+                        help="how long to wait for more queries before running a batch")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--rerank", action="store_true", help="load the cross-encoder for rerank requests")
+    args = parser.parse_args()
+
+    retriever = make_local_retriever(rerank=args.rerank)
+    retriever.embed("trailer axle")  # load the encoder before the first request
+    print(f"🛰️ Retrieval service on http://{args.host}:{args.port} "
+          f"(batching window {args.window_ms} ms, max batch {args.max_batch})")
+    web.run_app(build_app(retriever, args.window_ms, args.max_batch), host=args.host, port=args.port,
+                print=None)
@@ -0,0 +1,81 @@
+import re
+
+# 🔩 Typed product fields parsed from the free-text price and name at normalize time, so search
+# can filter on them in Chroma (`where`) instead of over-fetching and filtering by eye.
+#
+#   price_min / price_max  float   "123.45 to 150.00" -> 123.45 / 150.0, "N/A" -> absent
+#   capacity_lbs           int     "7000 lbs", "7,000 lb", "7K", "3.5K" -> 7000 / 3500
+#   brake_type             str     "electric", "hydraulic" or "idler"
+#   axle_count             int     "single" 1, "tandem"/"dual" 2, "triple" 3, "2-axle" 2
+#
+# Fields that cannot be parsed are left out (Chroma metadata values cannot be None).
+
+SPEC_FIELDS = ("price_min", "price_max", "capacity_lbs", "brake_type", "axle_count")
+
+_PRICE = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?")
+_CAPACITY_LBS = re.compile(r"\b(\d{1,2},?\d{3})\s*(?:-\s*)?(?:lbs?|pounds?|#)(?![a-z])", re.IGNORECASE)
+_CAPACITY_K = re.compile(r"\b(\d{1,2}(?:\.\d)?)\s*k\b", re.IGNORECASE)
+_ELECTRIC = re.compile(r"\belectric(?:al)?\b", re.IGNORECASE)
+_HYDRAULIC = re.compile(r"\b(?:hydraulic|surge)\b", re.IGNORECASE)
+_IDLER = re.compile(r"\b(?:idler|no\s+brakes?|brakeless|without\s+brakes?)\b", re.IGNORECASE)
+_BRAKE = re.compile(r"\bbrakes?\b", re.IGNORECASE)
+_AXLE_WORDS = (
+    (re.compile(r"\b(?:triple|tri)[\s-]*axles?\b", re.IGNORECASE), 3),
+    (re.compile(r"\b(?:tandem|dual|double)[\s-]*axles?\b|\btandem\b", re.IGNORECASE), 2),
+    (re.compile(r"\bsingle[\s-]*axles?\b", re.IGNORECASE), 1),
+)
+_AXLE_DIGIT = re.compile(r"\b([1-3])[\s-]*axles?\b", re.IGNORECASE)
+
+# Plausible trailer axle capacities; filters out model numbers that happen to precede "lb"
+_MIN_CAPACITY, _MAX_CAPACITY = 500, 30000
+
+
+# 💲 (min, max) from "123.45", "$1,299.00", "123.45 to 150.00"; (None, None) when there is no number
+def parse_price_range(text):
+    values = [float(v.replace(",", "")) for v in _PRICE.findall(str(text or ""))]
+    if not values:
+        return None, None
+    return min(values), max(values)
+
+
+def parse_capacity_lbs(name):
+    for match in _CAPACITY_LBS.finditer(name):
+        value = int(match.group(1).replace(",", ""))
+        if _MIN_CAPACITY <= value <= _MAX_CAPACITY:
+            return value
+    for match in _CAPACITY_K.finditer(name):
+        value = int(round(float(match.group(1)) * 1000))
+        if _MIN_CAPACITY <= value <= _MAX_CAPACITY:
+            return value
+    return None
+
+
+def parse_brake_type(name):
+    if _IDLER.search(name):
+        return "idler"
+    if _HYDRAULIC.search(name):
+        return "hydraulic"
+    if _ELECTRIC.search(name) and _BRAKE.search(name):
+        return "electric"
+    return None
+
+
+def parse_axle_count(name):
+    for pattern, count in _AXLE_WORDS:
+        if pattern.search(name):
+            return count
+    match = _AXLE_DIGIT.search(name)
+    return int(match.group(1)) if match else None
+
+
+# 🧾 All typed fields for one product, only the ones that could be parsed
+def parse_specs(name, price):
+    price_min, price_max = parse_price_range(price)
+    fields = {
+        "price_min": price_min,
+        "price_max": price_max,
+        "capacity_lbs": parse_capacity_lbs(name or ""),
+        "brake_type": parse_brake_type(name or ""),
+        "axle_count": parse_axle_count(name or ""),
+    }
+    return {key: value for key, value in fields.items() if value is not None}
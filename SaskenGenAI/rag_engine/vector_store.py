@@ -0,0 +1,722 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from projection import PCAProjection
+
+# 🗄️ Vector store backends behind one collection interface
+#
+# "chroma" (default): ChromaDB's persistent client, as before.
+# "numpy": an in-process index over a memory-mapped float16 matrix of normalized embeddings. It
+#   starts in milliseconds, needs no SQLite or HNSW build, and answers top-k with blocked matrix
+#   products. Above IVF_MIN_ROWS rows it also keeps k-means partitions (IVF) and only scores the
+#   IVF_NPROBE closest partitions per query.
+#   VECTOR_QUANTIZATION (set when the index is written) compresses what queries scan: "int8" keeps
+#   one byte per dimension plus a scale per vector (1/4 of float32), "pq" keeps PQ_SUBVECTORS
+#   one-byte product-quantization codes per vector (384 dims, 48 codes: 1/32). Queries score the
+#   codes, then rescore a shortlist of VECTOR_RESCORE x k rows exactly from the float16 matrix, which
+#   stays on disk and is only paged in for those rows.
+#
+# NumpyCollection implements the part of Chroma's Collection API this project uses (query, get,
+# upsert, delete, count), so Retriever, the embed step and the CLIs do not care which backend they
+# get. Select it with VECTOR_BACKEND=numpy; the embed step then writes it instead of Chroma.
+# Either backend is wrapped in a ProjectedCollection, which applies the PCA profile (see
+# projection.py) when the embed step has fitted one.
+#
+# Reduction profiles: a new profile is embedded into a collection of its own (e.g.
+# trailer_parts__pca128_20250101_120000, numpy index in chromadb/numpy_<collection>/) with its
+# projection in chromadb/<collection>.projection.npz. Only when it is complete does the embed step
+# point chromadb/trailer_parts.active.json at it, so readers switch collection and projection
+# together. Without that file the original layout is used: trailer_parts (numpy_index/) and
+# chromadb/projection.npz.
+#
+# On disk (chromadb/numpy_index/):
+#   CURRENT               name of the live generation directory, swapped atomically by the writer
+#   gen_<n>/vectors.f16   float16 matrix (rows x dim), rows grouped by partition when IVF is on
+#   gen_<n>/items.jsonl   sidecar: one {"id", "document", "metadata"} line per matrix row
+#   gen_<n>/meta.json     rows / dim / partition layout
+#   gen_<n>/ivf.npz       centroids (float32) and row offsets of each partition
+#   gen_<n>/codes.i8 + scales.f32   int8 codes (rows x dim) and per-vector scales
+#   gen_<n>/codes.pq + pq.npz       PQ codes (rows x subvectors) and codebooks (subvectors x 256 x sub-dim)
+
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+CHROMA_PATH = "chromadb"
+COLLECTION_NAME = "trailer_parts"
+NUMPY_INDEX_DIR = os.path.join(CHROMA_PATH, "numpy_index")
+
+IVF_MIN_ROWS = int(os.environ.get("IVF_MIN_ROWS", "50000"))  # flat scan below this
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "16"))
+SCAN_BLOCK = 32768  # rows converted to float32 per matrix product
+# Matrices up to this size are converted to float32 once and kept in RAM (converting float16 on
+# every scan costs more than the matrix product); larger ones are scanned from the memory map
+FLOAT32_CACHE_MB = int(os.environ.get("VECTOR_FLOAT32_CACHE_MB", "128"))
+QUANTIZATIONS = ("none", "int8", "pq")
+VECTOR_QUANTIZATION = os.environ.get("VECTOR_QUANTIZATION", "none")
+PQ_SUBVECTORS = int(os.environ.get("PQ_SUBVECTORS", "48"))  # must divide the embedding dimension
+RESCORE_FACTOR = int(os.environ.get("VECTOR_RESCORE", "10"))  # 0 = rank by the compressed codes only
+RELOAD_CHECK_INTERVAL = 2.0  # seconds between checks for a newer generation
+MASK_CACHE_SIZE = 256
+
+
+# options go to NumpyCollection (e.g. quantization="int8"); Chroma stores float32 vectors only
+def open_collection(backend=VECTOR_BACKEND, path=CHROMA_PATH, name=COLLECTION_NAME, **options):
+    if backend not in ("chroma", "numpy"):
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}' (expected 'chroma' or 'numpy')")
+    if backend == "chroma" and options.get("quantization", "none") != "none":
+        print(f"⚠️ Quantization '{options['quantization']}' needs VECTOR_BACKEND=numpy; Chroma keeps float32 vectors")
+    active = active_collection(path, name)
+    return ProjectedCollection(_open_backend(backend, path, active, name, options),
+                               _projection_file(path, active, name), follow=(backend, path, name, options))
+
+
+# --- The live collection of a base name, and where each collection keeps its files ---
+def _active_file(path, name):
+    return os.path.join(path, f"{name}.active.json")
+
+
+def active_collection(path=CHROMA_PATH, name=COLLECTION_NAME):
+    try:
+        with open(_active_file(path, name), "r", encoding="utf-8") as f:
+            return json.load(f)["collection"]
+    except (OSError, ValueError, KeyError):
+        return name
+
+
+def _projection_file(path, collection, name):
+    return os.path.join(path, "projection.npz" if collection == name else f"{collection}.projection.npz")
+
+
+def _numpy_dir(path, collection, name):
+    return os.path.join(path, "numpy_index" if collection == name else f"numpy_{collection}")
+
+
+def _open_backend(backend, path, collection, name, options):
+    if backend == "numpy":
+        return NumpyCollection(_numpy_dir(path, collection, name), name=collection, **options)
+    import chromadb
+    return chromadb.PersistentClient(path=path).get_or_create_collection(name=collection)
+
+
+def _index_names(backend, path, name):
+    if backend == "numpy":
+        found = [d[len("numpy_"):] for d in os.listdir(path) if d.startswith(f"numpy_{name}__")]
+        return found + ([name] if os.path.isdir(_numpy_dir(path, name, name)) else [])
+    import chromadb
+    names = [getattr(c, "name", c) for c in chromadb.PersistentClient(path=path).list_collections()]
+    return [n for n in names if n == name or n.startswith(f"{name}__")]
+
+
+def _drop_index(backend, path, collection, name):
+    if backend == "numpy":
+        shutil.rmtree(_numpy_dir(path, collection, name), ignore_errors=True)
+    else:
+        import chromadb
+        chromadb.PersistentClient(path=path).delete_collection(collection)
+    projection_file = _projection_file(path, collection, name)
+    if os.path.exists(projection_file):
+        os.remove(projection_file)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# Largest write the backend accepts in one call (Chroma's client caps upserts)
+def max_batch_size(collection, default):
+    client = getattr(getattr(collection, "inner", collection), "_client", None)
+    return min(default, getattr(client, "max_batch_size", default))
+
+
+# 📉 Applies the PCA profile to upserted and query embeddings; everything else goes straight to the
+# backend. Long-running readers pick up a new or removed projection file within RELOAD_CHECK_INTERVAL.
+# Opened by open_collection() (follow=...), it also follows the <name>.active.json pointer: the
+# collection and its projection are swapped as one pair, so a query never mixes the two.
+class ProjectedCollection:
+    def __init__(self, collection, projection_file, follow=None):
+        self._active = (collection, None)
+        self.projection_file = projection_file
+        self._follow = follow  # (backend, path, base name, options)
+        self._stamp = ()
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._current()[0], name)
+
+    @property
+    def inner(self):
+        return self._active[0]
+
+    def _current(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + RELOAD_CHECK_INTERVAL
+                    self._reload()
+        return self._active
+
+    def _reload(self):
+        collection = self.inner
+        if self._follow:
+            backend, path, name, options = self._follow
+            active = active_collection(path, name)
+            projection_file = _projection_file(path, active, name)
+            stamp = (_mtime(_active_file(path, name)), _mtime(projection_file))
+            if stamp == self._stamp:
+                return
+            if active != collection.name:
+                collection = _open_backend(backend, path, active, name, options)
+            self.projection_file = projection_file
+        else:
+            stamp = (_mtime(self.projection_file),)
+            if stamp == self._stamp:
+                return
+        self._stamp = stamp
+        self._active = (collection, PCAProjection.load(self.projection_file))
+
+    def projection(self):
+        return self._current()[1]
+
+    # The embed step pins the projection of the collection it is building (or None for full width)
+    def use(self, projection):
+        self._active = (self.inner, projection)
+        self._next_check = float("inf")
+
+    @staticmethod
+    def _project(projection, embeddings):
+        return embeddings if projection is None else projection.apply(embeddings).tolist()
+
+    def query(self, query_embeddings, **kwargs):
+        collection, projection = self._current()
+        return collection.query(query_embeddings=self._project(projection, query_embeddings), **kwargs)
+
+    def upsert(self, ids, embeddings, **kwargs):
+        collection, projection = self._current()
+        return collection.upsert(ids=ids, embeddings=self._project(projection, embeddings), **kwargs)
+
+    def add(self, ids, embeddings, **kwargs):
+        collection, projection = self._current()
+        return collection.add(ids=ids, embeddings=self._project(projection, embeddings), **kwargs)
+
+    # 🏗️ Empty collection for a new reduction profile, next to the live one and unseen by readers
+    # until publish(). A Chroma collection's dimension is fixed once it has data, so every profile
+    # gets its own.
+    def build(self, projection):
+        backend, path, name, options = self._follow
+        dim = projection.dim_out if projection else 0
+        target = f"{name}__{f'pca{dim}' if dim else 'full'}_{time.strftime('%Y%m%d_%H%M%S')}"
+        staged = ProjectedCollection(_open_backend(backend, path, target, name, options),
+                                     _projection_file(path, target, name))
+        staged.use(projection)
+        return staged
+
+    # 🔀 Switch readers to a completely written build: its projection is saved first, then the
+    # pointer is replaced in one rename. The previous collection is kept for readers still on it;
+    # older ones are dropped.
+    def publish(self, staged):
+        backend, path, name, options = self._follow
+        collection, projection = staged._active
+        if projection is not None:
+            projection.save(staged.projection_file)
+        previous = self.inner.name
+        tmp = _active_file(path, name) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"collection": collection.name, "dim": projection.dim_out if projection else 0,
+                       "published": time.strftime("%Y-%m-%dT%H:%M:%S")}, f)
+        os.replace(tmp, _active_file(path, name))
+        with self._lock:
+            self._active = (collection, projection)
+            self.projection_file = staged.projection_file
+            self._next_check = 0.0
+        for old in _index_names(backend, path, name):
+            if old not in (collection.name, previous):
+                _drop_index(backend, path, old, name)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# 🧮 Spherical k-means on a sample: unit centroids, assignment by largest dot product
+def train_partitions(vectors, count, iterations=8, sample=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)].astype(np.float32)
+    centroids = rows[rng.choice(len(rows), count, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(rows @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, rows)
+        empty = np.bincount(assign, minlength=count) == 0
+        sums[empty] = rows[rng.choice(len(rows), int(empty.sum()))]  # reseed empty partitions
+        centroids = _normalize(sums)
+    return centroids
+
+
+# 🗜️ int8: x ~= codes * scale, scale = max |x| / 127 per vector
+def quantize_int8(vectors):
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK):
+        block = vectors[start:start + SCAN_BLOCK].astype(np.float32)
+        scale = np.abs(block).max(axis=1) / 127
+        scale[scale == 0] = 1.0
+        codes[start:start + SCAN_BLOCK] = np.rint(block / scale[:, None])
+        scales[start:start + SCAN_BLOCK] = scale
+    return codes, scales
+
+
+# 🗜️ Product quantization: split vectors into sub-vectors, k-means (256 centroids) per sub-space
+def train_codebooks(vectors, subvectors, iterations=10, sample=10000, seed=0):
+    dim = vectors.shape[1]
+    if dim % subvectors:
+        raise ValueError(f"PQ_SUBVECTORS={subvectors} does not divide the embedding dimension {dim}")
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.choice(len(vectors), min(sample, len(vectors)), replace=False)].astype(np.float32)
+    rows = rows.reshape(len(rows), subvectors, dim // subvectors)
+    count = min(256, len(rows))
+    codebooks = np.empty((subvectors, count, dim // subvectors), dtype=np.float32)
+    for m in range(subvectors):
+        points = np.ascontiguousarray(rows[:, m])
+        centroids = points[rng.choice(len(points), count, replace=False)].copy()
+        for _ in range(iterations):
+            assign = _nearest(points, centroids)
+            sums = np.stack([np.bincount(assign, weights=points[:, j], minlength=count)
+                             for j in range(points.shape[1])], axis=1)
+            sizes = np.bincount(assign, minlength=count)
+            empty = sizes == 0
+            centroids = sums / np.maximum(sizes, 1)[:, None]
+            centroids[empty] = points[rng.choice(len(points), int(empty.sum()))]
+        codebooks[m] = centroids
+    return codebooks
+
+
+# PQ_SUBVECTORS, or the largest divisor of dim below it (e.g. 32 for a 64 or 128-dim PCA profile)
+def pq_subvectors(dim, wanted=PQ_SUBVECTORS):
+    return max(d for d in range(1, min(wanted, dim) + 1) if dim % d == 0)
+
+
+def _nearest(points, centroids):
+    # argmin |x - c|^2 == argmax x.c - |c|^2 / 2
+    return np.argmax(points @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+
+
+def encode_pq(vectors, codebooks):
+    subvectors, _, sub = codebooks.shape
+    codes = np.empty((len(vectors), subvectors), dtype=np.uint8)
+    for start in range(0, len(vectors), SCAN_BLOCK):
+        block = vectors[start:start + SCAN_BLOCK].astype(np.float32).reshape(-1, subvectors, sub)
+        for m in range(subvectors):
+            codes[start:start + SCAN_BLOCK, m] = _nearest(block[:, m], codebooks[m])
+    return codes
+
+
+def assign_partitions(vectors, centroids):
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCAN_BLOCK):
+        block = vectors[start:start + SCAN_BLOCK].astype(np.float32)
+        assign[start:start + SCAN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+# 📦 One immutable generation of the index, as loaded by readers
+class _Snapshot:
+    def __init__(self, ids, documents, metadatas, vectors, centroids=None, offsets=None, trained_rows=0,
+                 quantization="none", qcodes=None, scales=None, codebooks=None, codebook_rows=0):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.trained_rows = trained_rows
+        self.quantization = quantization
+        self.qcodes = qcodes  # int8 (rows x dim) or uint8 PQ codes (rows x subvectors)
+        self.scales = scales
+        self.codebooks = codebooks
+        self.codebook_rows = codebook_rows
+        self._rows = None
+        self._codes = {}
+        self._numbers = {}
+        self._masks = {}
+        self._dense = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], np.zeros((0, 0), dtype=np.float16))
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        ids, documents, metadatas = [], [], []
+        with open(os.path.join(directory, "items.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                ids.append(item["id"])
+                documents.append(item["document"])
+                metadatas.append(item["metadata"])
+        vectors = (np.memmap(os.path.join(directory, "vectors.f16"), dtype=np.float16, mode="r",
+                             shape=(meta["rows"], meta["dim"])) if meta["rows"] else
+                   np.zeros((0, meta["dim"]), dtype=np.float16))
+        centroids = offsets = None
+        if meta.get("partitions"):
+            with np.load(os.path.join(directory, "ivf.npz")) as ivf:
+                centroids, offsets = ivf["centroids"], ivf["offsets"]
+        quantization = meta.get("quantization", "none")
+        qcodes = scales = codebooks = None
+        if quantization == "int8":
+            qcodes = np.memmap(os.path.join(directory, "codes.i8"), dtype=np.int8, mode="r",
+                               shape=(meta["rows"], meta["dim"]))
+            scales = np.fromfile(os.path.join(directory, "scales.f32"), dtype=np.float32)
+        elif quantization == "pq":
+            with np.load(os.path.join(directory, "pq.npz")) as pq:
+                codebooks = pq["codebooks"]
+            qcodes = np.memmap(os.path.join(directory, "codes.pq"), dtype=np.uint8, mode="r",
+                               shape=(meta["rows"], len(codebooks)))
+        return cls(ids, documents, metadatas, vectors, centroids, offsets, meta.get("trained_rows", 0),
+                   quantization, qcodes, scales, codebooks, meta.get("pq_trained_rows", 0))
+
+    def __len__(self):
+        return len(self.ids)
+
+    # float32 copy of the matrix when it fits in FLOAT32_CACHE_MB, else the float16 memory map
+    def matrix(self):
+        if self._dense is None:
+            if self.vectors.size * 4 <= FLOAT32_CACHE_MB * 2 ** 20:
+                self._dense = np.asarray(self.vectors, dtype=np.float32)
+            else:
+                self._dense = self.vectors
+        return self._dense
+
+    def row_of(self, pid):
+        if self._rows is None:
+            self._rows = {pid: row for row, pid in enumerate(self.ids)}
+        return self._rows.get(pid)
+
+    # 🧰 `where` clause -> boolean row mask, vectorized per field and cached per clause
+    def mask(self, where):
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        with self._lock:
+            cached = self._masks.get(key)
+        if cached is None:
+            cached = self._eval(where)
+            with self._lock:
+                if len(self._masks) >= MASK_CACHE_SIZE:
+                    self._masks.pop(next(iter(self._masks)))
+                self._masks[key] = cached
+        return cached
+
+    def _eval(self, where):
+        if "$and" in where:
+            return np.logical_and.reduce([self._eval(w) for w in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._eval(w) for w in where["$or"]])
+        masks = [self._condition(field, cond) for field, cond in where.items()]
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
+
+    def _condition(self, field, cond):
+        op, value = next(iter(cond.items())) if isinstance(cond, dict) else ("$eq", cond)
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            numbers = self._number_column(field)
+            with np.errstate(invalid="ignore"):
+                return {"$gt": numbers > value, "$gte": numbers >= value,
+                        "$lt": numbers < value, "$lte": numbers <= value}[op]
+        codes, lookup = self._code_column(field)
+        wanted = [lookup[v] for v in (value if op in ("$in", "$nin") else [value]) if v in lookup]
+        hit = np.isin(codes, wanted)
+        if op in ("$eq", "$in"):
+            return hit
+        if op in ("$ne", "$nin"):
+            return ~hit
+        raise ValueError(f"Unsupported where operator {op}")
+
+    def _code_column(self, field):
+        if field not in self._codes:
+            lookup = {}
+            codes = np.fromiter((lookup.setdefault(meta.get(field), len(lookup)) for meta in self.metadatas),
+                                dtype=np.int32, count=len(self.metadatas))
+            self._codes[field] = (codes, lookup)
+        return self._codes[field]
+
+    def _number_column(self, field):
+        if field not in self._numbers:
+            self._numbers[field] = np.array(
+                [v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+                 for v in (meta.get(field) for meta in self.metadatas)], dtype=np.float64)
+        return self._numbers[field]
+
+    # Bytes the scans touch: codes (+ scales, codebooks) when quantized, else the matrix
+    def memory_bytes(self):
+        if self.quantization == "none":
+            return self.matrix().nbytes
+        return sum(a.nbytes for a in (self.qcodes, self.scales, self.codebooks) if a is not None)
+
+    # Scores of rows [start, stop) against every query, shape (rows, queries)
+    def _score(self, start, stop, queries):
+        if self.quantization == "int8":
+            return (self.qcodes[start:stop].astype(np.float32) @ queries.T) * self.scales[start:stop, None]
+        if self.quantization == "pq":
+            subvectors, count, sub = self.codebooks.shape
+            # Per query: a (subvectors x 256) table of sub-vector dot products, summed over each row's codes
+            tables = np.einsum("qms,mcs->qmc", queries.reshape(len(queries), subvectors, sub), self.codebooks)
+            index = self.qcodes[start:stop].astype(np.intp) + np.arange(subvectors) * count
+            return np.stack([table.ravel()[index].sum(axis=1) for table in tables], axis=1)
+        return self.matrix()[start:stop].astype(np.float32, copy=False) @ queries.T
+
+    # 🔎 Top-k rows per query (best first) as (rows, scores) lists. Quantized indexes rank a
+    # shortlist of rescore x k rows by their codes, then rescore it with the float16 vectors.
+    def search(self, queries, k, mask=None, nprobe=IVF_NPROBE, rescore=RESCORE_FACTOR):
+        shortlist = k * rescore if self.quantization != "none" and rescore > 0 else k
+        if self.centroids is not None and nprobe < len(self.centroids):
+            hits = [self._search_ivf(q, shortlist, mask, nprobe) for q in queries]
+        else:
+            hits = self._search_flat(queries, shortlist, mask)
+        if shortlist == k:
+            return hits
+        return [self._rescore(q, rows, k) for q, (rows, _) in zip(queries, hits)]
+
+    def _rescore(self, query, rows, k):
+        rows = np.sort(rows)  # sequential reads from the memory map
+        best, scores = _top(self.vectors[rows].astype(np.float32) @ query, k)
+        return rows[best], scores
+
+    def _search_flat(self, queries, k, mask):
+        scores = np.empty((len(self.ids), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCAN_BLOCK):
+            scores[start:start + SCAN_BLOCK] = self._score(start, start + SCAN_BLOCK, queries)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        return [_top(scores[:, j], k) for j in range(len(queries))]
+
+    def _search_ivf(self, query, k, mask, nprobe):
+        probe = np.sort(np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe])
+        rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probe])
+        # Partitions are contiguous row ranges, so each one is a slice of the matrix / codes
+        scores = np.concatenate([self._score(self.offsets[p], self.offsets[p + 1], query[None, :])[:, 0]
+                                 for p in probe])
+        if mask is not None:
+            keep = mask[rows]
+            if keep.sum() < k and mask.sum() > keep.sum():
+                return self._search_flat(query[None, :], k, mask)[0]  # filter too selective: scan all
+            rows, scores = rows[keep], scores[keep]
+        best, best_scores = _top(scores, k)
+        return rows[best], best_scores
+
+
+def _top(scores, k):
+    valid = int(np.isfinite(scores).sum())
+    k = min(k, valid)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    top = top[np.isfinite(scores[top])]
+    return top, scores[top]
+
+
+# 🗃️ Chroma-compatible collection over _Snapshot generations. Readers pick up a new generation
+# within RELOAD_CHECK_INTERVAL; writes are buffered in memory until flush() publishes them.
+class NumpyCollection:
+    def __init__(self, path=NUMPY_INDEX_DIR, nprobe=IVF_NPROBE, ivf_min_rows=IVF_MIN_ROWS,
+                 quantization=VECTOR_QUANTIZATION, subvectors=PQ_SUBVECTORS, rescore=RESCORE_FACTOR,
+                 name=COLLECTION_NAME):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION '{quantization}' (expected one of {', '.join(QUANTIZATIONS)})")
+        self.path = path
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.quantization = quantization  # used when writing; readers follow each generation's meta.json
+        self.subvectors = subvectors
+        self.rescore = rescore
+        self.name = name
+        self._snapshot = _Snapshot.empty()
+        self._generation = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._pending = None  # id -> (float16 vector, document, metadata) once something was written
+        self._dirty = False
+        self.snapshot()
+
+    def _current_file(self):
+        return os.path.join(self.path, "CURRENT")
+
+    def snapshot(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._snapshot
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + RELOAD_CHECK_INTERVAL
+                try:
+                    with open(self._current_file(), "r", encoding="utf-8") as f:
+                        generation = f.read().strip()
+                except OSError:
+                    generation = None
+                if generation and generation != self._generation:
+                    self._snapshot = _Snapshot.load(os.path.join(self.path, generation))
+                    self._generation = generation
+        return self._snapshot
+
+    # --- Chroma read API ---
+    def count(self):
+        return len(self._pending) if self._pending is not None else len(self.snapshot())
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        snap = self.snapshot()
+        queries = _normalize(query_embeddings)
+        if not len(snap):
+            hits = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))] * len(queries)
+        else:
+            hits = snap.search(queries, n_results, snap.mask(where), self.nprobe, self.rescore)
+        return {
+            "ids": [[snap.ids[r] for r in rows] for rows, _ in hits],
+            "documents": [[snap.documents[r] for r in rows] for rows, _ in hits],
+            "metadatas": [[snap.metadatas[r] for r in rows] for rows, _ in hits],
+            # Squared L2 between unit vectors, the same scale as Chroma's default "l2" space
+            "distances": [[max(0.0, float(2 - 2 * s)) for s in scores] for _, scores in hits],
+        }
+
+    def get(self, ids=None, where=None, include=None, limit=None, offset=None):
+        snap = self.snapshot()
+        if ids is not None:
+            rows = [r for r in (snap.row_of(pid) for pid in ids) if r is not None]
+        else:
+            rows = range(len(snap))
+        mask = snap.mask(where)
+        if mask is not None:
+            rows = [r for r in rows if mask[r]]
+        rows = list(rows)[offset or 0:(offset or 0) + limit if limit is not None else None]
+        return {
+            "ids": [snap.ids[r] for r in rows],
+            "documents": [snap.documents[r] for r in rows],
+            "metadatas": [snap.metadatas[r] for r in rows],
+        }
+
+    # --- Chroma write API (buffered until flush) ---
+    def _writable(self):
+        if self._pending is None:
+            snap = self.snapshot()
+            self._pending = {pid: (np.array(snap.vectors[i]), snap.documents[i], snap.metadatas[i])
+                             for i, pid in enumerate(snap.ids)}
+        return self._pending
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        pending = self._writable()
+        vectors = _normalize(embeddings).astype(np.float16)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        for pid, vector, doc, meta in zip(ids, vectors, documents, metadatas):
+            pending[pid] = (vector, doc, meta)
+        self._dirty = True
+
+    add = upsert
+
+    def delete(self, ids):
+        pending = self._writable()
+        for pid in ids:
+            pending.pop(pid, None)
+        self._dirty = True
+
+    def _layout_changed(self):
+        snap = self.snapshot()
+        if not len(snap) or snap.quantization != self.quantization:
+            return bool(len(snap))
+        return snap.quantization == "pq" and len(snap.codebooks) != pq_subvectors(snap.vectors.shape[1], self.subvectors)
+
+    # 💾 Write a new generation and switch CURRENT to it (also when only the quantization changed)
+    def flush(self):
+        if not self._dirty and not self._layout_changed():
+            return
+        pending = self._writable()
+        ids = list(pending)
+        dim = len(next(iter(pending.values()))[0]) if pending else self.snapshot().vectors.shape[1]
+        vectors = np.stack([pending[pid][0] for pid in ids]) if ids else np.zeros((0, dim), dtype=np.float16)
+
+        # IVF: keep the previous centroids until the catalog has doubled, then retrain
+        previous = self.snapshot()
+        centroids = offsets = None
+        trained_rows = 0
+        if len(ids) >= self.ivf_min_rows:
+            if (previous.centroids is not None and previous.centroids.shape[1] == dim
+                    and len(ids) < 2 * previous.trained_rows):
+                centroids, trained_rows = previous.centroids, previous.trained_rows
+            else:
+                centroids = train_partitions(vectors, min(1024, int(np.sqrt(len(ids)))))
+                trained_rows = len(ids)
+            assign = assign_partitions(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            ids = [ids[i] for i in order]
+            vectors = vectors[order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+
+        # Quantized codes; PQ codebooks are retrained on the same schedule as the IVF centroids
+        codebooks = None
+        codebook_rows = 0
+        if self.quantization == "pq" and len(ids):
+            subvectors = pq_subvectors(dim, self.subvectors)
+            if (previous.codebooks is not None and previous.codebooks.shape[0] == subvectors
+                    and previous.codebooks.shape[0] * previous.codebooks.shape[2] == dim
+                    and len(ids) < 2 * previous.codebook_rows):
+                codebooks, codebook_rows = previous.codebooks, previous.codebook_rows
+            else:
+                codebooks, codebook_rows = train_codebooks(vectors, subvectors), len(ids)
+
+        generation = f"gen_{time.time_ns()}"
+        directory = os.path.join(self.path, generation)
+        os.makedirs(directory)
+        vectors.tofile(os.path.join(directory, "vectors.f16"))
+        with open(os.path.join(directory, "items.jsonl"), "w", encoding="utf-8") as f:
+            for pid in ids:
+                _, doc, meta = pending[pid]
+                f.write(json.dumps({"id": pid, "document": doc, "metadata": meta}, ensure_ascii=False) + "\n")
+        if centroids is not None:
+            np.savez(os.path.join(directory, "ivf.npz"), centroids=centroids, offsets=offsets)
+        quantization = self.quantization if len(ids) else "none"
+        if quantization == "int8":
+            codes, scales = quantize_int8(vectors)
+            codes.tofile(os.path.join(directory, "codes.i8"))
+            scales.tofile(os.path.join(directory, "scales.f32"))
+        elif quantization == "pq":
+            encode_pq(vectors, codebooks).tofile(os.path.join(directory, "codes.pq"))
+            np.savez(os.path.join(directory, "pq.npz"), codebooks=codebooks)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": len(ids), "dim": int(dim), "dtype": "float16", "quantization": quantization,
+                       "partitions": 0 if centroids is None else len(centroids), "trained_rows": trained_rows,
+                       "pq_trained_rows": codebook_rows}, f)
+
+        tmp = os.path.join(self.path, ".CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(tmp, self._current_file())
+        self._dirty = False
+        self._next_check = 0.0
+        old_generation = self._generation
+        self.snapshot()
+        self._remove_old(keep={generation, old_generation})
+
+    def memory_report(self):
+        snap = self.snapshot()
+        full = snap.vectors.size * 4
+        used = snap.memory_bytes()
+        saved = f", {1 - used / full:.0%} less than float32" if full else ""
+        return f"🗜️ Index scan memory: {used / 2 ** 20:.1f} MB ({snap.quantization}{saved})"
+
+    # Older generations go once no reader should still be on them (the previous one is kept;
+    # on Windows a directory still mapped by another process simply survives until the next flush)
+    def _remove_old(self, keep):
+        for name in os.listdir(self.path):
+            if name.startswith("gen_") and name not in keep:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
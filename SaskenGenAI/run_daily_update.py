@@ -1,36 +1,56 @@
-import os
+import argparse
 from datetime import datetime
 
+from pipeline import format_result, run_pipeline, save_run_report, write_run_metrics
+from profiling import format_entry, summarize_profiles  # rag_engine/, put on sys.path by pipeline
+
+parser = argparse.ArgumentParser(description="Scrape, merge, chunk and embed trailer parts")
+parser.add_argument("--force", action="store_true", help="run every stage even if its inputs are unchanged")
+parser.add_argument("--skip-scrapers", action="store_true", help="reuse the latest scraped files")
+parser.add_argument("--workers", type=int, default=4, help="stages allowed to run at the same time")
+parser.add_argument("--profile", action="store_true",
+                    help="sample every stage and save flamegraph-ready profiles under logs/profiles/<run>")
+args = parser.parse_args()
+
 print("🚀 Starting Daily Update Pipeline")
 
 # 📅 Timestamp
 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-# Step 1: Run Scrapers
-print("🔍 Running scrapers...")
-os.system("python Scrapers/scrape_ebay.py")
-os.system("python Scrapers/scrape_trailerpartsunlimited.py")
 
-# Step 2: Merge & Normalize
-print("🔗 Merging & normalizing data...")
-merge_exit = os.system("python rag_engine/1merge_and_normalize.py")
-if merge_exit != 0:
-    print("❌ Merge step failed. Aborting pipeline.")
-    exit(1)
+def on_event(kind, stage, info):
+    if kind == "start":
+        print(f"▶️ {stage.label}...")
+    else:
+        print(format_result(info))
 
-# Step 3: Chunk Data
-print("🔪 Chunking merged data...")
-chunk_exit = os.system("python rag_engine/2chunking.py")
-if chunk_exit != 0:
-    print("❌ Chunking step failed. Aborting pipeline.")
-    exit(1)
 
-# Step 4: Embed into ChromaDB
-print("🧠 Embedding to ChromaDB...")
-embed_exit = os.system("python rag_engine/3embed_to_chromadb.py")
-if embed_exit != 0:
-    print("❌ Embedding step failed.")
-    exit(1)
+def on_line(stage, line):
+    print(f"[{stage.name}] {line}")
+
+
+# Scrapers run in parallel; merge -> chunk -> embed + BM25 index follow, each skipped if its inputs are unchanged
+skip = ["scrape_ebay", "scrape_tpu"] if args.skip_scrapers else []
+report = run_pipeline(force=args.force, skip=skip, max_workers=args.workers,
+                      on_event=on_event, on_line=on_line, profile=args.profile)
+report_path = save_run_report(report)
+
+print("\n📊 Stage summary:")
+for result in report["stages"]:
+    print(f"   {format_result(result)}")
+print(f"📝 Run report saved to {report_path}")
+print(f"📈 Metrics written to {write_run_metrics()}")
+
+# 🔬 Hottest functions per profiled stage (open the .folded files with flamegraph.pl or speedscope)
+if report.get("profile_dir"):
+    print(f"\n🔬 Profiles saved to {report['profile_dir']}")
+    for summary in summarize_profiles(report["profile_dir"]):
+        print(f"   {summary['name']} ({summary['wall_s']:.1f}s, {summary['samples']} samples):")
+        for entry in summary["top"]:
+            print(f"      {format_entry(entry)}")
 
 # ✅ Final Status
-print(f"\n✅ Daily update completed successfully at {timestamp}")
+if not report["ok"]:
+    print(f"\n❌ Daily update finished with failures ({report['wall_s']:.1f}s).")
+    exit(1)
+print(f"\n✅ Daily update completed successfully at {timestamp} ({report['wall_s']:.1f}s)")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The pipeline modules import each other by plain name, as the scripts do with their own directory
+# on sys.path: put rag_engine/ and Scrapers/ there for the tests too (and the root, for pipeline.py).
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("", "rag_engine", "Scrapers"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,18 @@
+from dedup import dedupe_records
+from specs import parse_specs
+
+
+def listing(name, price, url, image="https://img.example/axle.jpg"):
+    return {"name": name, "price": price, "url": url, "image_url": image, **parse_specs(name, price)}
+
+
+def test_range_prices_rank_by_their_lowest_price():
+    records = [
+        listing("7000 lb Tandem Axle Trailer Kit Electric Brakes", "$450.00", "https://a.example/1"),
+        listing("7000 lb Tandem Axle Trailer Kit - Electric Brakes", "$399.99 to $520.00", "https://b.example/2"),
+        listing("7000 lb Tandem Axle Trailer Kit, Electric Brakes", "N/A", "https://c.example/3"),
+    ]
+    merged, stats = dedupe_records(records)
+    assert stats["output"] == 1
+    assert merged[0]["url"] == "https://b.example/2"
+    assert [offer["price"] for offer in merged[0]["offers"]] == ["$450.00", "N/A"]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def test_reader_sees_vectors_written_by_another_instance(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "REFRESH_INTERVAL", 0.0)
+    reader = EmbeddingCache("test-model", root=str(tmp_path))
+    writer = EmbeddingCache("test-model", root=str(tmp_path))
+    assert reader.get_many(["7k axle"]) == [None]
+
+    writer.put_many(["7k axle", "brake kit"], np.eye(2, 4, dtype=np.float32))
+    found = reader.get_many(["7k axle", "brake kit", "coupler"])
+
+    np.testing.assert_array_equal(found[0], [1, 0, 0, 0])
+    np.testing.assert_array_equal(found[1], [0, 1, 0, 0])
+    assert found[2] is None
+    assert (reader.hits, reader.misses) == (2, 2)
+
+
+def test_put_many_rejects_vectors_of_another_width(tmp_path):
+    cache = EmbeddingCache("test-model", root=str(tmp_path))
+    cache.put_many(["7k axle"], np.ones((1, 4), dtype=np.float32))
+    with pytest.raises(ValueError, match="4-dim"):
+        cache.put_many(["brake kit"], np.ones((1, 8), dtype=np.float32))
+
+
+def test_readers_check_for_new_rows_at_most_once_per_interval(tmp_path, monkeypatch):
+    reader = EmbeddingCache("test-model", root=str(tmp_path))
+    writer = EmbeddingCache("test-model", root=str(tmp_path))
+    reader.get_many(["7k axle"])
+    writer.put_many(["7k axle"], np.ones((1, 4), dtype=np.float32))
+    assert reader.get_many(["7k axle"]) == [None]  # within the interval: not re-read yet
+
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: 1e12)
+    assert reader.get_many(["7k axle"])[0] is not None
+
+
+def test_lowering_max_bytes_trims_the_cache_to_the_newest_rows(tmp_path):
+    row_bytes = 4 * 4 + embedding_cache.KEY_BYTES + embedding_cache.STAMP_BYTES
+    texts = [f"part {i}" for i in range(10)]
+    big = EmbeddingCache("test-model", root=str(tmp_path))
+    big.put_many(texts, np.arange(40, dtype=np.float32).reshape(10, 4))
+    big.get_many(texts[:3])  # the three most recently used rows
+    big.close()
+
+    small = EmbeddingCache("test-model", root=str(tmp_path), max_bytes=5 * row_bytes)
+    assert small.stats()["rows"] == 5
+    found = small.get_many(texts)
+    assert [v is not None for v in found] == [True] * 3 + [False] * 5 + [True] * 2
+    np.testing.assert_array_equal(found[1], [4, 5, 6, 7])
+
+    small.put_many(["new 1", "new 2", "new 3"], np.ones((3, 4), dtype=np.float32))
+    assert small.stats()["rows"] == 5
+    assert all(v is not None for v in small.get_many(["new 1", "new 2", "new 3"]))
@@ -0,0 +1,45 @@
+from host_scheduler import HostScheduler
+
+URL = "https://www.ebay.com/sch/i.html?_nkw=trailer+axles"
+
+
+def limits(scheduler):
+    host = scheduler.hosts["www.ebay.com"]
+    return host.rate, host.limit
+
+
+def test_fast_successes_raise_rate_and_concurrency():
+    scheduler = HostScheduler(rate=5, max_rate=20, concurrency=8)
+    scheduler.acquire(URL)
+    before = limits(scheduler)
+    scheduler.release(URL, 0.1, "ok")
+    rate, limit = limits(scheduler)
+    assert rate > before[0] and limit > before[1]
+
+
+def test_http_errors_leave_limits_alone():
+    scheduler = HostScheduler(rate=5, max_rate=20, concurrency=8)
+    scheduler.acquire(URL)
+    before = limits(scheduler)
+    scheduler.release(URL, 0.1, "http_error")
+    assert limits(scheduler) == before
+    assert scheduler.hosts["www.ebay.com"].in_flight == 0
+
+
+def test_throttling_halves_rate_and_concurrency_and_pauses_host():
+    scheduler = HostScheduler(rate=8, max_rate=20, concurrency=8)
+    scheduler.acquire(URL)
+    rate, limit = limits(scheduler)
+    scheduler.release(URL, 0.1, "throttled", retry_after=5)
+    assert limits(scheduler) == (rate / 2, limit / 2)
+    assert scheduler._try_acquire(URL) > 4  # paused for the Retry-After period
+
+
+def test_errors_halve_concurrency_at_most_once_per_cooldown():
+    scheduler = HostScheduler(rate=5, max_rate=20, concurrency=8, burst=8)
+    for _ in range(4):
+        scheduler.acquire(URL)
+    _, limit = limits(scheduler)
+    for _ in range(4):
+        scheduler.release(URL, 0.1, "error")
+    assert limits(scheduler)[1] == limit / 2
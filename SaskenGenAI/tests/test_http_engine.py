@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from fixture_server import start_fixture_server
+from host_scheduler import HostScheduler
+from http_engine import HttpFetcher, resolve_ebay_images, scrape_ebay, scrape_tpu
+from scrape_state import ScrapeState
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server, url = start_fixture_server()
+    yield url
+    server.shutdown()
+
+
+# Fast scheduler so the fixture pages are not paced like a real host
+def run(coroutine_fn, *args, **kwargs):
+    async def go():
+        async with HttpFetcher(scheduler=HostScheduler(rate=200, max_rate=200, burst=50)) as fetcher:
+            return await coroutine_fn(*args, fetcher, **kwargs)
+    return asyncio.run(go())
+
+
+def test_tpu_parses_cards_and_hands_js_only_and_missing_pages_to_selenium(base_url):
+    urls = [f"{base_url}/tpu/7k-single-axle-kits.html", f"{base_url}/tpu/3-5k-single-axle-kits.html",
+            f"{base_url}/tpu/js-only-category.html", f"{base_url}/tpu/no-such-category.html"]
+    products, fallback_urls = run(scrape_tpu, urls)
+
+    assert fallback_urls == urls[2:]
+    assert len(products) == 4
+    assert products[0] == {
+        "name": "7,000 lb. Single Axle Kit - Electric Brakes - 8 Lug",
+        "price": "129.95",
+        "url": "https://trailerpartsunlimited.com/7000-lb-single-axle-kit-electric-brakes-8-lug.html",
+        "source_site": "trailerpartsunlimited.com",
+        "image_url": "https://cdn11.bigcommerce.com/s-fixture/images/stencil/500x659/products/201/7k-kit.jpg",
+    }
+    for product in products:
+        assert product["name"] and product["url"] and product["image_url"]
+
+
+def test_ebay_follows_pagination_across_search_pages(base_url):
+    search_url = f"{base_url}/ebay/search_page1.html"
+    listings, fallback = run(scrape_ebay, [search_url])
+
+    assert fallback == []
+    # page 1 holds items 1001-1003 (the "Results matching fewer words" divider is dropped), page 2 1004-1005
+    assert [listing["link"] for listing in listings] == [f"{base_url}/ebay/item_{i}.html" for i in range(1001, 1006)]
+    assert all(listing["source"] == search_url for listing in listings)
+    assert listings[1]["title"] == '3500 lb Trailer Axle Kit 5 Lug Electric Brakes 84" Hub Face'
+    assert listings[1]["price"] == "389.99"
+    assert not any("results matching" in listing["title"].lower() for listing in listings)
+
+
+def test_ebay_search_without_listings_falls_back_to_selenium(base_url):
+    search_url = f"{base_url}/ebay/no-such-search.html"
+    listings, fallback = run(scrape_ebay, [search_url])
+
+    assert listings == []
+    assert fallback == [(search_url, search_url)]
+
+
+def test_ebay_images_from_detail_pages(base_url):
+    links = [f"{base_url}/ebay/item_{i}.html" for i in range(1001, 1006)]
+    images = run(resolve_ebay_images, links)
+
+    assert images[links[0]] == "https://i.ebayimg.com/images/g/fixture1001/s-l1600.jpg"
+    assert set(images) <= set(links)
+
+
+def test_unchanged_pages_are_replayed_from_scrape_state(base_url, tmp_path):
+    urls = [f"{base_url}/tpu/7k-single-axle-kits.html", f"{base_url}/tpu/3-5k-single-axle-kits.html"]
+    first = ScrapeState("tpu", directory=str(tmp_path), enabled=True)
+    products, _ = run(scrape_tpu, urls, state=first)
+    first.classify(products, "url", "name")
+    first.save(products, "url", "name")
+
+    second = ScrapeState("tpu", directory=str(tmp_path), enabled=True)
+    replayed, fallback_urls = run(scrape_tpu, urls, state=second)
+    second.classify(replayed, "url", "name")
+
+    assert replayed == products and fallback_urls == []
+    assert second.not_modified == 2  # the fixture server answers If-Modified-Since with 304
+    assert second.counts == {"new": 0, "changed": 0, "unchanged": len(products), "removed": 0}
@@ -0,0 +1,63 @@
+import pytest
+
+from llm_client import OllamaClient, OllamaError
+from ollama_stub import DEFAULT_ANSWER, start_stub_server
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server, url = start_stub_server(**options)
+        servers.append(server)
+        return OllamaClient(url=url, read_timeout=5)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_stream_yields_every_token_and_fills_stats(stub):
+    client = stub(delay=0.005, first_token_delay=0.05)
+    answer = client.stream("Which axle kit?")
+    tokens = list(answer)
+
+    assert tokens == [t + " " for t in DEFAULT_ANSWER.split()]
+    assert answer.text == "".join(tokens)
+    assert answer.stats["tokens"] == len(tokens)
+    assert 0.05 <= answer.stats["ttft_s"] < answer.stats["total_s"]
+    assert answer.stats["tokens_per_s"] > 0
+
+
+def test_generate_returns_whole_answer(stub):
+    client = stub()
+    text, stats = client.generate("Which axle kit?")
+
+    assert text == DEFAULT_ANSWER
+    assert stats["tokens"] == len(DEFAULT_ANSWER.split())
+    assert stats["ttft_s"] == stats["total_s"]
+
+
+def test_http_error_status_raises_ollama_error(stub):
+    client = stub(fail="status")
+    with pytest.raises(OllamaError, match="status code 500"):
+        client.stream("Which axle kit?")
+    with pytest.raises(OllamaError, match="status code 500"):
+        client.generate("Which axle kit?")
+
+
+@pytest.mark.parametrize("fail, message", [("model_error", "out of memory"), ("garbled", "Invalid chunk")])
+def test_stream_errors_after_first_token_raise_ollama_error(stub, fail, message):
+    answer = stub(fail=fail).stream("Which axle kit?")
+    tokens = []
+    with pytest.raises(OllamaError, match=message):
+        for token in answer:
+            tokens.append(token)
+    assert tokens == [DEFAULT_ANSWER.split()[0] + " "]
+
+
+def test_unreachable_server_raises_ollama_error():
+    client = OllamaClient(url="http://127.0.0.1:9/api/generate", connect_timeout=0.5)
+    with pytest.raises(OllamaError, match="Could not reach"):
+        client.generate("Which axle kit?")
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import pipeline
+from pipeline import Stage, stage_fingerprint
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "BASE_DIR", str(tmp_path))
+    (tmp_path / "rag_engine").mkdir()
+    (tmp_path / "data").mkdir()
+    (tmp_path / "rag_engine" / "stage.py").write_text("print('stage')\n")
+    (tmp_path / "rag_engine" / "helper.py").write_text("THRESHOLD = 0.9\n")
+    (tmp_path / "data" / "input.jsonl").write_text('{"name": "7k axle"}\n')
+    return tmp_path
+
+
+def make_stage(**kwargs):
+    return Stage("stage", "Test stage", "rag_engine/stage.py", inputs=["data/input.json*"], **kwargs)
+
+
+def test_stage_without_inputs_has_no_fingerprint():
+    assert stage_fingerprint(Stage("scrape", "Scraper", "Scrapers/scrape_ebay.py")) is None
+
+
+def test_editing_a_helper_module_changes_the_fingerprint(tree):
+    stage = make_stage(modules=["helper.py"])
+    before = stage_fingerprint(stage)
+    assert stage_fingerprint(stage) == before
+    (tree / "rag_engine" / "helper.py").write_text("THRESHOLD = 0.8\n")
+    assert stage_fingerprint(stage) != before
+
+
+def test_changing_a_setting_changes_the_fingerprint(tree, monkeypatch):
+    stage = make_stage(settings=["DEDUP_THRESHOLD"])
+    monkeypatch.delenv("DEDUP_THRESHOLD", raising=False)
+    unset = stage_fingerprint(stage)
+    monkeypatch.setenv("DEDUP_THRESHOLD", "0.8")
+    assert stage_fingerprint(stage) != unset
+
+
+def test_absolute_input_patterns_are_read_outside_the_base_dir(tree, tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("scraped")
+    stage = Stage("merge", "Merge", "rag_engine/stage.py",
+                  inputs=[os.path.join(str(data_dir), "ebay_products_20*.json*")])
+    missing = stage_fingerprint(stage)
+    (data_dir / "ebay_products_20260101_0000.jsonl").write_text('{"title": "7k axle"}\n')
+    assert stage_fingerprint(stage) != missing
+
+
+def test_merge_stage_reads_the_scrapers_data_dir():
+    merge = next(stage for stage in pipeline.STAGES if stage.name == "merge")
+    assert all(pattern.startswith(pipeline.DATA_DIR) for pattern in merge.inputs)
+    assert "TRAILER_DATA_DIR" in merge.settings
+
+
+def test_peak_rss_is_the_stage_s_own_not_the_parent_s(tmp_path):
+    script = tmp_path / "tiny_stage.py"
+    script.write_text("import time\ntime.sleep(0.5)\nprint('hi')\n")
+    ballast = b"x" * (400 * 2 ** 20)  # ru_maxrss would report this process's high-water mark
+    result = pipeline.run_stage_process(Stage("tiny", "Tiny stage", str(script)), cwd=str(tmp_path))
+    del ballast
+    assert result["status"] == "ok" and result["output_tail"] == ["hi"]
+    assert result["peak_rss_mb"] is not None and result["peak_rss_mb"] < 100
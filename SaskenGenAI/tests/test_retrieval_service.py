@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from retrieval_service import MAX_RESULTS, build_app, parse_search_request
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.requests = []
+        self.batches = []
+
+    def search_batch(self, requests):
+        self.requests.extend(requests)
+        self.batches.append([req["query"] for req in requests])
+        if any(req["query"] == "boom" for req in requests):
+            raise RuntimeError("backend failed on this filter")
+        return [{"ids": [[f"p{i}" for i in range(req["n_results"])]], "timing": {}} for req in requests]
+
+
+def post_search(body):
+    async def go():
+        retriever = FakeRetriever()
+        async with TestClient(TestServer(build_app(retriever, window_ms=1))) as client:
+            response = await client.post("/search", json=body)
+            return response.status, await response.text(), retriever.requests
+    return asyncio.run(go())
+
+
+def test_valid_request_is_searched():
+    status, _, requests = post_search({"query": "7k axle", "n_results": 3,
+                                       "where": {"$and": [{"price_min": {"$lte": 500}},
+                                                          {"brake_type": {"$in": ["electric"]}}]}})
+    assert status == 200
+    assert requests[0]["n_results"] == 3 and requests[0]["where"]["$and"][0] == {"price_min": {"$lte": 500}}
+
+
+def test_a_failing_request_does_not_fail_its_batch():
+    async def go():
+        retriever = FakeRetriever()
+        async with TestClient(TestServer(build_app(retriever, window_ms=200))) as client:
+            good, bad = await asyncio.gather(client.post("/search", json={"query": "7k axle", "n_results": 2}),
+                                             client.post("/search", json={"query": "boom"}))
+            return good.status, await good.json(), bad.status, retriever.batches
+    good_status, good_body, bad_status, batches = asyncio.run(go())
+    assert sorted(batches[0]) == ["7k axle", "boom"]
+    assert good_status == 200 and good_body["ids"] == [["p0", "p1"]]
+    assert good_body["timing"]["batch_size"] == 2
+    assert bad_status == 500
+
+
+def test_n_results_is_clamped():
+    assert parse_search_request({"query": "axle", "n_results": 10**6})["n_results"] == MAX_RESULTS
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"query": "axle", "n_results": "five"}, "n_results"),
+    ({"query": "axle", "n_results": 0}, "n_results"),
+    ({"query": "axle", "where": "electric"}, "where"),
+    ({"query": "axle", "where": {"price_min": {"$between": [1, 2]}}}, "unsupported operator"),
+    ({"query": "axle", "where": {"price_min": {"$lte": "cheap"}}}, "needs a number"),
+    ({"query": "axle", "where": {"$and": {"a": 1}}}, "non-empty list"),
+    ({"query": "axle", "budget_ms": -5}, "budget_ms"),
+    ({"n_results": 5}, "missing 'query'"),
+    (["axle"], "JSON object"),
+])
+def test_bad_input_is_a_400_with_a_message(body, message):
+    status, text, requests = post_search(body)
+    assert status == 400
+    assert message in text
+    assert requests == []
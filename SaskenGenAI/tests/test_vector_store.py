@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+import vector_store
+from projection import PCAProjection
+from vector_store import active_collection, open_collection
+
+
+@pytest.fixture(autouse=True)
+def no_reload_delay(monkeypatch):
+    monkeypatch.setattr(vector_store, "RELOAD_CHECK_INTERVAL", 0.0)
+
+
+def vectors(rows, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+
+
+def fill(collection, rows, seed=0):
+    ids = [f"p{i}" for i in range(rows)]
+    collection.upsert(ids=ids, embeddings=vectors(rows, seed=seed).tolist(), documents=ids,
+                      metadatas=[{"n": i} for i in range(rows)])
+    collection.flush()
+
+
+def test_original_layout_without_a_pointer(tmp_path):
+    collection = open_collection("numpy", path=str(tmp_path))
+    fill(collection, 20)
+    assert collection.inner.name == vector_store.COLLECTION_NAME
+    assert os.path.isdir(tmp_path / "numpy_index")
+    assert collection.query(vectors(1, seed=0)[:1].tolist(), n_results=1)["ids"] == [["p0"]]
+
+
+def test_readers_switch_collection_and_projection_together(tmp_path):
+    writer = open_collection("numpy", path=str(tmp_path))
+    fill(writer, 40)
+    reader = open_collection("numpy", path=str(tmp_path))
+    assert reader.count() == 40
+
+    projection = PCAProjection.fit(vectors(40), 4)
+    staged = writer.build(projection)
+    fill(staged, 30)
+
+    # Fully written but not yet published: readers stay on the full-width index
+    assert reader.count() == 40 and reader.projection() is None
+    assert reader.query(vectors(1).tolist(), n_results=3)["ids"][0][0] == "p0"
+
+    writer.publish(staged)
+    assert active_collection(str(tmp_path)) == staged.inner.name
+    assert reader.count() == 30
+    assert reader.projection().dim_out == 4
+    assert reader.snapshot().vectors.shape[1] == 4
+    assert reader.query(vectors(1).tolist(), n_results=3)["ids"][0][0] == "p0"
+
+
+def test_publish_keeps_the_previous_collection_only(tmp_path, monkeypatch):
+    live = open_collection("numpy", path=str(tmp_path))
+    fill(live, 10)
+    names = []
+    for i, dim in enumerate((4, 2, 0)):
+        monkeypatch.setattr(vector_store.time, "strftime", lambda fmt, i=i: f"2025010{i}_000000")
+        staged = live.build(PCAProjection.fit(vectors(10), dim) if dim else None)
+        fill(staged, 10)
+        live.publish(staged)
+        names.append(staged.inner.name)
+
+    on_disk = sorted(name for name in os.listdir(tmp_path) if name.startswith("numpy_"))
+    assert on_disk == sorted([f"numpy_{names[1]}", f"numpy_{names[2]}"])
+    assert os.path.exists(tmp_path / f"{names[1]}.projection.npz")
+    assert not os.path.exists(tmp_path / f"{names[2]}.projection.npz")
+    assert live.projection() is None and live.snapshot().vectors.shape[1] == 8
@@ -1,26 +1,77 @@
+import math
+import os
+import sys
 import streamlit as st
-import chromadb
-from chromadb.config import Settings
-import requests
-import subprocess
 from datetime import datetime
 
+from pipeline import format_result, run_pipeline, save_run_report
+
+# Shared helpers live next to the pipeline scripts in rag_engine/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag_engine"))
+from catalog import format_offers, parse_offers
+from embedding_cache import CachedEncoder
+from llm_client import OllamaClient, OllamaError, format_stats
+from metrics import start_metrics_server
+from profiling import format_entry, profiled, summarize_profiles
+from query_cache import get_query_cache
+from reranker import CrossEncoderReranker
+from retrieval import Retriever, build_where, format_timing
+from retrieval_client import RETRIEVAL_URL, RemoteRetriever, RetrievalServiceError
+from vector_store import CHROMA_PATH, COLLECTION_NAME, open_collection
+
 
 # ---------------------------
 # Constants / Settings
 # ---------------------------
-CHROMA_PATH = "chromadb"
-COLLECTION_NAME = "trailer_parts"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
-OLLAMA_MODEL = "llama3"
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3")
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
 
 
 # ---------------------------
-# Initialize ChromaDB client and collection (once)
+# Retriever shared by every session. With RETRIEVAL_URL set, searches go to the retrieval
+# service (rag_engine/retrieval_service.py), which batches queries from all users; otherwise
+# ChromaDB, the encoder and the caches live in this process.
 # ---------------------------
-chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
-collection = chroma_client.get_or_create_collection(name=COLLECTION_NAME)
+@st.cache_resource
+def get_retriever():
+    if RETRIEVAL_URL:
+        return RemoteRetriever(RETRIEVAL_URL)
+    # VECTOR_BACKEND picks ChromaDB or the in-process NumPy index
+    collection = open_collection(path=CHROMA_PATH, name=COLLECTION_NAME)
+    # The cross-encoder is only loaded the first time a search asks for reranking
+    return Retriever(collection, CachedEncoder(EMBEDDING_MODEL), get_query_cache(),
+                     reranker=CrossEncoderReranker())
+
+
+retriever = get_retriever()
+
+
+# ---------------------------
+# Prometheus metrics of this process (search, Chroma, embedding, LLaMA, pipeline runs started
+# from the UI) on http://<host>:METRICS_PORT/metrics; off unless METRICS_PORT is set
+# ---------------------------
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+
+@st.cache_resource
+def start_metrics():
+    return start_metrics_server(METRICS_PORT) if METRICS_PORT else None
+
+
+start_metrics()
+
+# 🔬 PROFILE_REQUESTS=1 samples each search / chatbot request and saves it under logs/profiles/ui
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+REQUEST_PROFILE_DIR = os.path.join("logs", "profiles", "ui")
+
+
+def show_profile(profiler):
+    if profiler is None:
+        return
+    with st.expander(f"🔬 Request profile ({profiler.wall_s * 1000:.0f} ms) — {profiler.paths['folded']}"):
+        st.code("\n".join(format_entry(entry) for entry in profiler.top(10)))
 
 
 # ---------------------------
@@ -49,29 +100,106 @@ def format_context(metadatas):
         price = meta.get("price", "N/A")
         source = meta.get("source_site", "Unknown")
         url = meta.get("url", "#")
-        chunks.append(f"- {name}\n  Price: ${price}\n  Source: {source}\n  Link: {url}")
+        chunk = f"- {name}\n  Price: ${price}\n  Source: {source}\n  Link: {url}"
+        offers = parse_offers(meta)
+        if offers:
+            chunk += f"\n  Other offers: {format_offers(offers)}"
+        chunks.append(chunk)
     return "\n\n".join(chunks)
 
 
 # ---------------------------
-# Helper: Get LLaMA response
+# Helper: Search filters in the sidebar, drawn from the facet counts the embed step saves
+# for each catalog version (no collection scan). Returns a Chroma `where` clause or None.
+# ---------------------------
+def search_filters():
+    try:
+        facets = retriever.facets()
+    except RetrievalServiceError:
+        facets = None
+    st.sidebar.markdown("### 🎛️ Filters")
+    if not facets:
+        st.sidebar.caption("Filters appear after the next embed run.")
+        return None
+    values = facets.get("values", {})
+
+    def pick(label, field, numeric=False, unit=""):
+        counts = values.get(field) or {}
+        if not counts:
+            return []
+        options = sorted(counts, key=float) if numeric else sorted(counts)
+        return st.sidebar.multiselect(label, options, format_func=lambda v: f"{v}{unit} ({counts[v]})")
+
+    price_range = None
+    price = facets.get("price") or {}
+    if price.get("min") is not None and price["max"] > price["min"]:
+        low, high = math.floor(price["min"]), math.ceil(price["max"])
+        price_range = st.sidebar.slider("💰 Price ($)", low, high, (low, high))
+        if price_range == (low, high):
+            price_range = None
+
+    capacities = pick("🏋️ Axle capacity", "capacity_lbs", numeric=True, unit=" lbs")
+    brake_types = pick("🛑 Brake type", "brake_type")
+    axle_counts = pick("🔩 Axles", "axle_count", numeric=True)
+    sources = pick("🌐 Source", "source_site")
+    st.sidebar.caption(f"{facets.get('total', 0)} products in catalog")
+
+    return build_where(
+        price_min=price_range[0] if price_range else None,
+        price_max=price_range[1] if price_range else None,
+        capacities=capacities, brake_types=brake_types, axle_counts=axle_counts, sources=sources,
+    )
+
+
+# ---------------------------
+# Helper: Build the RAG prompt
+# ---------------------------
+def build_prompt(context, question):
+    return f"""You are a helpful assistant that knows about trailer products.
+
+Here are the most relevant trailer parts:
+
+{context}
+
+Now answer the following question based only on the information above:
+
+User Question: {question}
+
+Answer:"""
+
+
+# ---------------------------
+# Helper: Get LLaMA response (pooled keep-alive session, shared by all sessions)
 # ---------------------------
+@st.cache_resource
+def get_llm_client():
+    return OllamaClient(url=OLLAMA_URL, model=OLLAMA_MODEL)
+
+
 def get_llama_response(prompt):
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False
-            },
-        )
-        if response.status_code == 200:
-            return response.json().get("response", "").strip()
-        else:
-            return f"❌ Error: LLaMA responded with status code {response.status_code}"
-    except Exception as e:
-        return f"❌ Exception while calling LLaMA: {e}"
+        return get_llm_client().generate(prompt)
+    except OllamaError as e:
+        return f"❌ Error: {e}", None
+
+
+# Renders tokens as they arrive; returns the full answer and its timing stats
+def stream_llama_response(prompt):
+    try:
+        answer = get_llm_client().stream(prompt)
+    except OllamaError as e:
+        message = f"❌ Error: {e}"
+        st.markdown(message)
+        return message, None
+
+    def tokens():
+        try:
+            yield from answer
+        except OllamaError as e:
+            yield f"\n\n❌ Error: {e}"
+
+    text = st.write_stream(tokens())
+    return text.strip(), answer.stats or None
 
 
 # ---------------------------
@@ -230,10 +358,14 @@ if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 if "chatbot_input" not in st.session_state:
     st.session_state.chatbot_input = ""
+if "pending_chat_query" not in st.session_state:
+    st.session_state.pending_chat_query = ""
 if "search_query" not in st.session_state:
     st.session_state.search_query = ""
 if "search_results" not in st.session_state:
     st.session_state.search_results = None
+if "rerank_results" not in st.session_state:
+    st.session_state.rerank_results = False
 
 
 # ---------------------------
@@ -252,6 +384,19 @@ if not st.session_state.logged_in and menu_option != "Login":
 
 if st.session_state.logged_in:
     st.sidebar.markdown(f"**Logged in as:** {st.session_state.username}")
+    try:
+        retriever_stats = retriever.stats()
+        cache_stats = retriever_stats["embedding_cache"]
+        query_stats = retriever_stats["query_cache"]
+        st.sidebar.caption(f"Embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        st.sidebar.caption(f"Result cache: {query_stats['result_hits']} hits / {query_stats['result_misses']} misses")
+        if "batching" in retriever_stats:
+            batching = retriever_stats["batching"]
+            st.sidebar.caption(f"Retrieval service: {batching['requests']} queries in {batching['batches']} batches")
+    except RetrievalServiceError:
+        st.sidebar.caption("⚠️ Retrieval service unreachable")
+    st.sidebar.checkbox("🎯 Rerank results with a cross-encoder", key="rerank_results",
+                        help="Over-fetches candidates and reorders them; keeps the normal order if it runs over its time budget.")
     if st.sidebar.button("Logout"):
         logout()
         st.rerun()
@@ -292,9 +437,19 @@ if menu_option == "Search Interface" and st.session_state.logged_in:
         key="search_query"
     )
 
+    where = search_filters()
+
     if st.button("Search"):
         if st.session_state.search_query.strip():
-            results = collection.query(query_texts=[st.session_state.search_query.strip()], n_results=5)
+            # Filters are applied inside Chroma, so the top 5 are the top 5 matching products
+            with profiled("search", PROFILE_REQUESTS, REQUEST_PROFILE_DIR) as profiler:
+                try:
+                    results = retriever.search(st.session_state.search_query.strip(), n_results=5, where=where,
+                                               rerank=st.session_state.rerank_results)
+                except RetrievalServiceError as e:
+                    results = None
+                    st.error(f"❌ {e}")
+            show_profile(profiler)
             st.session_state.search_results = results
         else:
             st.session_state.search_results = None
@@ -309,6 +464,7 @@ if menu_option == "Search Interface" and st.session_state.logged_in:
             st.error("❌ No matching products found.")
         else:
             st.success(f"✅ Found {len(documents)} matching products:")
+            st.caption(format_timing(results["timing"]))
 
             for i, metadata in enumerate(metadatas):
                 name = metadata.get("name", "No title")
@@ -326,6 +482,11 @@ if menu_option == "Search Interface" and st.session_state.logged_in:
                     st.markdown(f"💰 **Price:** ${price}")
                     st.markdown(f"🌐 **Source:** {source}")
                     st.markdown(f"🔗 [Buy link]({url})")
+                    offers = parse_offers(metadata)
+                    if offers:
+                        st.markdown("🛒 **Other offers:** " + ", ".join(
+                            f"[${o.get('price', 'N/A')} ({o.get('source_site') or 'Unknown'})]({o.get('url', '#')})"
+                            for o in offers))
                     st.markdown("---")
 
 
@@ -335,35 +496,41 @@ if menu_option == "Search Interface" and st.session_state.logged_in:
 def handle_chatbot_input():
     chatbot_query = st.session_state.chatbot_input.strip()
     if chatbot_query:
-        results = collection.query(query_texts=[chatbot_query], n_results=5)
-        metadatas = results.get("metadatas", [[]])[0]
-
-        if not metadatas:
-            bot_response = "❌ No matching products found in the database."
-        else:
-            context = format_context(metadatas)
-            prompt = f"""You are a helpful assistant that knows about trailer products.
-
-Here are the most relevant trailer parts:
-
-{context}
-
-Now answer the following question based only on the information above:
-
-User Question: {chatbot_query}
-
-Answer:"""
+        # Answered in the page body so tokens can be rendered while they stream in
+        st.session_state.pending_chat_query = chatbot_query
+        st.session_state.chatbot_input = ""  # This is safe inside on_change callback
 
-            bot_response = get_llama_response(prompt)
 
-        st.session_state.chat_history.append((chatbot_query, bot_response))
-        st.session_state.chatbot_input = ""  # This is safe inside on_change callback
+def answer_chatbot_query(chatbot_query, stream):
+    try:
+        results = retriever.search(chatbot_query, n_results=5, rerank=st.session_state.rerank_results)
+    except RetrievalServiceError as e:
+        bot_response = f"❌ {e}"
+        st.markdown(f"**🤖 LLaMA 3:** {bot_response}")
+        return bot_response, None
+    metadatas = results.get("metadatas", [[]])[0]
+    st.caption(format_timing(results["timing"]))
+
+    if not metadatas:
+        bot_response = "❌ No matching products found in the database."
+        st.markdown(f"**🤖 LLaMA 3:** {bot_response}")
+        return bot_response, None
+
+    prompt = build_prompt(format_context(metadatas), chatbot_query)
+    st.markdown("**🤖 LLaMA 3:**")
+    if stream:
+        return stream_llama_response(prompt)
+    bot_response, stats = get_llama_response(prompt)
+    st.markdown(bot_response)
+    return bot_response, stats
 
 
 if menu_option == "RAG Chatbot" and st.session_state.logged_in:
     st.title("🤖 RAG Chatbot (LLaMA 3 + ChromaDB)")
     st.markdown("Ask any trailer part-related question below:")
 
+    stream_answers = st.checkbox("⚡ Stream answers as they are generated", value=True)
+
     st.text_input(
         "🧠 You:",
         placeholder="Type your question and press Enter...",
@@ -371,49 +538,84 @@ if menu_option == "RAG Chatbot" and st.session_state.logged_in:
         on_change=handle_chatbot_input
     )
 
-    if st.session_state.chat_history:
+    if st.session_state.chat_history or st.session_state.pending_chat_query:
         st.markdown("### 💬 Chat History")
-        for q, a in st.session_state.chat_history:
+        for q, a, stats in st.session_state.chat_history:
             st.markdown(f"**🧠 You:** {q}")
             st.markdown(f"**🤖 LLaMA 3:** {a}")
+            if stats:
+                st.caption(format_stats(stats))
             st.markdown("---")
 
+    # Newest question: answered live below the history, then stored with the rest
+    if st.session_state.pending_chat_query:
+        chatbot_query = st.session_state.pending_chat_query
+        st.session_state.pending_chat_query = ""
+        st.markdown(f"**🧠 You:** {chatbot_query}")
+        with profiled("chatbot", PROFILE_REQUESTS, REQUEST_PROFILE_DIR) as profiler:
+            bot_response, stats = answer_chatbot_query(chatbot_query, stream_answers)
+        if stats:
+            st.caption(format_stats(stats))
+        show_profile(profiler)
+        st.markdown("---")
+        st.session_state.chat_history.append((chatbot_query, bot_response, stats))
+
 
 # ---------------------------
 # Page: Daily Update Pipeline
 # ---------------------------
-def run_command(label, command):
-    with st.spinner(f"{label}..."):
-        result = subprocess.run(command, shell=True)
-        if result.returncode != 0:
-            st.error(f"❌ {label} failed.")
-            return False
-        st.success(f"✅ {label} completed.")
-        return True
+def show_stage_event(kind, stage, info):
+    if kind == "start":
+        st.info(f"▶️ {stage.label}...")
+    elif kind == "finish" and info["status"] == "ok":
+        st.success(format_result(info))
+    elif kind == "finish":
+        st.error(format_result(info))
+        with st.expander(f"Output of {stage.name}"):
+            st.code("\n".join(info.get("output_tail", [])))
+    else:
+        st.warning(format_result(info))
 
 
 if menu_option == "Daily Update Pipeline" and st.session_state.logged_in:
     st.title("🔄 Daily Data Update Pipeline")
     st.markdown("This interface lets you manually trigger the daily pipeline to scrape, process, and embed trailer parts data.")
+    st.caption("Both scrapers run in parallel, as do embedding and the BM25 index build; merge, chunk, embed and index are skipped when their inputs have not changed since the last successful run.")
+
+    force_run = st.checkbox("Force every stage to run", value=False)
+    skip_scrapers = st.checkbox("Skip scrapers (reuse the latest scraped files)", value=False)
+    profile_run = st.checkbox("🔬 Profile every stage (flamegraph-ready output under logs/profiles)", value=False)
 
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     if st.button("🚀 Run Daily Update Pipeline"):
         st.write(f"📅 Started at: `{timestamp}`")
 
-        if not run_command("Running eBay scraper", "python Scrapers/scrape_ebay.py"):
-            st.stop()
-
-        if not run_command("Running TrailerPartsUnlimited scraper", "python Scrapers/scrape_trailerpartsunlimited.py"):
-            st.stop()
-
-        if not run_command("Merging & normalizing data", "python rag_engine/1merge_and_normalize.py"):
-            st.stop()
-
-        if not run_command("Chunking merged data", "python rag_engine/2chunking.py"):
-            st.stop()
-
-        if not run_command("Embedding into ChromaDB", "python rag_engine/3embed_to_chromadb.py"):
-            st.stop()
-
-        st.success(f"🎉 Pipeline completed successfully at `{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`")
+        with st.spinner("Running pipeline..."):
+            report = run_pipeline(
+                force=force_run,
+                skip=["scrape_ebay", "scrape_tpu"] if skip_scrapers else [],
+                on_event=show_stage_event,
+                profile=profile_run,
+            )
+        save_run_report(report)
+
+        st.markdown("### 📊 Stage metrics")
+        st.table([{
+            "stage": r["stage"],
+            "status": r["status"],
+            "wall (s)": r.get("wall_s"),
+            "CPU (s)": r.get("cpu_s"),
+            "peak RSS (MB)": r.get("peak_rss_mb"),
+        } for r in report["stages"]])
+
+        if report.get("profile_dir"):
+            st.markdown(f"### 🔬 Hottest functions (profiles in `{report['profile_dir']}`)")
+            for summary in summarize_profiles(report["profile_dir"]):
+                st.markdown(f"**{summary['name']}** ({summary['wall_s']:.1f}s)")
+                st.code("\n".join(format_entry(entry) for entry in summary["top"]))
+
+        if report["ok"]:
+            st.success(f"🎉 Pipeline completed successfully at `{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`")
+        else:
+            st.error(f"❌ Pipeline finished with failures at `{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`")